@@ -1,19 +1,51 @@
 import asyncio
 import os
-from pathlib import Path
-from dataclasses import dataclass
+import tempfile
+import time
+from dataclasses import asdict
 from datetime import datetime, date
 
 from aiogram import Bot, Dispatcher, F, Router
 from aiogram.filters import Command
+from aiogram.filters.callback_data import CallbackData
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
-from aiogram.types import Message
-from aiogram.utils.keyboard import ReplyKeyboardBuilder
-from dotenv import load_dotenv
-
-from .db import init_db, add_project, list_projects, delete_project, set_next_due_date
-from .scheduler import setup_scheduler
+from aiogram.types import BufferedInputFile, CallbackQuery, FSInputFile, InlineKeyboardMarkup, Message
+from aiogram.utils.keyboard import InlineKeyboardBuilder, ReplyKeyboardBuilder
+
+from .config import Settings, load_settings
+from .db import (
+    LIST_VIEWS,
+    MAX_REMINDER_DAYS,
+    init_db,
+    open_pool,
+    close_pool,
+    parse_reminder_days,
+    to_due_day,
+)
+from .digest import MESSAGE_LIMIT, PaidCallback
+from .leader import LeaderElection
+from .metrics import (
+    METRICS,
+    PREFIX,
+    HandlerMetricsMiddleware,
+    Metrics,
+    Observed,
+    start_metrics_server,
+)
+from .notifier import Notifier, NotifierStats
+from .outbox import OutboxWorker, lease_batch_size
+from .render import CARDS, PARSE_MODE, escape, format_day, new_project_message, project_card, truncate
+from .repo import AsyncRepository
+from .scheduler import LeaderDuties
+from .storage import SQLiteStorage
+from .throttle import AccessMiddleware, Coalescer
+from .transfer import FORMATS, detect_format, export_projects, import_projects
+from .webhook import run_webhook
+
+
+# Bots cannot download larger files through the Bot API
+IMPORT_MAX_BYTES = 20 * 1024 * 1024
 
 
 class AddProjectForm(StatesGroup):
@@ -33,48 +65,8 @@ class EditDueForm(StatesGroup):
     new_due = State()
 
 
-@dataclass
-class Settings:
-    token: str
-    admin_chat_id: int
-    db_path: str
-    timezone: str
-
-
-def load_settings() -> Settings:
-    # Get project root directory (parent of app directory)
-    project_root = Path(__file__).parent.parent
-    # Try loading .env from project root first, then from config/
-    env_file = project_root / ".env"
-    if not env_file.exists():
-        env_file = project_root / "config" / ".env"
-    load_dotenv(dotenv_path=env_file)
-    token = os.getenv("TELEGRAM_BOT_TOKEN", "").strip()
-    admin_chat_id = int(os.getenv("ADMIN_CHAT_ID", "0"))
-    db_path = os.getenv("DATABASE_PATH", "./data/reminder.db").strip()
-    timezone = os.getenv("TIMEZONE", "Asia/Tashkent").strip()
-    if not token:
-        raise RuntimeError("TELEGRAM_BOT_TOKEN is not set")
-    if not admin_chat_id:
-        raise RuntimeError("ADMIN_CHAT_ID is not set")
-    return Settings(token=token, admin_chat_id=admin_chat_id, db_path=db_path, timezone=timezone)
-
-
-def format_date(d: datetime | date | str) -> str:
-    """Format date as dd.mm.yyyy"""
-    if isinstance(d, str):
-        try:
-            # Try parsing from ISO format first
-            d = datetime.fromisoformat(d)
-        except (ValueError, AttributeError):
-            try:
-                # Try parsing from dd.mm.yyyy format
-                d = datetime.strptime(d, "%d.%m.%Y")
-            except ValueError:
-                return d
-    if isinstance(d, datetime):
-        d = d.date()
-    return d.strftime("%d.%m.%Y")
+class ImportForm(StatesGroup):
+    document = State()
 
 
 def parse_date(text: str) -> date | None:
@@ -108,9 +100,17 @@ async def cmd_help(message: Message):
     await message.answer(
         "Buyruqlar:\n"
         "/addproject - Yangi loyiha qo'shish\n"
-        "/list - Loyihalar ro'yxati\n"
+        "/list - Loyihalar ro'yxati (/list overdue, /list week, /list server <nomi>)\n"
+        "/find - Nom, server, ega, telefon yoki IP bo'yicha qidirish\n"
         "/delete - ID bo'yicha o'chirish\n"
-        "/editdue - Keyingi muddatni o'zgartirish"
+        "/editdue - Keyingi muddatni o'zgartirish\n"
+        "/sethour - Loyiha eslatmalari yuboriladigan soatni o'zgartirish\n"
+        "/setreminders - Loyiha eslatmalari necha kun oldin yuborilishini o'zgartirish\n"
+        "/setfee - Loyihaning oylik to'lov summasini belgilash\n"
+        "/report - Tushum, muddati o'tganlar va kechikadigan egalar (faqat admin)\n"
+        "/import - CSV yoki JSON fayldan loyihalarni yuklash (faqat admin)\n"
+        "/export - Loyihalarni faylga yuklab olish: /export csv|json|jsonl (faqat admin)\n"
+        "/stats - Handler, baza va jadval statistikasi (faqat admin)"
     )
 
 
@@ -182,7 +182,9 @@ async def ask_next_due_date(message: Message, state: FSMContext):
 
 
 @router.message(AddProjectForm.next_due_date)
-async def finalize_add(message: Message, state: FSMContext, bot: Bot):
+async def finalize_add(
+    message: Message, state: FSMContext, repo: AsyncRepository, notifier: Notifier, settings: Settings
+):
     due_date_text = message.text.strip()
     due_date = parse_date(due_date_text)
     if due_date is None:
@@ -190,14 +192,11 @@ async def finalize_add(message: Message, state: FSMContext, bot: Bot):
         return
     
     data = await state.get_data()
-    settings = load_settings()
-    init_db(settings.db_path)
     
     # Convert date to datetime at midnight for storage
     due_datetime = datetime.combine(due_date, datetime.min.time())
     
-    project_id = add_project(
-        db_path=settings.db_path,
+    project_id = await repo.add_project(
         project_name=data["project_name"],
         server_name=data["server_name"],
         owner_name=data["owner_name"],
@@ -211,65 +210,224 @@ async def finalize_add(message: Message, state: FSMContext, bot: Bot):
     )
     await state.clear()
     await message.answer(f"Loyiha qo'shildi. ID: {project_id}")
-    await bot.send_message(
-        chat_id=settings.admin_chat_id,
-        text=(
-            "Yangi loyiha qo'shildi:\n"
-            f"ID: {project_id}\n"
-            f"Project: {data['project_name']}\n"
-            f"Server: {data['server_name']}\n"
-            f"Ega: {data['owner_name']}\n"
-            f"Telefon: {data['owner_phone']}\n"
-            f"Login: {data['server_login_username']}\n"
-            f"IP: {data['server_ip']}\n"
-            f"Tugash sanasi: {format_date(due_date)}"
-        ),
+    notifier.send(
+        settings.admin_chat_id,
+        new_project_message({**data, "id": project_id, "due_day": to_due_day(due_date)}),
+        parse_mode=PARSE_MODE,
     )
 
 
+LIST_PAGE_SIZE = 10
+LIST_TITLES = {
+    "all": "Loyihalar",
+    "overdue": "Muddati o'tgan loyihalar",
+    "week": "7 kun ichida to'lanadigan loyihalar",
+    "server": "Server bo'yicha loyihalar",
+}
+LIST_USAGE = "Foydalanish: /list, /list overdue, /list week, /list server <nomi>"
+
+
+# Identical /list pages requested while one is being read share its result
+list_requests = Coalescer()
+
+
+class ListPage(CallbackData, prefix="lst"):
+    view: str
+    server: str
+    due_day: int
+    id: int
+    back: bool
+
+
+async def render_list_page(
+    repo: AsyncRepository, view: str, server: str, cursor: tuple[int, int] | None, backward: bool
+) -> tuple[str, InlineKeyboardMarkup | None] | None:
+    """Render one /list page and its navigation keyboard, or None if the page is empty"""
+    today = to_due_day(datetime.now())
+    rows = await repo.list_projects_page(
+        view, today, LIST_PAGE_SIZE + 1, cursor=cursor, backward=backward, server=server or None
+    )
+    if not rows:
+        return None
+    more = len(rows) > LIST_PAGE_SIZE
+    # The extra row is the one furthest from the cursor
+    if more:
+        rows = rows[1:] if backward else rows[:LIST_PAGE_SIZE]
+    has_prev = more if backward else cursor is not None
+    has_next = True if backward else more
+
+    title = LIST_TITLES[view] + (f": {escape(server)}" if view == "server" else "")
+    cards = [project_card(it) for it in rows]
+    # Drop whole cards (never split one) until the page fits into one message
+    while len(cards) > 1 and len(title) + sum(len(c) + 1 for c in cards) >= MESSAGE_LIMIT:
+        if backward:
+            cards.pop(0)
+            rows.pop(0)
+            has_prev = True
+        else:
+            cards.pop()
+            rows.pop()
+            has_next = True
+    text = truncate("\n".join([title] + cards), MESSAGE_LIMIT)
+
+    kb = InlineKeyboardBuilder()
+    if has_prev:
+        first = rows[0]
+        kb.button(text="⬅️", callback_data=ListPage(
+            view=view, server=server, due_day=first["due_day"] or 0, id=first["id"], back=True
+        ))
+    if has_next:
+        last = rows[-1]
+        kb.button(text="➡️", callback_data=ListPage(
+            view=view, server=server, due_day=last["due_day"] or 0, id=last["id"], back=False
+        ))
+    kb.adjust(2)
+    return text, kb.as_markup() if has_prev or has_next else None
+
+
 @router.message(Command("list"))
-async def cmd_list(message: Message):
-    settings = load_settings()
-    init_db(settings.db_path)
-    items = list_projects(settings.db_path)
+async def cmd_list(message: Message, repo: AsyncRepository):
+    parts = message.text.split(maxsplit=2)
+    view = parts[1].lower() if len(parts) > 1 else "all"
+    server = parts[2].strip() if view == "server" and len(parts) > 2 else ""
+    if view not in LIST_VIEWS or (view == "server") != bool(server) or (view != "server" and len(parts) > 2):
+        await message.answer(LIST_USAGE)
+        return
+    try:
+        # The server name travels in the navigation buttons, which are capped at 64 bytes
+        ListPage(view=view, server=server, due_day=99999, id=9999999, back=False).pack()
+    except ValueError:
+        await message.answer("Server nomi juda uzun yoki ':' belgisini o'z ichiga oladi.")
+        return
+    page = await list_requests.run(
+        (view, server, None, False), lambda: render_list_page(repo, view, server, cursor=None, backward=False)
+    )
+    if page is None:
+        await message.answer("Hozircha loyihalar yo'q." if view == "all" else "Mos loyihalar topilmadi.")
+        return
+    text, markup = page
+    await message.answer(text, reply_markup=markup, parse_mode=PARSE_MODE)
+
+
+@router.callback_query(ListPage.filter())
+async def cb_list_page(callback: CallbackQuery, callback_data: ListPage, repo: AsyncRepository):
+    view, server = callback_data.view, callback_data.server
+    cursor, backward = (callback_data.due_day, callback_data.id), callback_data.back
+    page = await list_requests.run(
+        (view, server, cursor, backward),
+        lambda: render_list_page(repo, view, server, cursor=cursor, backward=backward),
+    )
+    if page is None:
+        await callback.answer("Boshqa loyiha yo'q")
+        return
+    text, markup = page
+    await callback.message.edit_text(text, reply_markup=markup, parse_mode=PARSE_MODE)
+    await callback.answer()
+
+
+FIND_LIMIT = 10
+
+
+@router.message(Command("find"))
+async def cmd_find(message: Message, repo: AsyncRepository):
+    parts = message.text.split(maxsplit=1)
+    if len(parts) != 2 or not parts[1].strip():
+        await message.answer("Foydalanish: /find <nom, server, ega, telefon yoki IP>")
+        return
+    items = await repo.find_projects(parts[1], FIND_LIMIT)
     if not items:
-        await message.answer("Hozircha loyihalar yo'q.")
+        await message.answer("Hech narsa topilmadi.")
         return
-    lines = []
-    for it in items:
-        due_date_formatted = format_date(it['next_due_date'])
-        lines.append(
-            f"ID: {it['id']} | {it['project_name']}\n"
-            f"Server: {it['server_name']}\n"
-            f"Ega: {it['owner_name']} | Tel: {it['owner_phone']}\n"
-            f"Login: {it.get('server_login_username', 'N/A')} | IP: {it.get('server_ip', 'N/A')}\n"
-            f"Tugash sanasi: {due_date_formatted}\n"
-            f"{'─' * 30}"
-        )
-    # Split into multiple messages if too long
-    message_text = "\n".join(lines)
-    if len(message_text) > 4096:
-        # Split into chunks
-        chunks = [message_text[i:i+4096] for i in range(0, len(message_text), 4096)]
-        for chunk in chunks:
-            await message.answer(chunk)
-    else:
-        await message.answer(message_text)
+    title = f"Qidiruv natijalari: {len(items)}"
+    cards = [project_card(it) for it in items]
+    while len(cards) > 1 and len(title) + sum(len(c) + 1 for c in cards) >= MESSAGE_LIMIT:
+        cards.pop()
+    await message.answer(truncate("\n".join([title] + cards), MESSAGE_LIMIT), parse_mode=PARSE_MODE)
 
 
 @router.message(Command("delete"))
-async def cmd_delete(message: Message):
+async def cmd_delete(message: Message, repo: AsyncRepository):
     parts = message.text.split()
     if len(parts) != 2 or not parts[1].isdigit():
         await message.answer("Foydalanish: /delete <ID>")
         return
     project_id = int(parts[1])
-    settings = load_settings()
-    init_db(settings.db_path)
-    ok = delete_project(settings.db_path, project_id)
+    ok = await repo.delete_project(project_id)
     await message.answer("O'chirildi" if ok else "Topilmadi")
 
 
+@router.message(Command("sethour"))
+async def cmd_set_hour(message: Message, repo: AsyncRepository):
+    parts = message.text.split()
+    usage = "Foydalanish: /sethour <ID> <0-23 yoki default>"
+    if len(parts) != 3 or not parts[1].isdigit():
+        await message.answer(usage)
+        return
+    if parts[2].lower() == "default":
+        hour = None
+    elif parts[2].isdigit() and 0 <= int(parts[2]) <= 23:
+        hour = int(parts[2])
+    else:
+        await message.answer(usage)
+        return
+    ok = await repo.set_notify_hour(int(parts[1]), hour)
+    if not ok:
+        await message.answer("Topilmadi")
+        return
+    await message.answer(
+        f"Eslatma vaqti: {hour:02d}:00" if hour is not None else "Eslatma vaqti standart holatga qaytarildi"
+    )
+
+
+@router.message(Command("setreminders"))
+async def cmd_set_reminders(message: Message, repo: AsyncRepository):
+    parts = message.text.split()
+    usage = f"Foydalanish: /setreminders <ID> <14,7,3,1 yoki default> (1-{MAX_REMINDER_DAYS} kun)"
+    if len(parts) != 3 or not parts[1].isdigit():
+        await message.answer(usage)
+        return
+    if parts[2].lower() == "default":
+        days = None
+    else:
+        days = parse_reminder_days(parts[2])
+        if days is None:
+            await message.answer(usage)
+            return
+    ok = await repo.set_reminder_days(int(parts[1]), days)
+    if not ok:
+        await message.answer("Topilmadi")
+        return
+    await message.answer(
+        f"Eslatmalar muddatdan {', '.join(map(str, days))} kun oldin yuboriladi"
+        if days is not None else "Eslatma kunlari standart holatga qaytarildi"
+    )
+
+
+def format_money(amount: int) -> str:
+    return f"{amount:,}".replace(",", " ") + " so'm"
+
+
+@router.message(Command("setfee"))
+async def cmd_set_fee(message: Message, repo: AsyncRepository):
+    parts = message.text.split()
+    usage = "Foydalanish: /setfee <ID> <summa so'mda yoki default>"
+    if len(parts) != 3 or not parts[1].isdigit():
+        await message.answer(usage)
+        return
+    if parts[2].lower() == "default":
+        fee = None
+    elif parts[2].isdigit():
+        fee = int(parts[2])
+    else:
+        await message.answer(usage)
+        return
+    ok = await repo.set_monthly_fee(int(parts[1]), fee)
+    if not ok:
+        await message.answer("Topilmadi")
+        return
+    await message.answer(f"Oylik to'lov: {format_money(fee)}" if fee is not None else "Oylik to'lov o'chirildi")
+
+
 @router.message(Command("editdue"))
 async def cmd_edit_due(message: Message, state: FSMContext):
     await state.set_state(EditDueForm.project_id)
@@ -290,7 +448,7 @@ async def ask_new_due(message: Message, state: FSMContext):
 
 
 @router.message(EditDueForm.new_due)
-async def finalize_edit_due(message: Message, state: FSMContext):
+async def finalize_edit_due(message: Message, state: FSMContext, repo: AsyncRepository):
     due_date = parse_date(message.text)
     if due_date is None:
         await message.answer(
@@ -302,29 +460,313 @@ async def finalize_edit_due(message: Message, state: FSMContext):
     new_due_datetime = datetime.combine(due_date, datetime.min.time())
     
     data = await state.get_data()
-    settings = load_settings()
-    init_db(settings.db_path)
-    ok = set_next_due_date(settings.db_path, int(data["project_id"]), new_due_datetime)
+    ok = await repo.set_next_due_date(int(data["project_id"]), new_due_datetime)
     await state.clear()
-    await message.answer(f"Yangilandi. Yangi tugash sanasi: {format_date(due_date)}" if ok else "Topilmadi")
+    await message.answer(
+        f"Yangilandi. Yangi tugash sanasi: {format_day(to_due_day(due_date))}" if ok else "Topilmadi"
+    )
+
+
+async def run_import(message: Message, repo: AsyncRepository) -> None:
+    document = message.document
+    if document.file_size and document.file_size > IMPORT_MAX_BYTES:
+        await message.answer(f"Fayl juda katta (eng ko'pi {IMPORT_MAX_BYTES // 2 ** 20} MB)")
+        return
+    await message.answer("Fayl qabul qilindi, yuklanmoqda...")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "import")
+        await message.bot.download(document, destination=path)
+        report = await import_projects(repo, path, detect_format(path, document.file_name))
+    lines = report.error_lines()
+    text = report.summary()
+    if lines and len(text) + len("\n\n".join(lines)) + 2 <= MESSAGE_LIMIT:
+        await message.answer(text + "\n\n" + "\n".join(lines))
+    elif lines:
+        errors = BufferedInputFile("\n".join(lines).encode(), filename="import_errors.txt")
+        await message.answer_document(errors, caption=text)
+    else:
+        await message.answer(text)
+
+
+@router.message(Command("import"))
+async def cmd_import(message: Message, state: FSMContext, repo: AsyncRepository, settings: Settings):
+    if message.chat.id != settings.admin_chat_id:
+        await message.answer("Bu buyruq faqat admin chatida ishlaydi")
+        return
+    # The file can come with /import as its caption
+    if message.document:
+        await run_import(message, repo)
+        return
+    await state.set_state(ImportForm.document)
+    await message.answer(
+        "CSV, JSON yoki JSON Lines faylni yuboring.\n"
+        "Majburiy ustunlar: project_name, server_name, owner_name, owner_phone, next_due_date (dd.mm.yyyy).\n"
+        "Qo'shimcha: server_login_username, server_login_password, server_ip, root_password, "
+        "start_date, notify_hour, reminder_days."
+    )
+
+
+@router.message(ImportForm.document, F.document)
+async def import_document(message: Message, state: FSMContext, repo: AsyncRepository):
+    await state.clear()
+    await run_import(message, repo)
+
+
+@router.message(ImportForm.document)
+async def import_not_document(message: Message, state: FSMContext):
+    await state.clear()
+    await message.answer("Fayl yuborilmadi, import bekor qilindi. Qayta boshlash: /import")
+
+
+@router.message(Command("export"))
+async def cmd_export(message: Message, repo: AsyncRepository, settings: Settings):
+    if message.chat.id != settings.admin_chat_id:
+        await message.answer("Bu buyruq faqat admin chatida ishlaydi")
+        return
+    parts = message.text.split()
+    fmt = parts[1].lower() if len(parts) > 1 else "csv"
+    if len(parts) > 2 or fmt not in FORMATS:
+        await message.answer("Foydalanish: /export [" + "|".join(FORMATS) + "]")
+        return
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, f"projects.{fmt}")
+        count = await export_projects(repo, path, fmt)
+        await message.answer_document(
+            FSInputFile(path), caption=f"{count} ta loyiha. Faylda parollar bor, ehtiyot bo'ling!"
+        )
+
+
+def format_stats(metrics: Metrics, notifier: NotifierStats) -> str:
+    def timing(histogram, name: str) -> str:
+        series = histogram.series[name]
+        p95 = histogram.quantile(name, 0.95)
+        text = f"{series.count} ta, o'rtacha {series.sum / series.count * 1000:.1f} ms"
+        return text + (f", p95 ≤ {p95 * 1000:g} ms" if p95 is not None else "")
+
+    uptime = int(time.time() - metrics.started_at)
+    lines = [f"📊 Statistika (ishlash vaqti: {uptime // 3600} soat {uptime % 3600 // 60} daqiqa)", "", "Handlerlar:"]
+    for name in sorted(metrics.handler_seconds.series):
+        errors = int(metrics.handler_errors.values.get(name, 0))
+        lines.append(f"{name}: {timing(metrics.handler_seconds, name)}, {errors} xato")
+    lines += ["", "Baza (eng ko'p vaqt olgan 5 ta):"]
+    busiest = sorted(metrics.db_seconds.series.items(), key=lambda item: item[1].sum, reverse=True)[:5]
+    for name, series in busiest:
+        lines.append(f"{name}: {timing(metrics.db_seconds, name)}, jami {series.sum:.2f} s")
+    lines += ["", "Jadval:"]
+    for name in sorted(metrics.job_seconds.series):
+        items = int(metrics.job_items.values.get(name, 0))
+        errors = int(metrics.job_errors.values.get(name, 0))
+        lines.append(f"{name}: {timing(metrics.job_seconds, name)}, {items} xabar, {errors} xato")
+    rejected = metrics.rejected_updates.values
+    lines += [
+        "",
+        f"Rad etilgan: ruxsatsiz {int(rejected.get('not_allowed', 0))}, "
+        f"foydalanuvchi limiti {int(rejected.get('user', 0))}, buyruq limiti {int(rejected.get('command', 0))}",
+        f"Xabarlar: {notifier.queued} navbatga, {notifier.sent} yuborildi, "
+        f"{notifier.retried} qayta urinish, {notifier.failed} xato",
+    ]
+    return "\n".join(lines)[:MESSAGE_LIMIT]
+
+
+def month_start(today: date, months_back: int) -> date:
+    """First day of the month ``months_back`` months before today's"""
+    month = today.year * 12 + today.month - 1 - months_back
+    return date(month // 12, month % 12 + 1, 1)
+
+
+REPORT_SECTIONS = ("revenue", "overdue", "late")
+REPORT_MONTHS = 12
+MAX_REPORT_MONTHS = 120
+REPORT_OWNERS = 10
+REPORT_USAGE = "Foydalanish: /report, /report revenue [oylar], /report overdue, /report late [oylar]"
+
+
+def format_rolled_over(count: int, amount: int) -> str:
+    # Due dates the scheduler moved on without a recorded payment
+    return f"; avtomatik surilgan: {count} ta, {format_money(amount)}" if count else ""
+
+
+def format_revenue(rows: list[dict], months: int) -> list[str]:
+    lines = [f"💰 Tushum (oxirgi {months} oy):"]
+    for row in rows:
+        lines.append(
+            f"{row['month']}: {format_money(row['amount'])}, {row['payments']} to'lov, {row['late']} kechikkan"
+            + format_rolled_over(row["rolled_over"], row["rolled_over_amount"])
+        )
+    if rows:
+        total, payments = sum(row["amount"] for row in rows), sum(row["payments"] for row in rows)
+        rolled_over = sum(row["rolled_over"] for row in rows)
+        rolled_over_amount = sum(row["rolled_over_amount"] for row in rows)
+        lines.append(
+            f"Jami: {format_money(total)}, {payments} to'lov" + format_rolled_over(rolled_over, rolled_over_amount)
+        )
+    else:
+        lines.append("To'lovlar yo'q")
+    return lines
+
+
+def format_overdue(summary: dict) -> list[str]:
+    return [
+        f"🔴 Muddati o'tgan: {summary['projects']} loyiha "
+        f"(1-7 kun: {summary['week']}, 8-30 kun: {summary['month']}, 30+ kun: {summary['older']})",
+        f"Qarz: {format_money(summary['owed'])}",
+        f"To'lovi qayd etilmasdan avtomatik surilgan: {summary['rolled_over']} loyiha, "
+        f"{format_money(summary['rolled_over_amount'])}",
+    ]
+
+
+def format_lateness(rows: list[dict], months: int) -> list[str]:
+    lines = [f"⏰ Kechikadigan egalar (oxirgi {months} oy):"]
+    for row in rows:
+        lines.append(
+            f"{row['owner_name']}: {row['payments']} to'lovdan {row['late']} tasi kechikkan, "
+            f"o'rtacha {row['avg_days_late']:.1f} kun, eng ko'pi {row['max_days_late']} kun"
+        )
+    if not rows:
+        lines.append("Kechikishlar yo'q")
+    return lines
+
+
+@router.message(Command("report"))
+async def cmd_report(message: Message, settings: Settings, repo: AsyncRepository):
+    if message.chat.id != settings.admin_chat_id:
+        await message.answer("Bu buyruq faqat admin chatida ishlaydi")
+        return
+    parts = message.text.split()
+    section = parts[1].lower() if len(parts) > 1 else None
+    months = REPORT_MONTHS
+    if len(parts) > 2 and section in ("revenue", "late") and parts[2].isdigit():
+        months = int(parts[2])
+    elif len(parts) > 2 or (section is not None and section not in REPORT_SECTIONS):
+        await message.answer(REPORT_USAGE)
+        return
+    if not 1 <= months <= MAX_REPORT_MONTHS:
+        await message.answer(f"Oylar soni 1-{MAX_REPORT_MONTHS} bo'lishi kerak")
+        return
+    today = date.today()
+    since = to_due_day(month_start(today, months - 1))
+    sections = []
+    # Each section is one aggregate query over a covering index
+    if section in (None, "revenue"):
+        sections.append(format_revenue(await repo.revenue_by_month(since, to_due_day(today)), months))
+    if section in (None, "overdue"):
+        sections.append(format_overdue(await repo.overdue_summary(to_due_day(today))))
+    if section in (None, "late"):
+        sections.append(format_lateness(await repo.owner_lateness(since, REPORT_OWNERS), months))
+    await message.answer("\n\n".join("\n".join(lines) for lines in sections)[:MESSAGE_LIMIT])
+
+
+@router.message(Command("stats"))
+async def cmd_stats(message: Message, settings: Settings, notifier: Notifier):
+    if message.chat.id != settings.admin_chat_id:
+        await message.answer("Bu buyruq faqat admin chatida ishlaydi")
+        return
+    await message.answer(format_stats(METRICS, notifier.stats))
+
+
+@router.callback_query(PaidCallback.filter())
+async def cb_mark_paid(callback: CallbackQuery, callback_data: PaidCallback, repo: AsyncRepository):
+    new_day = await repo.mark_project_paid(
+        callback_data.project_id, callback_data.due_day, to_due_day(datetime.now())
+    )
+    if new_day is None:
+        await callback.answer("Allaqachon belgilangan yoki topilmadi")
+        return
+    await callback.answer(f"To'landi. Yangi tugash sanasi: {format_day(new_day)}")
 
 
 async def main():
     settings = load_settings()
+    open_pool(settings.db_path)
     init_db(settings.db_path)
+    repo = AsyncRepository(settings.db_path)
+    repo.start()
+    # Cached /list and /find cards are dropped as soon as their project is written
+    repo.listeners.append(CARDS.on_change)
     bot = Bot(token=settings.token)
-    dp = Dispatcher()
+    notifier = Notifier(
+        bot,
+        workers=settings.send_workers,
+        global_rate=settings.send_global_rate,
+        per_chat_rate=settings.send_per_chat_rate,
+    )
+    notifier.start()
+    # Conversations survive restarts; abandoned ones expire
+    storage = SQLiteStorage(repo)
+    storage.start()
+    # FSM middleware is registered below, after the access middleware
+    dp = Dispatcher(storage=storage, disable_fsm=True)
+    # Handed to every handler that asks for them by parameter name
+    dp["settings"] = settings
+    dp["repo"] = repo
+    dp["notifier"] = notifier
     dp.include_router(router)
-
-    async def notify_admin(text: str):
-        await bot.send_message(chat_id=settings.admin_chat_id, text=text)
-
-    scheduler = setup_scheduler(settings.db_path, settings.timezone, notify_admin)
-    scheduler.start()
+    # Strangers and floods are dropped before the FSM storage, a filter or the DB is touched
+    dp.update.outer_middleware(AccessMiddleware({settings.admin_chat_id, *settings.allowed_ids}))
+    dp.update.outer_middleware(dp.fsm)
+    # Inner middlewares, so each handler is timed under its own name
+    dp.message.middleware(HandlerMetricsMiddleware())
+    dp.callback_query.middleware(HandlerMetricsMiddleware())
+    METRICS.add_observed(Observed(
+        PREFIX + "notifier_messages_total", "Messages by notifier event", "counter",
+        lambda: asdict(notifier.stats), label="event",
+    ))
+    METRICS.add_observed(Observed(
+        PREFIX + "notifier_pending", "Messages waiting for a notifier worker", "gauge", lambda: notifier.pending
+    ))
+    METRICS.add_observed(Observed(
+        PREFIX + "fsm_cached_conversations", "Conversations in the FSM storage cache", "gauge", lambda: len(storage)
+    ))
+    metrics_runner = None
+    if settings.metrics_port:
+        metrics_runner = await start_metrics_server(settings.metrics_host, settings.metrics_port)
+
+    # Replicas sharing the database elect one leader; only it sends scheduled
+    # messages, the others just serve updates and take over if it dies
+    outbox = OutboxWorker(repo, notifier)
+    duties = LeaderDuties(
+        repo,
+        outbox,
+        settings.timezone,
+        settings.admin_chat_id,
+        digest_mode=settings.digest_mode,
+        notify_hour=settings.notify_hour,
+        reminder_days=settings.reminder_days,
+    )
+    election = LeaderElection(
+        repo, duties.start, duties.stop, holder=settings.instance_id or None, ttl=settings.lease_ttl
+    )
+    # A leader whose lease may have run out stops delivering before its next heartbeat notices,
+    # and a batch holds no more than the admin chat's rate lets out within one heartbeat
+    outbox.may_send = lambda: election.is_leader
+    outbox.batch_size = lease_batch_size(settings.send_per_chat_rate, election.heartbeat)
+    METRICS.add_observed(Observed(
+        PREFIX + "leader", "1 while this replica runs the scheduler", "gauge", lambda: int(election.is_leader)
+    ))
+    election.start()
     try:
-        await dp.start_polling(bot)
+        if settings.webhook_url:
+            await run_webhook(
+                dp,
+                bot,
+                settings.webhook_url,
+                settings.webhook_secret,
+                host=settings.webhook_host,
+                port=settings.webhook_port,
+            )
+        else:
+            # Telegram refuses getUpdates while a webhook is set, e.g. after switching modes
+            await bot.delete_webhook()
+            await dp.start_polling(bot)
     finally:
-        scheduler.shutdown(wait=False)
+        # Stops the scheduler and the outbox, then hands the lease over
+        await election.close()
+        await notifier.close()
+        await storage.close()
+        if metrics_runner is not None:
+            await metrics_runner.cleanup()
+        await repo.close()
+        close_pool(settings.db_path)
 
 
 if __name__ == "__main__":
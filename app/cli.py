@@ -0,0 +1,205 @@
+"""
+Maintenance commands that run without the bot: python -m app.cli <command>
+
+    init                     create the database and apply every migration
+    migrate [--check]        apply pending migrations (--check: only report them)
+    list [--view V] [--server NAME] [--limit N]
+    due [--days N]           projects due within N days, overdue ones included
+    bump ID [ID ...]         move projects one billing cycle forward, as paid today
+    vacuum                   compact the file and refresh planner statistics
+    import FILE [--format F]
+    export FILE [--format F]
+
+The database is --db, else DATABASE_PATH from the environment or .env. Only
+app.config and app.db are imported up front, so a cron job does not pay for
+aiogram or APScheduler; import and export load app.transfer when they run.
+A running bot keeps its reminder timers in memory: due dates changed here
+reach them at its next resync, within a minute (in digest mode, the next
+digest reads them).
+"""
+
+import argparse
+import os
+import sys
+from datetime import date
+
+from . import db
+from .config import database_path
+from .render import format_day
+
+# Rows fetched per query by list
+PAGE_SIZE = 500
+
+
+def print_projects(rows: list[dict]) -> None:
+    # Tab separated, so the output can be piped into cut, sort or a spreadsheet
+    for row in rows:
+        print("\t".join(str(value) for value in (
+            row["id"], row["project_name"], row["server_name"], row["owner_name"], row["owner_phone"],
+            format_day(row["due_day"]),
+        )))
+
+
+def cmd_init(args: argparse.Namespace) -> int:
+    db.init_db(args.db)
+    print(f"✅ Database tayyor: {args.db} (sxema v{db.schema_version(args.db)})")
+    return 0
+
+
+def cmd_migrate(args: argparse.Namespace) -> int:
+    if not os.path.exists(args.db):
+        print(f"Database topilmadi: {args.db} (yaratish uchun: python -m app.cli init)", file=sys.stderr)
+        return 1
+    version = db.schema_version(args.db)
+    pending = len(db.MIGRATIONS) - version
+    if args.check:
+        print(f"Sxema v{version}, {max(pending, 0)} ta migratsiya kutilmoqda")
+        return 1 if pending > 0 else 0
+    db.init_db(args.db)
+    print(f"Sxema v{version} -> v{db.schema_version(args.db)}")
+    return 0
+
+
+def cmd_list(args: argparse.Namespace) -> int:
+    if (args.view == "server") != bool(args.server):
+        print("--server faqat --view server bilan (va u bilan majburiy)", file=sys.stderr)
+        return 2
+    today = db.to_due_day(date.today())
+    cursor = None
+    left = args.limit
+    while left is None or left > 0:
+        size = PAGE_SIZE if left is None else min(PAGE_SIZE, left)
+        rows = db.list_projects_page(args.db, args.view, today, size, cursor=cursor, server=args.server)
+        print_projects(rows)
+        if len(rows) < size:
+            break
+        if left is not None:
+            left -= len(rows)
+        last = rows[-1]
+        cursor = (last["due_day"], last["id"])
+    return 0
+
+
+def cmd_due(args: argparse.Namespace) -> int:
+    today = db.to_due_day(date.today())
+    rows = db.get_projects_due_between(args.db, 0, today + args.days)
+    print_projects(rows)
+    return 0
+
+
+def cmd_bump(args: argparse.Namespace) -> int:
+    missing = 0
+    for project_id in args.ids:
+        new_day = db.bump_next_due_date(args.db, project_id)
+        if new_day is None:
+            print(f"{project_id}: topilmadi", file=sys.stderr)
+            missing += 1
+        else:
+            print(f"{project_id}: yangi tugash sanasi {format_day(new_day)}")
+    return 1 if missing else 0
+
+
+def cmd_vacuum(args: argparse.Namespace) -> int:
+    before = os.path.getsize(args.db)
+    db.vacuum(args.db)
+    after = os.path.getsize(args.db)
+    print(f"{args.db}: {before / 2 ** 20:.1f} MiB -> {after / 2 ** 20:.1f} MiB")
+    return 0
+
+
+def transfer(args: argparse.Namespace, export: bool) -> int:
+    import asyncio
+
+    from .repo import AsyncRepository
+    from .transfer import FORMATS, detect_format, export_projects, import_projects
+
+    if export:
+        fmt = args.format or os.path.splitext(args.file)[1].lstrip(".").lower() or "csv"
+    else:
+        fmt = args.format or detect_format(args.file)
+    if fmt not in FORMATS:
+        print(f"Format: {', '.join(FORMATS)}", file=sys.stderr)
+        return 2
+
+    async def run() -> int:
+        repo = AsyncRepository(args.db)
+        repo.start()
+        try:
+            if export:
+                count = await export_projects(repo, args.file, fmt)
+                print(f"{count} ta loyiha yozildi: {args.file}")
+                return 0
+            report = await import_projects(repo, args.file, fmt)
+        finally:
+            await repo.close()
+        print(report.summary())
+        for line in report.error_lines():
+            print(line, file=sys.stderr)
+        return 1 if report.failed or report.fatal else 0
+
+    return asyncio.run(run())
+
+
+def cmd_import(args: argparse.Namespace) -> int:
+    return transfer(args, export=False)
+
+
+def cmd_export(args: argparse.Namespace) -> int:
+    return transfer(args, export=True)
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="python -m app.cli", description="Reminder bot bazasi bilan ishlash")
+    parser.add_argument("--db", help="SQLite fayl (standart: DATABASE_PATH)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    commands.add_parser("init", help="bazani yaratish").set_defaults(run=cmd_init)
+
+    migrate = commands.add_parser("migrate", help="migratsiyalarni qo'llash")
+    migrate.add_argument("--check", action="store_true", help="faqat tekshirish; kutilayotgan bo'lsa chiqish kodi 1")
+    migrate.set_defaults(run=cmd_migrate)
+
+    list_ = commands.add_parser("list", help="loyihalar ro'yxati")
+    list_.add_argument("--view", choices=db.LIST_VIEWS, default="all")
+    list_.add_argument("--server")
+    list_.add_argument("--limit", type=int)
+    list_.set_defaults(run=cmd_list)
+
+    due = commands.add_parser("due", help="N kun ichida (va muddati o'tgan) loyihalar")
+    due.add_argument("--days", type=int, default=7)
+    due.set_defaults(run=cmd_due)
+
+    bump = commands.add_parser("bump", help="to'langan deb belgilash: muddatni bir davrga surish")
+    bump.add_argument("ids", type=int, nargs="+", metavar="ID")
+    bump.set_defaults(run=cmd_bump)
+
+    commands.add_parser("vacuum", help="faylni ixchamlash").set_defaults(run=cmd_vacuum)
+
+    for name, run, help in (
+        ("import", cmd_import, "CSV/JSON/JSON Lines fayldan yuklash"),
+        ("export", cmd_export, "faylga yuklab olish"),
+    ):
+        command = commands.add_parser(name, help=help)
+        command.add_argument("file")
+        command.add_argument("--format", help="csv, json yoki jsonl (standart: fayl kengaytmasidan)")
+        command.set_defaults(run=run)
+    return parser
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = build_parser().parse_args(argv)
+    args.db = args.db or database_path()
+    if args.command not in ("init", "migrate"):
+        if not os.path.exists(args.db):
+            print(f"Database topilmadi: {args.db} (yaratish uchun: python -m app.cli init)", file=sys.stderr)
+            return 1
+        # Same schema the bot expects; a no-op once it is current
+        db.init_db(args.db)
+    try:
+        return args.run(args)
+    finally:
+        db.close_pool(args.db)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
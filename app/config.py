@@ -0,0 +1,128 @@
+import os
+import re
+from dataclasses import dataclass
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+from .db import MAX_REMINDER_DAYS, parse_reminder_days
+
+
+# Kept free of aiogram, APScheduler and aiohttp, so app.cli and maintenance
+# scripts start without loading the bot stack. Modules that use these
+# defaults import them from here.
+
+DEFAULT_DB_PATH = "./data/reminder.db"
+DEFAULT_TIMEZONE = "Asia/Tashkent"
+# Telegram allows about 30 messages per second per bot and one per second per chat
+DEFAULT_GLOBAL_RATE = 25.0
+DEFAULT_PER_CHAT_RATE = 1.0
+DEFAULT_WORKERS = 4
+DEFAULT_NOTIFY_HOUR = 9
+# Days before the due date reminders are sent, unless a project sets its own
+DEFAULT_REMINDER_DAYS = (2,)
+DEFAULT_WEBHOOK_HOST = "0.0.0.0"
+DEFAULT_WEBHOOK_PORT = 8080
+DEFAULT_METRICS_HOST = "127.0.0.1"
+# Seconds a replica holds the scheduler lease without renewing it
+DEFAULT_LEASE_TTL = 15.0
+# Characters Telegram allows in a webhook secret token
+WEBHOOK_SECRET_RE = re.compile(r"[A-Za-z0-9_-]{1,256}")
+
+
+@dataclass
+class Settings:
+    token: str
+    admin_chat_id: int
+    db_path: str
+    timezone: str
+    send_workers: int = DEFAULT_WORKERS
+    send_global_rate: float = DEFAULT_GLOBAL_RATE
+    send_per_chat_rate: float = DEFAULT_PER_CHAT_RATE
+    digest_mode: bool = False
+    notify_hour: int = DEFAULT_NOTIFY_HOUR
+    reminder_days: tuple[int, ...] = DEFAULT_REMINDER_DAYS
+    # Empty URL means long polling
+    webhook_url: str = ""
+    webhook_secret: str = ""
+    webhook_host: str = DEFAULT_WEBHOOK_HOST
+    webhook_port: int = DEFAULT_WEBHOOK_PORT
+    # Users and chats besides admin_chat_id that may use the bot
+    allowed_ids: tuple[int, ...] = ()
+    # 0 disables the Prometheus endpoint
+    metrics_host: str = DEFAULT_METRICS_HOST
+    metrics_port: int = 0
+    # Replicas sharing the database elect one to run the scheduler; empty means host:pid
+    instance_id: str = ""
+    lease_ttl: float = DEFAULT_LEASE_TTL
+
+
+def load_env() -> None:
+    # Get project root directory (parent of app directory)
+    project_root = Path(__file__).parent.parent
+    # Try loading .env from project root first, then from config/
+    env_file = project_root / ".env"
+    if not env_file.exists():
+        env_file = project_root / "config" / ".env"
+    load_dotenv(dotenv_path=env_file)
+
+
+def database_path() -> str:
+    """DATABASE_PATH from the environment or .env; all a maintenance tool needs"""
+    load_env()
+    return os.getenv("DATABASE_PATH", DEFAULT_DB_PATH).strip()
+
+
+def load_settings() -> Settings:
+    load_env()
+    token = os.getenv("TELEGRAM_BOT_TOKEN", "").strip()
+    admin_chat_id = int(os.getenv("ADMIN_CHAT_ID", "0"))
+    db_path = os.getenv("DATABASE_PATH", DEFAULT_DB_PATH).strip()
+    timezone = os.getenv("TIMEZONE", DEFAULT_TIMEZONE).strip()
+    send_workers = int(os.getenv("SEND_WORKERS", str(DEFAULT_WORKERS)))
+    send_global_rate = float(os.getenv("SEND_GLOBAL_RATE", str(DEFAULT_GLOBAL_RATE)))
+    send_per_chat_rate = float(os.getenv("SEND_PER_CHAT_RATE", str(DEFAULT_PER_CHAT_RATE)))
+    digest_mode = os.getenv("DIGEST_MODE", "").strip().lower() in ("1", "true", "yes")
+    notify_hour = int(os.getenv("NOTIFY_HOUR", str(DEFAULT_NOTIFY_HOUR)))
+    reminder_days_text = os.getenv("REMINDER_DAYS", "").strip()
+    reminder_days = parse_reminder_days(reminder_days_text) if reminder_days_text else DEFAULT_REMINDER_DAYS
+    webhook_url = os.getenv("WEBHOOK_URL", "").strip()
+    webhook_secret = os.getenv("WEBHOOK_SECRET", "").strip()
+    webhook_host = os.getenv("WEBHOOK_HOST", DEFAULT_WEBHOOK_HOST).strip()
+    webhook_port = int(os.getenv("WEBHOOK_PORT", str(DEFAULT_WEBHOOK_PORT)))
+    allowed_ids = tuple(int(part) for part in os.getenv("ALLOWED_IDS", "").replace(" ", "").split(",") if part)
+    metrics_host = os.getenv("METRICS_HOST", DEFAULT_METRICS_HOST).strip()
+    metrics_port = int(os.getenv("METRICS_PORT", "0"))
+    instance_id = os.getenv("INSTANCE_ID", "").strip()
+    lease_ttl = float(os.getenv("LEASE_TTL", str(DEFAULT_LEASE_TTL)))
+    if not token:
+        raise RuntimeError("TELEGRAM_BOT_TOKEN is not set")
+    if not admin_chat_id:
+        raise RuntimeError("ADMIN_CHAT_ID is not set")
+    if reminder_days is None:
+        raise RuntimeError(f"REMINDER_DAYS must be comma separated days between 1 and {MAX_REMINDER_DAYS}")
+    if webhook_url and not WEBHOOK_SECRET_RE.fullmatch(webhook_secret):
+        raise RuntimeError("WEBHOOK_SECRET must be 1-256 characters of A-Z, a-z, 0-9, _ and -")
+    if lease_ttl < 3:
+        raise RuntimeError("LEASE_TTL must be at least 3 seconds")
+    return Settings(
+        token=token,
+        admin_chat_id=admin_chat_id,
+        db_path=db_path,
+        timezone=timezone,
+        send_workers=send_workers,
+        send_global_rate=send_global_rate,
+        send_per_chat_rate=send_per_chat_rate,
+        digest_mode=digest_mode,
+        notify_hour=notify_hour,
+        reminder_days=reminder_days,
+        webhook_url=webhook_url,
+        webhook_secret=webhook_secret,
+        webhook_host=webhook_host,
+        webhook_port=webhook_port,
+        allowed_ids=allowed_ids,
+        metrics_host=metrics_host,
+        metrics_port=metrics_port,
+        instance_id=instance_id,
+        lease_ttl=lease_ttl,
+    )
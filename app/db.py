@@ -1,7 +1,17 @@
 import os
+import queue
 import sqlite3
+import threading
 from contextlib import contextmanager
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
+
+
+# Pragmas applied once to every pooled connection
+PAGE_CACHE_KIB = 8192
+BUSY_TIMEOUT_SECONDS = 5.0
+# Number of compiled statements sqlite3 keeps per connection
+STATEMENT_CACHE_SIZE = 256
+DEFAULT_POOL_SIZE = 4
 
 
 def ensure_parent_dir(path: str) -> None:
@@ -10,54 +20,432 @@ def ensure_parent_dir(path: str) -> None:
         os.makedirs(parent, exist_ok=True)
 
 
+class ConnectionPool:
+    """A small pool of long-lived connections to one SQLite file.
+
+    Connections are created lazily up to ``size`` and handed out one caller at a
+    time, so they can be shared between the event loop and worker threads.
+    """
+
+    def __init__(self, db_path: str, size: int = DEFAULT_POOL_SIZE):
+        ensure_parent_dir(db_path)
+        self.db_path = db_path
+        self.size = size
+        self._idle: queue.LifoQueue = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=BUSY_TIMEOUT_SECONDS,
+            check_same_thread=False,
+            cached_statements=STATEMENT_CACHE_SIZE,
+        )
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(f"PRAGMA cache_size=-{PAGE_CACHE_KIB}")
+        return conn
+
+    def acquire(self) -> sqlite3.Connection:
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            can_create = self._created < self.size
+            if can_create:
+                self._created += 1
+        if can_create:
+            try:
+                return self._connect()
+            except Exception:
+                with self._lock:
+                    self._created -= 1
+                raise
+        return self._idle.get()
+
+    def release(self, conn: sqlite3.Connection) -> None:
+        self._idle.put(conn)
+
+    def close(self) -> None:
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            conn.close()
+            with self._lock:
+                self._created -= 1
+
+
+_pools: dict[str, ConnectionPool] = {}
+_pools_lock = threading.Lock()
+
+
+def open_pool(db_path: str, size: int = DEFAULT_POOL_SIZE) -> ConnectionPool:
+    """Open (or return the already open) connection pool for db_path"""
+    with _pools_lock:
+        pool = _pools.get(db_path)
+        if pool is None:
+            pool = ConnectionPool(db_path, size)
+            _pools[db_path] = pool
+        return pool
+
+
+def close_pool(db_path: str) -> None:
+    with _pools_lock:
+        pool = _pools.pop(db_path, None)
+    if pool is not None:
+        pool.close()
+
+
+def get_pool(db_path: str) -> ConnectionPool:
+    pool = _pools.get(db_path)
+    if pool is None:
+        pool = open_pool(db_path)
+    return pool
+
+
 @contextmanager
 def get_conn(db_path: str):
-    ensure_parent_dir(db_path)
-    conn = sqlite3.connect(db_path)
+    pool = get_pool(db_path)
+    conn = pool.acquire()
     try:
-        conn.row_factory = sqlite3.Row
         yield conn
         conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
     finally:
-        conn.close()
+        pool.release(conn)
 
 
-def init_db(db_path: str) -> None:
-    with get_conn(db_path) as conn:
+# Due dates are also stored as whole days since 1970-01-01 so that the due
+# queries can be answered with an index range scan on projects.due_day.
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+BILLING_CYCLE_DAYS = 30
+# Reminders further ahead than one billing cycle make no sense
+MAX_REMINDER_DAYS = BILLING_CYCLE_DAYS
+
+
+def to_due_day(d: datetime | date) -> int:
+    if isinstance(d, datetime):
+        d = d.date()
+    return d.toordinal() - EPOCH_ORDINAL
+
+
+def from_due_day(due_day: int) -> date:
+    return date.fromordinal(due_day + EPOCH_ORDINAL)
+
+
+def parse_reminder_days(text: str | None) -> tuple[int, ...] | None:
+    """Parse "14,7,3,1" into offsets, largest first; None if empty or invalid"""
+    if not text:
+        return None
+    try:
+        days = {int(part) for part in text.split(",") if part.strip()}
+    except ValueError:
+        return None
+    if not days or not all(1 <= d <= MAX_REMINDER_DAYS for d in days):
+        return None
+    return tuple(sorted(days, reverse=True))
+
+
+def format_reminder_days(days: tuple[int, ...]) -> str:
+    return ",".join(str(d) for d in sorted(set(days), reverse=True))
+
+
+def _table_columns(conn: sqlite3.Connection, table: str) -> set[str]:
+    return {row["name"] for row in conn.execute(f"PRAGMA table_info({table})")}
+
+
+def _migration_0001_projects(conn: sqlite3.Connection) -> None:
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS projects (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            project_name TEXT NOT NULL,
+            server_name TEXT NOT NULL,
+            owner_name TEXT NOT NULL,
+            owner_phone TEXT NOT NULL,
+            server_login_username TEXT,
+            server_login_password TEXT,
+            server_ip TEXT,
+            root_password TEXT,
+            start_date TEXT NOT NULL,
+            next_due_date TEXT NOT NULL
+        );
+        """
+    )
+    # Databases created before the login/IP fields were added
+    columns = _table_columns(conn, "projects")
+    for column in ("server_login_username", "server_login_password", "server_ip", "root_password"):
+        if column not in columns:
+            conn.execute(f"ALTER TABLE projects ADD COLUMN {column} TEXT")
+
+
+def _migration_0002_due_day(conn: sqlite3.Connection) -> None:
+    conn.execute("ALTER TABLE projects ADD COLUMN due_day INTEGER")
+    conn.execute(
+        "UPDATE projects SET due_day = CAST(julianday(date(next_due_date)) - julianday('1970-01-01') AS INTEGER)"
+    )
+    conn.execute("CREATE INDEX idx_projects_due_day ON projects(due_day)")
+
+
+def _migration_0003_server_due_index(conn: sqlite3.Connection) -> None:
+    # Serves "/list server <name>" ordered by due date without a sort step
+    conn.execute("CREATE INDEX idx_projects_server_due ON projects(server_name, due_day)")
+
+
+FTS_COLUMNS = ("project_name", "server_name", "owner_name", "owner_phone", "server_ip")
+
+
+def _migration_0004_projects_fts(conn: sqlite3.Connection) -> None:
+    # External-content FTS5 index over the searchable columns, kept in sync by triggers
+    columns = ", ".join(FTS_COLUMNS)
+    new_values = ", ".join(f"new.{c}" for c in FTS_COLUMNS)
+    old_values = ", ".join(f"old.{c}" for c in FTS_COLUMNS)
+    conn.execute(
+        f"""
+        CREATE VIRTUAL TABLE projects_fts USING fts5(
+            {columns}, content='projects', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+        )
+        """
+    )
+    conn.execute(
+        f"""
+        CREATE TRIGGER projects_fts_insert AFTER INSERT ON projects BEGIN
+            INSERT INTO projects_fts(rowid, {columns}) VALUES (new.id, {new_values});
+        END
+        """
+    )
+    conn.execute(
+        f"""
+        CREATE TRIGGER projects_fts_delete AFTER DELETE ON projects BEGIN
+            INSERT INTO projects_fts(projects_fts, rowid, {columns}) VALUES ('delete', old.id, {old_values});
+        END
+        """
+    )
+    conn.execute(
+        f"""
+        CREATE TRIGGER projects_fts_update AFTER UPDATE OF {columns} ON projects BEGIN
+            INSERT INTO projects_fts(projects_fts, rowid, {columns}) VALUES ('delete', old.id, {old_values});
+            INSERT INTO projects_fts(rowid, {columns}) VALUES (new.id, {new_values});
+        END
+        """
+    )
+    conn.execute("INSERT INTO projects_fts(projects_fts) VALUES ('rebuild')")
+
+
+def _migration_0005_notify_hour(conn: sqlite3.Connection) -> None:
+    # Hour of day reminders for this project fire at; NULL uses the deployment default
+    conn.execute("ALTER TABLE projects ADD COLUMN notify_hour INTEGER")
+
+
+def _migration_0006_reminder_offsets(conn: sqlite3.Connection) -> None:
+    # Per-project reminder offsets ("14,7,3,1"); NULL uses the deployment default
+    conn.execute("ALTER TABLE projects ADD COLUMN reminder_days TEXT")
+    conn.execute(
+        "CREATE INDEX idx_projects_reminder_days ON projects(reminder_days) WHERE reminder_days IS NOT NULL"
+    )
+    # Ledger of reminders already sent for a due day, so none fires twice
+    conn.execute(
+        """
+        CREATE TABLE reminders_sent (
+            project_id INTEGER NOT NULL,
+            due_day INTEGER NOT NULL,
+            days_before INTEGER NOT NULL,
+            sent_at TEXT NOT NULL,
+            PRIMARY KEY (project_id, due_day, days_before)
+        ) WITHOUT ROWID
+        """
+    )
+    conn.execute("CREATE INDEX idx_reminders_sent_due_day ON reminders_sent(due_day)")
+    conn.execute(
+        """
+        CREATE TRIGGER reminders_sent_cleanup AFTER DELETE ON projects BEGIN
+            DELETE FROM reminders_sent WHERE project_id = old.id;
+        END
+        """
+    )
+
+
+def _migration_0007_outbox(conn: sqlite3.Connection) -> None:
+    # Messages the scheduler committed to send, drained by app.outbox.
+    # AUTOINCREMENT keeps ids of pruned rows from being reused by the drain cursor.
+    conn.execute(
+        """
+        CREATE TABLE outbox (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            chat_id INTEGER NOT NULL,
+            text TEXT NOT NULL,
+            reply_markup TEXT,
+            project_id INTEGER,
+            created_at TEXT NOT NULL,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            delivered_at TEXT
+        )
+        """
+    )
+    conn.execute("CREATE INDEX idx_outbox_pending ON outbox(id) WHERE delivered_at IS NULL")
+
+
+def _migration_0008_meta(conn: sqlite3.Connection) -> None:
+    # Small key/value state that has to survive a restart (e.g. the last scheduler check)
+    conn.execute("CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT NOT NULL) WITHOUT ROWID")
+
+
+def _migration_0009_fsm_state(conn: sqlite3.Connection) -> None:
+    # Conversation state of app.storage.SQLiteStorage, one row per StorageKey
+    conn.execute(
+        """
+        CREATE TABLE fsm_state (
+            key TEXT PRIMARY KEY,
+            state TEXT,
+            data TEXT NOT NULL,
+            updated_at REAL NOT NULL
+        ) WITHOUT ROWID
+        """
+    )
+    conn.execute("CREATE INDEX idx_fsm_state_updated_at ON fsm_state(updated_at)")
+
+
+# payments.source of a due date the scheduler rolled over; every other source is a recorded payment
+ROLLOVER_SOURCE = "auto"
+
+
+def _migration_0010_payments(conn: sqlite3.Connection) -> None:
+    # Fee for one billing cycle in whole so'm; NULL is not set and counts as 0
+    conn.execute("ALTER TABLE projects ADD COLUMN monthly_fee INTEGER")
+    # Ledger of every due date move, each covering [period_start, period_end):
+    # payments from a bump, the paid button or /editdue, and the scheduler's
+    # roll-overs (source 'auto'), which nobody confirmed as paid. The owner is
+    # copied in so the history survives the project being deleted or renamed.
+    conn.execute(
+        """
+        CREATE TABLE payments (
+            id INTEGER PRIMARY KEY,
+            project_id INTEGER NOT NULL,
+            owner_name TEXT NOT NULL,
+            period_start INTEGER NOT NULL,
+            period_end INTEGER NOT NULL,
+            paid_day INTEGER NOT NULL,
+            amount INTEGER NOT NULL,
+            source TEXT NOT NULL
+        )
+        """
+    )
+    # Covering indexes for the reports: monthly totals scan a paid_day range,
+    # lateness walks the owners in order, roll-overs still running are found
+    # by source and period_end; none touches the table
+    conn.execute(
+        "CREATE INDEX idx_payments_paid_day ON payments(paid_day, period_start, period_end, amount, source)"
+    )
+    conn.execute(
+        "CREATE INDEX idx_payments_owner ON payments(owner_name, paid_day, period_start, period_end, source)"
+    )
+    conn.execute("CREATE INDEX idx_payments_source ON payments(source, period_end, amount)")
+    # Same range scans and (due_day, id) order as idx_projects_due_day, and the
+    # overdue report reads the fee from it
+    conn.execute("CREATE INDEX idx_projects_due_fee ON projects(due_day, id, monthly_fee)")
+    conn.execute("DROP INDEX idx_projects_due_day")
+
+
+def _migration_0011_leases(conn: sqlite3.Connection) -> None:
+    # Named leases of app.leader.LeaderElection. expires_at is epoch seconds;
+    # token grows by one whenever a different holder takes the lease over.
+    conn.execute(
+        """
+        CREATE TABLE leases (
+            name TEXT PRIMARY KEY,
+            holder TEXT NOT NULL,
+            expires_at REAL NOT NULL,
+            token INTEGER NOT NULL
+        ) WITHOUT ROWID
+        """
+    )
+
+
+def _migration_0012_card_versions(conn: sqlite3.Connection) -> None:
+    # Bumped by every UPDATE of a project, so a card rendered from the row
+    # (app.render.CardCache) is reused exactly until the row changes
+    conn.execute("ALTER TABLE projects ADD COLUMN version INTEGER NOT NULL DEFAULT 0")
+    # Outbox texts are now sent in HTML parse mode; escape what was queued as plain text
+    conn.execute(
+        """
+        UPDATE outbox SET text = replace(replace(replace(text, '&', '&amp;'), '<', '&lt;'), '>', '&gt;')
+        WHERE delivered_at IS NULL
+        """
+    )
+
+
+def _migration_0013_schedule_changes(conn: sqlite3.Connection) -> None:
+    # One row per project whose schedule (due_day, notify_hour, reminder_days)
+    # was last written at change ``seq``, deleted projects included. Kept by
+    # triggers, so writes from app.cli and other replicas are numbered too, and
+    # app.timers.ReminderTimers reloads only the projects changed since its
+    # last sync.
+    conn.execute("CREATE TABLE schedule_changes (project_id INTEGER PRIMARY KEY, seq INTEGER NOT NULL)")
+    conn.execute("CREATE UNIQUE INDEX idx_schedule_changes_seq ON schedule_changes(seq)")
+    for name, event, row in (
+        ("insert", "INSERT", "new"),
+        ("update", "UPDATE OF due_day, notify_hour, reminder_days", "new"),
+        ("delete", "DELETE", "old"),
+    ):
         conn.execute(
-            """
-            CREATE TABLE IF NOT EXISTS projects (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                project_name TEXT NOT NULL,
-                server_name TEXT NOT NULL,
-                owner_name TEXT NOT NULL,
-                owner_phone TEXT NOT NULL,
-                server_login_username TEXT,
-                server_login_password TEXT,
-                server_ip TEXT,
-                root_password TEXT,
-                start_date TEXT NOT NULL,
-                next_due_date TEXT NOT NULL
-            );
+            f"""
+            CREATE TRIGGER projects_schedule_{name} AFTER {event} ON projects BEGIN
+                INSERT OR REPLACE INTO schedule_changes (project_id, seq)
+                VALUES ({row}.id, (SELECT COALESCE(MAX(seq), 0) + 1 FROM schedule_changes));
+            END
             """
         )
-        # Migrate existing database - add new columns if they don't exist
-        try:
-            conn.execute("ALTER TABLE projects ADD COLUMN server_login_username TEXT")
-        except sqlite3.OperationalError:
-            pass  # Column already exists
-        try:
-            conn.execute("ALTER TABLE projects ADD COLUMN server_login_password TEXT")
-        except sqlite3.OperationalError:
-            pass
-        try:
-            conn.execute("ALTER TABLE projects ADD COLUMN server_ip TEXT")
-        except sqlite3.OperationalError:
-            pass
-        try:
-            conn.execute("ALTER TABLE projects ADD COLUMN root_password TEXT")
-        except sqlite3.OperationalError:
-            pass
+
+
+# Applied in order; PRAGMA user_version holds the number of applied migrations
+MIGRATIONS = [
+    _migration_0001_projects,
+    _migration_0002_due_day,
+    _migration_0003_server_due_index,
+    _migration_0004_projects_fts,
+    _migration_0005_notify_hour,
+    _migration_0006_reminder_offsets,
+    _migration_0007_outbox,
+    _migration_0008_meta,
+    _migration_0009_fsm_state,
+    _migration_0010_payments,
+    _migration_0011_leases,
+    _migration_0012_card_versions,
+    _migration_0013_schedule_changes,
+]
+
+
+def schema_version(db_path: str) -> int:
+    with get_conn(db_path) as conn:
+        return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def init_db(db_path: str) -> None:
+    """Bring the schema up to date, applying each pending migration in its own transaction"""
+    with get_conn(db_path) as conn:
+        if conn.execute("PRAGMA user_version").fetchone()[0] >= len(MIGRATIONS):
+            return
+        while True:
+            # IMMEDIATE takes the write lock, so concurrent callers migrate one at a time
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                version = conn.execute("PRAGMA user_version").fetchone()[0]
+                if version >= len(MIGRATIONS):
+                    conn.commit()
+                    return
+                MIGRATIONS[version](conn)
+                conn.execute(f"PRAGMA user_version = {version + 1}")
+                conn.commit()
+            except BaseException:
+                conn.rollback()
+                raise
 
 
 def add_project(db_path: str, project_name: str, server_name: str, owner_name: str, owner_phone: str, 
@@ -68,8 +456,8 @@ def add_project(db_path: str, project_name: str, server_name: str, owner_name: s
             """
             INSERT INTO projects (project_name, server_name, owner_name, owner_phone, 
                                  server_login_username, server_login_password, server_ip, root_password,
-                                 start_date, next_due_date)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                                 start_date, next_due_date, due_day)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
             """,
             (
                 project_name,
@@ -82,6 +470,7 @@ def add_project(db_path: str, project_name: str, server_name: str, owner_name: s
                 root_password,
                 start_date.isoformat(),
                 next_due_date.isoformat(),
+                to_due_day(next_due_date),
             ),
         )
         return int(cur.lastrowid)
@@ -98,6 +487,181 @@ def list_projects(db_path: str):
         return [dict(r) for r in rows]
 
 
+# Columns of a bulk insert and of an export, in row order
+PROJECT_COLUMNS = (
+    "project_name", "server_name", "owner_name", "owner_phone",
+    "server_login_username", "server_login_password", "server_ip", "root_password",
+    "start_date", "next_due_date", "due_day", "notify_hour", "reminder_days", "monthly_fee",
+)
+
+
+def insert_projects(db_path: str, rows: list[tuple]) -> int:
+    """Insert rows of PROJECT_COLUMNS in one transaction. Returns the id of the first row.
+
+    The write lock is held for the whole statement, so the AUTOINCREMENT ids of
+    the rows are consecutive.
+    """
+    columns = ", ".join(PROJECT_COLUMNS)
+    marks = ", ".join("?" * len(PROJECT_COLUMNS))
+    with get_conn(db_path) as conn:
+        conn.executemany(f"INSERT INTO projects ({columns}) VALUES ({marks})", rows)
+        last_id = conn.execute("SELECT last_insert_rowid()").fetchone()[0]
+    return last_id - len(rows) + 1
+
+
+def export_projects_page(db_path: str, after_id: int, limit: int) -> list[tuple]:
+    """(id, *PROJECT_COLUMNS) of up to ``limit`` projects after ``after_id``, by id"""
+    with get_conn(db_path) as conn:
+        cur = conn.cursor()
+        cur.row_factory = None
+        return cur.execute(
+            f"SELECT id, {', '.join(PROJECT_COLUMNS)} FROM projects WHERE id > ? ORDER BY id LIMIT ?",
+            (after_id, limit),
+        ).fetchall()
+
+
+# Columns shown on a /list card; passwords are never read for listing
+LIST_COLUMNS = (
+    "id, project_name, server_name, owner_name, owner_phone, server_login_username, server_ip, due_day, "
+    "version"
+)
+LIST_VIEWS = ("all", "overdue", "week", "server")
+
+
+def list_page_query(
+    view: str,
+    today: int,
+    limit: int,
+    cursor: tuple[int, int] | None = None,
+    backward: bool = False,
+    server: str | None = None,
+) -> tuple[str, list]:
+    """Build the SQL and parameters for one /list page (see list_projects_page)"""
+    params: list = []
+    if view == "all":
+        where = []
+        if cursor is not None:
+            where.append("id > ?" if backward else "id < ?")
+            params.append(cursor[1])
+        order = "id ASC" if backward else "id DESC"
+        sql = f"SELECT {LIST_COLUMNS} FROM projects"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += f" ORDER BY {order} LIMIT ?"
+        params.append(limit)
+        return sql, params
+
+    # Every filtered view is a due_day range [low, high), open where None
+    where = []
+    low = high = None
+    if view == "overdue":
+        high = today
+    elif view == "week":
+        low, high = today, today + 7
+    elif view == "server":
+        where.append("server_name = ?")
+        params.append(server)
+    else:
+        raise ValueError(f"Unknown list view: {view}")
+    order = "due_day DESC, id DESC" if backward else "due_day ASC, id ASC"
+    if cursor is not None:
+        # Only the far side of the view still bounds the page. The near side
+        # is implied by the cursor (moved into the view first, in case the
+        # day has turned since the page was shown), and keeping it would make
+        # SQLite seek from the edge of the view and scan up to the cursor.
+        cursor = tuple(cursor)
+        if backward:
+            if high is not None:
+                cursor = min(cursor, (high, 0))
+            high = None
+        else:
+            if low is not None:
+                cursor = max(cursor, (low, 0))
+            low = None
+    if low is not None:
+        where.append("due_day >= ?")
+        params.append(low)
+    if high is not None:
+        where.append("due_day < ?")
+        params.append(high)
+    if cursor is None:
+        sql = f"SELECT {LIST_COLUMNS} FROM projects"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        return sql + f" ORDER BY {order} LIMIT ?", params + [limit]
+    # SQLite seeks on due_day alone for (due_day, id) > (?, ?), which still
+    # scans the cursor's whole day. The rest of that day and the days after
+    # it are two exact index seeks instead, merged in order.
+    op = "<" if backward else ">"
+    view_sql = "".join(f"{clause} AND " for clause in where)
+    sql = (
+        f"SELECT {LIST_COLUMNS} FROM projects WHERE {view_sql}due_day = ? AND id {op} ?"
+        f" UNION ALL SELECT {LIST_COLUMNS} FROM projects WHERE {view_sql}due_day {op} ?"
+        f" ORDER BY {order} LIMIT ?"
+    )
+    return sql, [*params, *cursor, *params, cursor[0], limit]
+
+
+def list_projects_page(
+    db_path: str,
+    view: str,
+    today: int,
+    limit: int,
+    cursor: tuple[int, int] | None = None,
+    backward: bool = False,
+    server: str | None = None,
+) -> list[dict]:
+    """Fetch one page of projects with keyset pagination.
+
+    The "all" view is ordered by newest id first and paginated on id. The
+    filtered views are ordered by (due_day, id) and use the due-date indexes, so
+    each page costs the same no matter how large the table is or how deep into
+    the view it starts. ``cursor`` is the (due_day, id) of the last row of the
+    previous page, or of the first row of the current page when going
+    ``backward``. Rows are always returned in display order.
+    """
+    sql, params = list_page_query(view, today, limit, cursor, backward, server)
+    with get_conn(db_path) as conn:
+        rows = [dict(r) for r in conn.execute(sql, params).fetchall()]
+    if backward:
+        rows.reverse()
+    return rows
+
+
+def fts_query(text: str) -> str | None:
+    """Turn user input into an FTS5 query: every word must match as a prefix.
+
+    Each word is quoted, so punctuation inside it (IPs, phone numbers) becomes
+    a phrase instead of FTS5 syntax.
+    """
+    terms = [
+        '"' + word.replace('"', '""') + '"*'
+        for word in text.split()
+        if any(ch.isalnum() for ch in word)
+    ]
+    return " ".join(terms) or None
+
+
+def find_projects(db_path: str, text: str, limit: int) -> list[dict]:
+    """Full-text search over name, server, owner, phone and IP, best matches first"""
+    query = fts_query(text)
+    if query is None:
+        return []
+    columns = ", ".join(f"p.{c.strip()}" for c in LIST_COLUMNS.split(","))
+    with get_conn(db_path) as conn:
+        rows = conn.execute(
+            f"""
+            SELECT {columns} FROM projects_fts
+            JOIN projects p ON p.id = projects_fts.rowid
+            WHERE projects_fts MATCH ?
+            ORDER BY projects_fts.rank
+            LIMIT ?
+            """,
+            (query, limit),
+        ).fetchall()
+        return [dict(r) for r in rows]
+
+
 def delete_project(db_path: str, project_id: int) -> bool:
     with get_conn(db_path) as conn:
         cur = conn.execute("DELETE FROM projects WHERE id = ?", (project_id,))
@@ -108,10 +672,9 @@ def get_due_projects(db_path: str, now: datetime):
     """Get projects that are due today or earlier"""
     with get_conn(db_path) as conn:
         # Compare dates only (ignore time part)
-        now_date = now.date().isoformat()
         rows = conn.execute(
-            "SELECT * FROM projects WHERE date(next_due_date) <= date(?)",
-            (now_date,),
+            "SELECT * FROM projects WHERE due_day <= ?",
+            (to_due_day(now),),
         ).fetchall()
         return [dict(r) for r in rows]
 
@@ -119,29 +682,541 @@ def get_due_projects(db_path: str, now: datetime):
 def get_projects_due_in_days(db_path: str, now: datetime, days: int):
     """Get projects that are due in exactly N days (for reminder notifications)"""
     with get_conn(db_path) as conn:
-        target_date = (now.date() + timedelta(days=days)).isoformat()
         rows = conn.execute(
-            "SELECT * FROM projects WHERE date(next_due_date) = date(?)",
-            (target_date,),
+            "SELECT * FROM projects WHERE due_day = ?",
+            (to_due_day(now) + days,),
         ).fetchall()
         return [dict(r) for r in rows]
 
 
-def bump_next_due_date(db_path: str, project_id: int):
+def get_projects_due_between(db_path: str, first_day: int, last_day: int):
+    """Get projects whose due day falls in [first_day, last_day], earliest first"""
+    with get_conn(db_path) as conn:
+        rows = conn.execute(
+            "SELECT * FROM projects WHERE due_day BETWEEN ? AND ? ORDER BY due_day, id",
+            (first_day, last_day),
+        ).fetchall()
+        return [dict(r) for r in rows]
+
+
+def get_projects_by_ids(db_path: str, project_ids: list[int]) -> list[dict]:
+    rows = []
+    with get_conn(db_path) as conn:
+        # Stay well below SQLite's bound-parameter limit
+        for start in range(0, len(project_ids), 500):
+            chunk = project_ids[start:start + 500]
+            placeholders = ", ".join("?" * len(chunk))
+            rows.extend(conn.execute(f"SELECT * FROM projects WHERE id IN ({placeholders})", chunk).fetchall())
+    return [dict(r) for r in rows]
+
+
+def get_schedule_rows(db_path: str) -> tuple[int, list[tuple[int, int, int | None, str | None]]]:
+    """(id, due_day, notify_hour, reminder_days) of every project, in due order from the due_day index.
+
+    Also returns the schedule change seq the rows include every change up to,
+    for get_schedule_changes. It is read first, so a change written in between
+    is in the rows and comes again from get_schedule_changes, which is harmless.
+    """
+    with get_conn(db_path) as conn:
+        seq = conn.execute("SELECT COALESCE(MAX(seq), 0) FROM schedule_changes").fetchone()[0]
+        cur = conn.cursor()
+        # Plain tuples: much cheaper than sqlite3.Row for 100k rows
+        cur.row_factory = None
+        rows = cur.execute(
+            "SELECT id, due_day, notify_hour, reminder_days FROM projects"
+            " WHERE due_day IS NOT NULL ORDER BY due_day"
+        ).fetchall()
+        return seq, rows
+
+
+def get_schedule_changes(
+    db_path: str, after_seq: int
+) -> tuple[int, list[tuple[int, int, int | None, str | None]], list[int]]:
+    """Projects whose schedule changed after change ``after_seq``, by any process.
+
+    Returns the last seq seen, the (id, due_day, notify_hour, reminder_days)
+    rows of the changed projects and the ids of those deleted. A seek on
+    idx_schedule_changes_seq, so a sync with nothing new reads no rows.
+    """
+    with get_conn(db_path) as conn:
+        cur = conn.cursor()
+        cur.row_factory = None
+        changed = cur.execute(
+            """
+            SELECT c.seq, c.project_id, p.due_day, p.notify_hour, p.reminder_days
+            FROM schedule_changes c LEFT JOIN projects p ON p.id = c.project_id
+            WHERE c.seq > ? ORDER BY c.seq
+            """,
+            (after_seq,),
+        ).fetchall()
+    rows = [row[1:] for row in changed if row[2] is not None]
+    deleted = [row[1] for row in changed if row[2] is None]
+    return (changed[-1][0] if changed else after_seq), rows, deleted
+
+
+def set_notify_hour(db_path: str, project_id: int, hour: int | None) -> int | None:
+    """Set (or with None, reset) a project's notification hour. Returns its due day, None if not found"""
+    with get_conn(db_path) as conn:
+        cur = conn.execute(
+            "UPDATE projects SET notify_hour = ?, version = version + 1 WHERE id = ?", (hour, project_id)
+        )
+        if cur.rowcount == 0:
+            return None
+        return conn.execute("SELECT due_day FROM projects WHERE id = ?", (project_id,)).fetchone()[0]
+
+
+def set_reminder_days(db_path: str, project_id: int, days: tuple[int, ...] | None) -> int | None:
+    """Set (or with None, reset) a project's reminder offsets. Returns its due day, None if not found"""
     with get_conn(db_path) as conn:
-        row = conn.execute("SELECT next_due_date FROM projects WHERE id = ?", (project_id,)).fetchone()
+        cur = conn.execute(
+            "UPDATE projects SET reminder_days = ?, version = version + 1 WHERE id = ?",
+            (format_reminder_days(days) if days else None, project_id),
+        )
+        if cur.rowcount == 0:
+            return None
+        return conn.execute("SELECT due_day FROM projects WHERE id = ?", (project_id,)).fetchone()[0]
+
+
+def get_reminder_candidates(db_path: str, today: int, default_days: tuple[int, ...]) -> list[dict]:
+    """Projects due within the largest reminder offset, earliest first.
+
+    One range query on the due_day index covers every offset. Each row carries
+    ``sent_days``: the offsets already recorded in reminders_sent for its
+    current due day (comma separated, or None).
+    """
+    with get_conn(db_path) as conn:
+        window = max(default_days, default=0)
+        # Per-project overrides are few and read from a partial index
+        for (text,) in conn.execute("SELECT DISTINCT reminder_days FROM projects WHERE reminder_days IS NOT NULL"):
+            window = max(window, *(parse_reminder_days(text) or (0,)))
+        if window <= 0:
+            return []
+        rows = conn.execute(
+            """
+            SELECT p.*, (
+                SELECT group_concat(r.days_before) FROM reminders_sent r
+                WHERE r.project_id = p.id AND r.due_day = p.due_day
+            ) AS sent_days
+            FROM projects p
+            WHERE p.due_day BETWEEN ? AND ?
+            ORDER BY p.due_day, p.id
+            """,
+            (today + 1, today + window),
+        ).fetchall()
+        return [dict(r) for r in rows]
+
+
+def get_reminder_candidates_by_ids(db_path: str, project_ids: list[int], today: int) -> list[dict]:
+    """get_reminder_candidates for just ``project_ids``, e.g. the ones whose timers fired.
+
+    Primary key lookups instead of the whole reminder window; rows carry the
+    same ``sent_days`` and only projects due after ``today`` are returned.
+    """
+    rows = []
+    with get_conn(db_path) as conn:
+        for start in range(0, len(project_ids), 500):
+            chunk = project_ids[start:start + 500]
+            placeholders = ", ".join("?" * len(chunk))
+            rows.extend(conn.execute(
+                f"""
+                SELECT p.*, (
+                    SELECT group_concat(r.days_before) FROM reminders_sent r
+                    WHERE r.project_id = p.id AND r.due_day = p.due_day
+                ) AS sent_days
+                FROM projects p
+                WHERE p.id IN ({placeholders}) AND p.due_day > ?
+                """,
+                (*chunk, today),
+            ).fetchall())
+    return sorted((dict(r) for r in rows), key=lambda item: (item["due_day"], item["id"]))
+
+
+def record_reminders_sent(
+    db_path: str,
+    entries: list[tuple[int, int, int]],
+    today: int,
+    messages: list[tuple[int, str, str | None]] = (),
+) -> None:
+    """Record (project_id, due_day, days_before) reminders as sent and forget ones for past due days.
+
+    ``messages`` are queued in the outbox in the same transaction, so a
+    reminder is either both recorded and queued or neither.
+    """
+    if not entries and not messages:
+        return
+    sent_at = datetime.now().isoformat()
+    with get_conn(db_path) as conn:
+        conn.executemany(
+            "INSERT OR IGNORE INTO reminders_sent (project_id, due_day, days_before, sent_at) VALUES (?, ?, ?, ?)",
+            ((project_id, due_day, days, sent_at) for project_id, due_day, days in entries),
+        )
+        conn.execute("DELETE FROM reminders_sent WHERE due_day <= ?", (today,))
+        _queue_messages(conn, messages, sent_at)
+
+
+def _queue_messages(conn: sqlite3.Connection, messages: list[tuple[int, str, str | None]], created_at: str) -> None:
+    conn.executemany(
+        "INSERT INTO outbox (chat_id, text, reply_markup, created_at) VALUES (?, ?, ?, ?)",
+        ((chat_id, text, markup, created_at) for chat_id, text, markup in messages),
+    )
+
+
+def enqueue_outbox(db_path: str, messages: list[tuple[int, str, str | None]]) -> None:
+    """Queue (chat_id, text, reply_markup_json) messages for app.outbox to deliver"""
+    if not messages:
+        return
+    with get_conn(db_path) as conn:
+        _queue_messages(conn, messages, datetime.now().isoformat())
+
+
+def fetch_outbox(db_path: str, limit: int, after_id: int = 0, max_attempts: int = 10) -> list[dict]:
+    """Oldest undelivered messages with an id above ``after_id`` that have not used up their attempts"""
+    with get_conn(db_path) as conn:
+        rows = conn.execute(
+            """
+            SELECT id, chat_id, text, reply_markup, attempts FROM outbox
+            WHERE delivered_at IS NULL AND id > ? AND attempts < ?
+            ORDER BY id LIMIT ?
+            """,
+            (after_id, max_attempts, limit),
+        ).fetchall()
+        return [dict(r) for r in rows]
+
+
+def finish_outbox(db_path: str, delivered_ids: list[int], failed_ids: list[int]) -> None:
+    """Mark sent messages: delivered rows get a timestamp, failed rows use up one attempt"""
+    if not delivered_ids and not failed_ids:
+        return
+    with get_conn(db_path) as conn:
+        conn.executemany(
+            "UPDATE outbox SET delivered_at = ?, attempts = attempts + 1 WHERE id = ?",
+            ((datetime.now().isoformat(), outbox_id) for outbox_id in delivered_ids),
+        )
+        conn.executemany(
+            "UPDATE outbox SET attempts = attempts + 1 WHERE id = ?",
+            ((outbox_id,) for outbox_id in failed_ids),
+        )
+
+
+def prune_outbox(db_path: str, before: datetime) -> int:
+    """Delete messages delivered before ``before``. Returns the number of rows removed"""
+    with get_conn(db_path) as conn:
+        cur = conn.execute(
+            "DELETE FROM outbox WHERE delivered_at IS NOT NULL AND delivered_at < ?", (before.isoformat(),)
+        )
+        return cur.rowcount
+
+
+def vacuum(db_path: str) -> None:
+    """Rebuild the file without its free pages, refresh planner statistics and empty the WAL"""
+    with get_conn(db_path) as conn:
+        conn.execute("VACUUM")
+        conn.execute("PRAGMA optimize")
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+
+def get_meta(db_path: str, key: str) -> str | None:
+    with get_conn(db_path) as conn:
+        row = conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+
+def set_meta(db_path: str, key: str, value: str) -> None:
+    with get_conn(db_path) as conn:
+        conn.execute(
+            "INSERT INTO meta (key, value) VALUES (?, ?) ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+            (key, value),
+        )
+
+
+def acquire_lease(db_path: str, name: str, holder: str, ttl: float, now: float) -> int | None:
+    """Take or renew lease ``name`` until ``now + ttl`` unless another holder's is still live.
+
+    Returns the lease token if ``holder`` holds it afterwards, else None. The
+    upsert and the check run in one write transaction, so of several
+    processes racing for an expired lease exactly one gets it.
+    """
+    with get_conn(db_path) as conn:
+        conn.execute(
+            """
+            INSERT INTO leases (name, holder, expires_at, token) VALUES (?, ?, ?, 1)
+            ON CONFLICT(name) DO UPDATE SET
+                token = token + (holder != excluded.holder),
+                holder = excluded.holder,
+                expires_at = excluded.expires_at
+            WHERE holder = excluded.holder OR expires_at <= ?
+            """,
+            (name, holder, now + ttl, now),
+        )
+        row = conn.execute("SELECT holder, token FROM leases WHERE name = ?", (name,)).fetchone()
+        return row["token"] if row["holder"] == holder else None
+
+
+def release_lease(db_path: str, name: str, holder: str) -> bool:
+    """Expire lease ``name`` now if ``holder`` has it, so the next candidate need not wait out the TTL"""
+    with get_conn(db_path) as conn:
+        cursor = conn.execute(
+            "UPDATE leases SET expires_at = 0 WHERE name = ? AND holder = ?", (name, holder)
+        )
+        return cursor.rowcount > 0
+
+
+def get_lease(db_path: str, name: str) -> dict | None:
+    with get_conn(db_path) as conn:
+        row = conn.execute("SELECT holder, expires_at, token FROM leases WHERE name = ?", (name,)).fetchone()
+        return dict(row) if row else None
+
+
+def load_fsm_record(db_path: str, key: str, not_before: float) -> tuple[str | None, str] | None:
+    """(state, data_json) stored for key, None if missing or last written before ``not_before``"""
+    with get_conn(db_path) as conn:
+        row = conn.execute(
+            "SELECT state, data FROM fsm_state WHERE key = ? AND updated_at >= ?", (key, not_before)
+        ).fetchone()
+        return (row[0], row[1]) if row else None
+
+
+def save_fsm_records(db_path: str, records: list[tuple[str, str | None, str | None, float]]) -> None:
+    """Write (key, state, data_json, updated_at) rows in one transaction; a None data_json deletes the row"""
+    if not records:
+        return
+    with get_conn(db_path) as conn:
+        conn.executemany(
+            """
+            INSERT INTO fsm_state (key, state, data, updated_at) VALUES (?, ?, ?, ?)
+            ON CONFLICT(key) DO UPDATE SET state = excluded.state, data = excluded.data,
+                                           updated_at = excluded.updated_at
+            """,
+            (record for record in records if record[2] is not None),
+        )
+        conn.executemany(
+            "DELETE FROM fsm_state WHERE key = ?",
+            ((record[0],) for record in records if record[2] is None),
+        )
+
+
+def expire_fsm_records(db_path: str, before: float) -> int:
+    """Forget conversations last touched before ``before``. Returns the number removed"""
+    with get_conn(db_path) as conn:
+        return conn.execute("DELETE FROM fsm_state WHERE updated_at < ?", (before,)).rowcount
+
+
+def _record_payments(
+    conn: sqlite3.Connection, advances: list[tuple[int, int, int]], paid_day: int, source: str
+) -> None:
+    """Write ledger rows for ``(project_id, current_due_day, new_due_day)`` moves.
+
+    Must run in the transaction that moves the projects, before the move. A
+    row is only written while the project is still on ``current_due_day`` and
+    actually moves; the amount is the fee prorated over the days covered, so
+    a move back (a corrected /editdue) is written as a negative amount.
+    """
+    conn.executemany(
+        f"""
+        INSERT INTO payments (project_id, owner_name, period_start, period_end, paid_day, amount, source)
+        SELECT id, owner_name, due_day, ?1, ?2, COALESCE(monthly_fee, 0) * (?1 - due_day) / {BILLING_CYCLE_DAYS}, ?3
+        FROM projects WHERE id = ?4 AND due_day = ?5 AND due_day != ?1
+        """,
+        (
+            (new_day, paid_day, source, project_id, current_day)
+            for project_id, current_day, new_day in advances
+        ),
+    )
+
+
+def bump_next_due_date(db_path: str, project_id: int, today: int | None = None) -> int | None:
+    """Move a project one billing cycle forward and record the payment.
+
+    ``today`` is the day it was paid, by default the current one. Returns the
+    new due day, None if not found.
+    """
+    with get_conn(db_path) as conn:
+        row = conn.execute("SELECT next_due_date, due_day FROM projects WHERE id = ?", (project_id,)).fetchone()
         if not row:
-            return False
+            return None
         current_due = datetime.fromisoformat(row["next_due_date"]) if row["next_due_date"] else datetime.now()
         # Add 30 days to the date part only, keeping time at midnight
-        new_due_date = current_due.date() + timedelta(days=30)
+        new_due_date = current_due.date() + timedelta(days=BILLING_CYCLE_DAYS)
         new_due = datetime.combine(new_due_date, datetime.min.time())
-        conn.execute("UPDATE projects SET next_due_date = ? WHERE id = ?", (new_due.isoformat(), project_id))
-        return True
+        paid_day = today if today is not None else to_due_day(datetime.now())
+        _record_payments(conn, [(project_id, row["due_day"], to_due_day(new_due_date))], paid_day, "bump")
+        conn.execute(
+            "UPDATE projects SET next_due_date = ?, due_day = ?, version = version + 1 WHERE id = ?",
+            (new_due.isoformat(), to_due_day(new_due_date), project_id),
+        )
+        return to_due_day(new_due_date)
+
+
+def next_cycle_due_day(due_day: int, today: int) -> int:
+    """First due day after today, moving forward in whole billing cycles"""
+    if due_day > today:
+        return due_day
+    cycles = (today - due_day) // BILLING_CYCLE_DAYS + 1
+    return due_day + cycles * BILLING_CYCLE_DAYS
+
+
+def advance_due_projects(
+    db_path: str,
+    advances: list[tuple[int, int, int]],
+    today: int,
+    messages: list[tuple[int, str]] | None = None,
+    source: str = ROLLOVER_SOURCE,
+) -> int:
+    """Move many projects to a new due day in one transaction.
+
+    ``advances`` holds ``(project_id, current_due_day, new_due_day)``. A row is
+    only updated if its due day still equals ``current_due_day``, so a due date
+    edited in the meantime is not overwritten. ``messages[i]`` is a
+    ``(chat_id, text)`` queued in the outbox for ``advances[i]``, only if that
+    project is actually moved. Every move goes into the payments ledger on
+    ``today`` as ``source``: by default the scheduler's roll-over, "paid" for
+    a payment. Returns the number of rows moved.
+    """
+    if not advances:
+        return 0
+    with get_conn(db_path) as conn:
+        _record_payments(conn, advances, today, source)
+        if messages:
+            created_at = datetime.now().isoformat()
+            conn.executemany(
+                """
+                INSERT INTO outbox (chat_id, text, project_id, created_at)
+                SELECT ?, ?, id, ? FROM projects WHERE id = ? AND due_day = ?
+                """,
+                (
+                    (chat_id, text, created_at, project_id, current_day)
+                    for (chat_id, text), (project_id, current_day, _) in zip(messages, advances)
+                ),
+            )
+        cur = conn.executemany(
+            """
+            UPDATE projects SET next_due_date = ?, due_day = ?, version = version + 1
+            WHERE id = ? AND due_day = ?
+            """,
+            (
+                (
+                    datetime.combine(from_due_day(new_day), datetime.min.time()).isoformat(),
+                    new_day,
+                    project_id,
+                    current_day,
+                )
+                for project_id, current_day, new_day in advances
+            ),
+        )
+        return cur.rowcount
+
+
+def mark_project_paid(db_path: str, project_id: int, due_day: int, today: int) -> int | None:
+    """Record the period due on ``due_day`` as paid.
 
+    The project moves at least one billing cycle forward and never stays in the
+    past. Returns the new due day, or None if the project is gone or its due day
+    has already changed.
+    """
+    new_day = max(due_day + BILLING_CYCLE_DAYS, next_cycle_due_day(due_day, today))
+    moved = advance_due_projects(db_path, [(project_id, due_day, new_day)], today, source="paid")
+    return new_day if moved else None
 
-def set_next_due_date(db_path: str, project_id: int, new_due: datetime) -> bool:
+
+def set_next_due_date(db_path: str, project_id: int, new_due: datetime, today: int | None = None) -> bool:
+    """Set a project's due date and record the move in the payments ledger (paid ``today``)"""
+    with get_conn(db_path) as conn:
+        row = conn.execute("SELECT due_day FROM projects WHERE id = ?", (project_id,)).fetchone()
+        if not row:
+            return False
+        paid_day = today if today is not None else to_due_day(datetime.now())
+        _record_payments(conn, [(project_id, row["due_day"], to_due_day(new_due))], paid_day, "editdue")
+        cur = conn.execute(
+            "UPDATE projects SET next_due_date = ?, due_day = ?, version = version + 1 WHERE id = ?",
+            (new_due.isoformat(), to_due_day(new_due), project_id),
+        )
+        return cur.rowcount > 0
+
+
+def set_monthly_fee(db_path: str, project_id: int, fee: int | None) -> bool:
     with get_conn(db_path) as conn:
-        cur = conn.execute("UPDATE projects SET next_due_date = ? WHERE id = ?", (new_due.isoformat(), project_id))
+        cur = conn.execute(
+            "UPDATE projects SET monthly_fee = ?, version = version + 1 WHERE id = ?", (fee, project_id)
+        )
         return cur.rowcount > 0
 
+
+# Recorded payments, as opposed to the scheduler's roll-overs
+PAID = f"source != '{ROLLOVER_SOURCE}'"
+# Payments that cover time forward; a corrected /editdue moving a date back is not late
+LATE = f"{PAID} AND period_end > period_start AND paid_day > period_start"
+
+
+def revenue_by_month(db_path: str, first_day: int, last_day: int) -> list[dict]:
+    """Per calendar month of paid_day in [first_day, last_day]: payments, amount and late payments.
+
+    ``payments`` and ``amount`` count recorded payments only; ``rolled_over``
+    and ``rolled_over_amount`` are the due dates the scheduler moved on without
+    one. An index-only range scan on idx_payments_paid_day.
+    """
+    with get_conn(db_path) as conn:
+        rows = conn.execute(
+            f"""
+            SELECT strftime('%Y-%m', paid_day * 86400, 'unixepoch') AS month,
+                   SUM({PAID}) AS payments, SUM(({PAID}) * amount) AS amount, SUM({LATE}) AS late,
+                   SUM(NOT ({PAID})) AS rolled_over, SUM((NOT ({PAID})) * amount) AS rolled_over_amount
+            FROM payments WHERE paid_day BETWEEN ? AND ?
+            GROUP BY month ORDER BY month
+            """,
+            (first_day, last_day),
+        ).fetchall()
+        return [dict(r) for r in rows]
+
+
+def overdue_summary(db_path: str, today: int) -> dict:
+    """Projects past their due day, by how long, and the fees they owe (whole cycles started).
+
+    ``rolled_over`` projects were moved past today by the scheduler without a
+    recorded payment, owing ``rolled_over_amount``. Two index-only scans, on
+    idx_projects_due_fee and idx_payments_source.
+    """
+    with get_conn(db_path) as conn:
+        row = conn.execute(
+            f"""
+            SELECT COUNT(*) AS projects,
+                   COALESCE(SUM(due_day >= ?1 - 7), 0) AS week,
+                   COALESCE(SUM(due_day < ?1 - 7 AND due_day >= ?1 - {BILLING_CYCLE_DAYS}), 0) AS month,
+                   COALESCE(SUM(due_day < ?1 - {BILLING_CYCLE_DAYS}), 0) AS older,
+                   COALESCE(SUM(COALESCE(monthly_fee, 0) * ((?1 - due_day - 1) / {BILLING_CYCLE_DAYS} + 1)), 0)
+                       AS owed
+            FROM projects WHERE due_day < ?1
+            """,
+            (today,),
+        ).fetchone()
+        rolled = conn.execute(
+            f"""
+            SELECT COUNT(*) AS rolled_over, COALESCE(SUM(amount), 0) AS rolled_over_amount
+            FROM payments WHERE source = '{ROLLOVER_SOURCE}' AND period_end > ?
+            """,
+            (today,),
+        ).fetchone()
+        return {**dict(row), **dict(rolled)}
+
+
+def owner_lateness(db_path: str, since_day: int, limit: int) -> list[dict]:
+    """Owners with late payments since ``since_day``, most late payments first.
+
+    Each row has the owner's payments, late payments and the average and
+    largest delay in days. Roll-overs are left out: their day is when the
+    scheduler ran, not when anyone paid. Grouped in idx_payments_owner order
+    without touching the table.
+    """
+    with get_conn(db_path) as conn:
+        rows = conn.execute(
+            f"""
+            SELECT owner_name, COUNT(*) AS payments, SUM(paid_day > period_start) AS late,
+                   AVG(MAX(paid_day - period_start, 0)) AS avg_days_late,
+                   MAX(paid_day - period_start) AS max_days_late
+            FROM payments WHERE paid_day >= ? AND period_end > period_start AND {PAID}
+            GROUP BY owner_name HAVING late > 0
+            ORDER BY late DESC, avg_days_late DESC, owner_name LIMIT ?
+            """,
+            (since_day, limit),
+        ).fetchall()
+        return [dict(r) for r in rows]
+
@@ -0,0 +1,79 @@
+from aiogram.filters.callback_data import CallbackData
+from aiogram.types import InlineKeyboardMarkup
+from aiogram.utils.keyboard import InlineKeyboardBuilder
+
+from .render import digest_line, truncate
+
+
+# Telegram limits for one message
+MESSAGE_LIMIT = 4096
+MAX_BUTTONS = 100
+BUTTONS_PER_ROW = 4
+
+
+class PaidCallback(CallbackData, prefix="paid"):
+    project_id: int
+    # Due day the button was rendered for, so a second press does not pay twice
+    due_day: int
+
+
+def digest_sections(overdue: list[dict], due_today: list[dict], upcoming: list[dict], days_ahead: int):
+    """Yield (line, item) pairs; headers have no item"""
+    sections = (
+        (f"🔴 Muddati o'tgan ({len(overdue)})", overdue),
+        (f"🟠 Bugun to'lanadi ({len(due_today)})", due_today),
+        (f"⚠️ {days_ahead} kun ichida ({len(upcoming)})", upcoming),
+    )
+    for header, items in sections:
+        if not items:
+            continue
+        yield header, None
+        for item in items:
+            yield digest_line(item), item
+
+
+def pack_digest(lines, limit: int = MESSAGE_LIMIT) -> list[tuple[str, list[dict]]]:
+    """Pack lines into as few messages as possible.
+
+    Messages are only broken between lines and carry at most MAX_BUTTONS items,
+    one inline button each. A line longer than the limit is cut on its own.
+    """
+    messages = []
+    current: list[str] = []
+    items: list[dict] = []
+    size = 0
+    for line, item in lines:
+        if len(line) > limit:
+            line = truncate(line, limit, "…")
+        extra = len(line) + (1 if current else 0)
+        if current and (size + extra > limit or (item is not None and len(items) >= MAX_BUTTONS)):
+            messages.append(("\n".join(current), items))
+            current, items, size = [], [], 0
+            extra = len(line)
+        current.append(line)
+        size += extra
+        if item is not None:
+            items.append(item)
+    if current:
+        messages.append(("\n".join(current), items))
+    return messages
+
+
+def paid_keyboard(items: list[dict]) -> InlineKeyboardMarkup | None:
+    if not items:
+        return None
+    kb = InlineKeyboardBuilder()
+    for item in items:
+        kb.button(
+            text=f"✅ #{item['id']}",
+            callback_data=PaidCallback(project_id=item["id"], due_day=item["due_day"]),
+        )
+    kb.adjust(BUTTONS_PER_ROW)
+    return kb.as_markup()
+
+
+def render_digest(
+    overdue: list[dict], due_today: list[dict], upcoming: list[dict], days_ahead: int
+) -> list[tuple[str, InlineKeyboardMarkup | None]]:
+    lines = digest_sections(overdue, due_today, upcoming, days_ahead)
+    return [(text, paid_keyboard(items)) for text, items in pack_digest(lines)]
@@ -0,0 +1,141 @@
+import asyncio
+import logging
+import os
+import socket
+import time
+import uuid
+from typing import Awaitable, Callable
+
+from .config import DEFAULT_LEASE_TTL
+from .repo import AsyncRepository
+
+
+logger = logging.getLogger(__name__)
+
+SCHEDULER_LEASE = "scheduler"
+
+
+def default_holder() -> str:
+    # Unique per process, and says in the leases table which replica it is
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+class LeaderElection:
+    """Lease-based leader election among replicas sharing one database.
+
+    Every ``heartbeat`` seconds each replica tries to take or renew the lease
+    row ``name`` for ``ttl`` seconds; the database lets exactly one holder
+    have a live lease. The replica that gets it awaits ``on_elected()``, one
+    that loses it awaits ``on_deposed()``. Both callbacks should return
+    quickly and start long work in a task of their own, or they delay the
+    heartbeat.
+
+    A leader that cannot renew in time (database errors, a stalled event
+    loop) steps down one heartbeat before its lease could run out, so two
+    replicas never act as leader at the same time. ``is_leader`` turns false
+    the moment the lease may have expired, even before the next heartbeat
+    notices: work done only while it is true is never done by two replicas.
+
+    If the leader dies, its lease expires and a follower takes over within
+    ``ttl + heartbeat`` seconds. ``close()`` steps down and releases the
+    lease, so on a clean shutdown a follower takes over at its next heartbeat.
+    """
+
+    def __init__(
+        self,
+        repo: AsyncRepository,
+        on_elected: Callable[[], Awaitable[None]],
+        on_deposed: Callable[[], Awaitable[None]],
+        name: str = SCHEDULER_LEASE,
+        holder: str | None = None,
+        ttl: float = DEFAULT_LEASE_TTL,
+        heartbeat: float | None = None,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.repo = repo
+        self.on_elected = on_elected
+        self.on_deposed = on_deposed
+        self.name = name
+        self.holder = holder or default_holder()
+        self.ttl = ttl
+        self.heartbeat = heartbeat or ttl / 3
+        if self.heartbeat * 2 > ttl:
+            raise ValueError("heartbeat must be at most half the lease TTL")
+        # Wall clock written to the shared table; every replica must agree on it
+        self.clock = clock
+        # Grows with every change of holder; logged to tell terms apart
+        self.token: int | None = None
+        # time.monotonic() after which the lease may have expired
+        self._expires = 0.0
+        self._task: asyncio.Task | None = None
+
+    @property
+    def is_leader(self) -> bool:
+        return self.token is not None and time.monotonic() < self._expires
+
+    def start(self) -> None:
+        if self._task is not None:
+            return
+        self._task = asyncio.create_task(self._run(), name="leader-election")
+
+    async def close(self) -> None:
+        """Stop campaigning; step down and release the lease if held"""
+        if self._task is None:
+            return
+        task, self._task = self._task, None
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        if self.token is None:
+            return
+        await self._depose("shutting down")
+        try:
+            await self.repo.release_lease(self.name, self.holder)
+        except Exception:
+            logger.exception("Leader election: releasing the lease failed; it expires in %.0f s", self.ttl)
+
+    async def _run(self) -> None:
+        while True:
+            await self.poll()
+            await asyncio.sleep(self.heartbeat)
+
+    async def poll(self) -> bool:
+        """Take or renew the lease once and run the callbacks. Returns is_leader"""
+        if self.token is not None and time.monotonic() >= self._expires - self.heartbeat:
+            # Slept through the heartbeats (paused process, blocked loop): stop before anything else runs
+            await self._depose("lease not renewed in time")
+        started = time.monotonic()
+        try:
+            # A call stuck behind a locked database must not outlive the lease
+            token = await asyncio.wait_for(
+                self.repo.acquire_lease(self.name, self.holder, self.ttl, self.clock()), self.heartbeat
+            )
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Leader election: renewing lease %r failed", self.name)
+            if self.token is not None and time.monotonic() >= self._expires - self.heartbeat:
+                await self._depose("lease not renewed in time")
+            return self.is_leader
+        if token is None:
+            if self.token is not None:
+                await self._depose("lease taken over")
+            return False
+        self._expires = started + self.ttl
+        if self.token != token:
+            if self.token is not None:
+                await self._depose("lease taken over in between")
+            self.token = token
+            logger.info("Leader election: %s is the leader of %r (term %d)", self.holder, self.name, token)
+            try:
+                await self.on_elected()
+            except Exception:
+                logger.exception("Leader election: starting the leader's work failed")
+        return self.is_leader
+
+    async def _depose(self, reason: str) -> None:
+        logger.warning("Leader election: %s steps down as leader of %r: %s", self.holder, self.name, reason)
+        self.token = None
+        try:
+            await self.on_deposed()
+        except Exception:
+            logger.exception("Leader election: stopping the leader's work failed")
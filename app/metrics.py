@@ -0,0 +1,215 @@
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Any, Awaitable, Callable, Iterator
+
+
+# Upper bounds in seconds, from a cached SQLite read to a slow Telegram call
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+PREFIX = "reminder_bot_"
+METRICS_PATH = "/metrics"
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _number(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class Counter:
+    """Monotonic counts by one label. Only updated from the event loop thread"""
+
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, label: str):
+        self.name = name
+        self.help = help
+        self.label = label
+        self.values: dict[str, float] = {}
+
+    def inc(self, label_value: str, amount: float = 1) -> None:
+        self.values[label_value] = self.values.get(label_value, 0) + amount
+
+    def samples(self) -> Iterator[str]:
+        for value, count in sorted(self.values.items()):
+            yield f'{self.name}{{{self.label}="{_escape(value)}"}} {_number(count)}'
+
+
+class _Series:
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self, buckets: int):
+        # One slot per bucket plus +Inf; cumulated only when rendered
+        self.counts = [0] * (buckets + 1)
+        self.sum = 0.0
+        self.count = 0
+
+
+class Histogram:
+    """Durations by one label in fixed buckets. Only updated from the event loop thread"""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, label: str, buckets: tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.label = label
+        self.buckets = buckets
+        self.series: dict[str, _Series] = {}
+
+    def observe(self, label_value: str, value: float) -> None:
+        series = self.series.get(label_value)
+        if series is None:
+            series = self.series[label_value] = _Series(len(self.buckets))
+        series.counts[bisect_left(self.buckets, value)] += 1
+        series.sum += value
+        series.count += 1
+
+    def quantile(self, label_value: str, q: float) -> float | None:
+        """Upper bound of the bucket holding the q-quantile; None without data or above the last bucket"""
+        series = self.series.get(label_value)
+        if series is None or not series.count:
+            return None
+        rank = q * series.count
+        seen = 0
+        for bound, count in zip(self.buckets, series.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return None
+
+    def samples(self) -> Iterator[str]:
+        for value, series in sorted(self.series.items()):
+            label = f'{self.label}="{_escape(value)}"'
+            seen = 0
+            for bound, count in zip(self.buckets, series.counts):
+                seen += count
+                yield f'{self.name}_bucket{{{label},le="{_number(bound)}"}} {seen}'
+            yield f'{self.name}_bucket{{{label},le="+Inf"}} {series.count}'
+            yield f"{self.name}_sum{{{label}}} {repr(series.sum)}"
+            yield f"{self.name}_count{{{label}}} {series.count}"
+
+
+class Observed:
+    """Values read from a callback when rendered, so the hot path costs nothing.
+
+    ``read`` returns a number, or a dict of label value to number when
+    ``label`` is set.
+    """
+
+    def __init__(self, name: str, help: str, kind: str, read: Callable[[], Any], label: str | None = None):
+        self.name = name
+        self.help = help
+        self.kind = kind
+        self.read = read
+        self.label = label
+
+    def samples(self) -> Iterator[str]:
+        value = self.read()
+        if self.label is None:
+            yield f"{self.name} {_number(value)}"
+            return
+        for label_value, number in sorted(value.items()):
+            yield f'{self.name}{{{self.label}="{_escape(label_value)}"}} {_number(number)}'
+
+
+class Metrics:
+    """The bot's metrics, rendered in the Prometheus text format"""
+
+    def __init__(self):
+        self.started_at = time.time()
+        self.handler_seconds = Histogram(PREFIX + "handler_seconds", "Update handler duration", "handler")
+        self.handler_errors = Counter(PREFIX + "handler_errors_total", "Update handlers that raised", "handler")
+        self.rejected_updates = Counter(
+            PREFIX + "rejected_updates_total", "Updates dropped by the access middleware", "reason"
+        )
+        self.db_seconds = Histogram(
+            PREFIX + "db_seconds", "app.db call duration on the DB worker thread", "function"
+        )
+        self.db_errors = Counter(PREFIX + "db_errors_total", "app.db calls that raised", "function")
+        self.job_seconds = Histogram(PREFIX + "job_seconds", "Scheduler job duration", "job")
+        self.job_items = Counter(PREFIX + "job_items_total", "Messages queued by scheduler jobs", "job")
+        self.job_errors = Counter(PREFIX + "job_errors_total", "Scheduler jobs that raised", "job")
+        self.observed: list[Observed] = [
+            Observed(PREFIX + "uptime_seconds", "Seconds since start", "gauge", lambda: time.time() - self.started_at),
+        ]
+
+    def add_observed(self, metric: Observed) -> None:
+        self.observed = [m for m in self.observed if m.name != metric.name] + [metric]
+
+    @contextmanager
+    def job(self, name: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        except Exception:
+            self.job_errors.inc(name)
+            raise
+        finally:
+            self.job_seconds.observe(name, time.perf_counter() - started)
+
+    def render(self) -> str:
+        lines = []
+        for metric in (
+            self.handler_seconds, self.handler_errors, self.rejected_updates, self.db_seconds, self.db_errors,
+            self.job_seconds, self.job_items, self.job_errors, *self.observed,
+        ):
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+# Shared by every component, like a logging logger
+METRICS = Metrics()
+
+
+class HandlerMetricsMiddleware:
+    """aiogram middleware timing every handler call.
+
+    Register it as an inner middleware (``dp.message.middleware(...)``) so the
+    chosen handler is known. It is a plain callable rather than a
+    BaseMiddleware so that importing this module (the repository does) does
+    not import aiogram.
+    """
+
+    def __init__(self, metrics: Metrics = METRICS):
+        self.metrics = metrics
+
+    async def __call__(
+        self,
+        handler: Callable[[Any, dict[str, Any]], Awaitable[Any]],
+        event: Any,
+        data: dict[str, Any],
+    ) -> Any:
+        name = data["handler"].callback.__name__
+        started = time.perf_counter()
+        try:
+            return await handler(event, data)
+        except Exception:
+            self.metrics.handler_errors.inc(name)
+            raise
+        finally:
+            self.metrics.handler_seconds.observe(name, time.perf_counter() - started)
+
+
+async def metrics_endpoint(request):
+    from aiohttp import web
+
+    return web.Response(body=request.app["metrics"].render().encode(), headers={"Content-Type": CONTENT_TYPE})
+
+
+async def start_metrics_server(host: str, port: int, metrics: Metrics = METRICS):
+    """Serve METRICS_PATH for Prometheus; returns the aiohttp AppRunner to clean up on shutdown"""
+    from aiohttp import web
+
+    app = web.Application()
+    app["metrics"] = metrics
+    app.router.add_get(METRICS_PATH, metrics_endpoint)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    return runner
@@ -0,0 +1,203 @@
+import asyncio
+import logging
+from dataclasses import dataclass
+from typing import Any, Callable
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramNetworkError, TelegramRetryAfter, TelegramServerError
+
+from .config import DEFAULT_GLOBAL_RATE, DEFAULT_PER_CHAT_RATE, DEFAULT_WORKERS
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_ATTEMPTS = 6
+DEFAULT_BASE_BACKOFF = 0.5
+MAX_BACKOFF = 60.0
+
+
+class TokenBucket:
+    """Token bucket refilled continuously at ``rate`` tokens per second"""
+
+    def __init__(self, rate: float, capacity: float | None = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated: float | None = None
+
+    def _refill(self, now: float) -> None:
+        if self._updated is not None:
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def delay(self, now: float) -> float:
+        """Seconds until one token is available (0 if it is available now)"""
+        self._refill(now)
+        if self._tokens >= 1:
+            return 0.0
+        return (1 - self._tokens) / self.rate
+
+    def take(self, now: float) -> None:
+        self._refill(now)
+        self._tokens -= 1
+
+
+@dataclass
+class NotifierStats:
+    queued: int = 0
+    sent: int = 0
+    retried: int = 0
+    failed: int = 0
+    withdrawn: int = 0
+
+
+@dataclass
+class _Outgoing:
+    chat_id: int
+    text: str
+    kwargs: dict[str, Any]
+    future: asyncio.Future
+    may_send: Callable[[], bool] | None = None
+
+
+class Notifier:
+    """Outbound message queue in front of Bot.send_message.
+
+    Messages are delivered by a fixed number of worker tasks under a global and
+    a per-chat token bucket. Flood errors pause every worker for the
+    ``retry_after`` Telegram asks for; network and server errors are retried
+    with exponential backoff.
+    """
+
+    def __init__(
+        self,
+        bot: Bot,
+        workers: int = DEFAULT_WORKERS,
+        global_rate: float = DEFAULT_GLOBAL_RATE,
+        per_chat_rate: float = DEFAULT_PER_CHAT_RATE,
+        max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+        base_backoff: float = DEFAULT_BASE_BACKOFF,
+    ):
+        self.bot = bot
+        self.workers = workers
+        self.per_chat_rate = per_chat_rate
+        self.max_attempts = max_attempts
+        self.base_backoff = base_backoff
+        self.stats = NotifierStats()
+        self._global = TokenBucket(global_rate)
+        self._chats: dict[int, TokenBucket] = {}
+        self._paused_until = 0.0
+        self._queue: asyncio.Queue[_Outgoing] = asyncio.Queue()
+        self._tasks: list[asyncio.Task] = []
+        # Futures of the messages a worker has started sending
+        self._delivering: set[asyncio.Future] = set()
+
+    def start(self) -> None:
+        if self._tasks:
+            return
+        self._tasks = [
+            asyncio.create_task(self._worker(), name=f"notifier-{i}") for i in range(self.workers)
+        ]
+
+    async def close(self, timeout: float = 10.0) -> None:
+        """Give queued messages up to ``timeout`` seconds to go out, then stop the workers"""
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning("Notifier closed with %d undelivered messages", self._queue.qsize())
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    @property
+    def pending(self) -> int:
+        """Messages queued and not yet picked up by a worker"""
+        return self._queue.qsize()
+
+    def send(
+        self, chat_id: int, text: str, may_send: Callable[[], bool] | None = None, **kwargs
+    ) -> asyncio.Future:
+        """Queue a message; the returned future resolves to True once delivered, False if given up.
+
+        ``may_send`` is asked right before every attempt; once it returns
+        False the message is dropped and the future resolves to None.
+        Cancelling the future before its first attempt (see ``withdraw()``)
+        drops it unsent too.
+        """
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait(_Outgoing(chat_id, text, kwargs, future, may_send))
+        self.stats.queued += 1
+        return future
+
+    def withdraw(self, future: asyncio.Future) -> bool:
+        """Cancel a message not sent yet, even once; False if it is being or was delivered"""
+        if future.done() or future in self._delivering:
+            return False
+        return future.cancel()
+
+    async def _worker(self) -> None:
+        while True:
+            item = await self._queue.get()
+            if item.future.cancelled():
+                # Withdrawn, or its sender stopped waiting, before a worker got to it
+                self.stats.withdrawn += 1
+                self._queue.task_done()
+                continue
+            try:
+                delivered = await self._deliver(item)
+            except asyncio.CancelledError:
+                if not item.future.done():
+                    item.future.set_result(False)
+                raise
+            finally:
+                self._delivering.discard(item.future)
+                self._queue.task_done()
+            if not item.future.done():
+                item.future.set_result(delivered)
+
+    async def _acquire(self, chat_id: int) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            now = loop.time()
+            wait = self._paused_until - now
+            if wait <= 0:
+                chat = self._chats.get(chat_id)
+                if chat is None:
+                    chat = self._chats[chat_id] = TokenBucket(self.per_chat_rate, capacity=1.0)
+                wait = max(chat.delay(now), self._global.delay(now))
+                if wait <= 0:
+                    chat.take(now)
+                    self._global.take(now)
+                    return
+            await asyncio.sleep(wait)
+
+    async def _deliver(self, item: _Outgoing) -> bool | None:
+        loop = asyncio.get_running_loop()
+        for attempt in range(self.max_attempts):
+            await self._acquire(item.chat_id)
+            if item.future.cancelled() or (item.may_send is not None and not item.may_send()):
+                # Withdrawn while waiting for its turn, or its sender may no longer send
+                self.stats.withdrawn += 1
+                return None
+            self._delivering.add(item.future)
+            try:
+                await self.bot.send_message(chat_id=item.chat_id, text=item.text, **item.kwargs)
+            except TelegramRetryAfter as exc:
+                # Flood control applies to the whole bot, so every worker waits
+                delay = max(float(exc.retry_after), self.base_backoff * 2 ** attempt)
+                self._paused_until = max(self._paused_until, loop.time() + delay)
+            except (TelegramNetworkError, TelegramServerError) as exc:
+                delay = min(MAX_BACKOFF, self.base_backoff * 2 ** attempt)
+                logger.warning("Send to %s failed (%s), retrying in %.1fs", item.chat_id, exc, delay)
+                await asyncio.sleep(delay)
+            except Exception:
+                logger.exception("Send to %s failed permanently", item.chat_id)
+                break
+            else:
+                self.stats.sent += 1
+                return True
+            if attempt + 1 < self.max_attempts:
+                self.stats.retried += 1
+        self.stats.failed += 1
+        return False
@@ -0,0 +1,167 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Callable
+
+from aiogram.types import InlineKeyboardMarkup
+
+from .notifier import Notifier
+from .render import PARSE_MODE
+from .repo import AsyncRepository
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 100
+# Retry undelivered rows this often even if nothing new was queued
+DEFAULT_POLL_INTERVAL = 60.0
+DEFAULT_MAX_ATTEMPTS = 10
+# Delivered rows are kept this long for troubleshooting, then pruned on startup
+KEEP_DELIVERED_DAYS = 30
+
+
+def lease_batch_size(per_chat_rate: float, heartbeat: float, limit: int = DEFAULT_BATCH_SIZE) -> int:
+    """Rows one chat can be sent within a lease heartbeat: the most an outbox batch of a leader should hold"""
+    return max(1, min(limit, int(per_chat_rate * heartbeat)))
+
+
+def markup_json(markup: InlineKeyboardMarkup | None) -> str | None:
+    return markup.model_dump_json(exclude_none=True) if markup is not None else None
+
+
+class OutboxWorker:
+    """Delivers the messages the scheduler queued in the outbox table.
+
+    The scheduler writes a message in the same transaction as the due date
+    bump or reminder it belongs to, so after a crash nothing is lost: on start
+    the worker resumes with whatever is still undelivered, without looking at
+    projects again. Rows are read in batches in id order and handed to the
+    Notifier; each one is marked delivered (or charged one attempt) as soon as
+    its send returns.
+
+    Delivery is at-least-once. Stopping through ``close()`` withdraws the
+    messages no notifier worker has picked up, which stay undelivered, and
+    waits for the ones being sent to be marked, so a clean restart repeats
+    nothing unless that wait times out. A hard crash repeats only the messages
+    sent but not yet marked, at most one per notifier worker.
+
+    With several replicas only the leader delivers: ``may_send`` is checked
+    before every batch and by the notifier before every attempt, so a leader
+    that lost its lease stops mid-batch; the rows it did not send stay
+    undelivered for the next leader. Size batches with lease_batch_size.
+    """
+
+    def __init__(
+        self,
+        repo: AsyncRepository,
+        notifier: Notifier,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        poll_interval: float = DEFAULT_POLL_INTERVAL,
+        max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+        may_send: Callable[[], bool] | None = None,
+    ):
+        self.repo = repo
+        self.notifier = notifier
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.may_send = may_send
+        self._wakeup = asyncio.Event()
+        self._task: asyncio.Task | None = None
+
+    def start(self) -> None:
+        if self._task is not None:
+            return
+        self._task = asyncio.create_task(self._run(), name="outbox")
+
+    def wake(self) -> None:
+        """Drain now instead of at the next poll; call after queueing messages"""
+        self._wakeup.set()
+
+    async def close(self, timeout: float = 10.0) -> None:
+        """Stop once the messages being sent are marked, giving up after ``timeout`` seconds.
+
+        Messages of the batch not yet picked up by a notifier worker are
+        withdrawn; they are sent after the next start, by this or another replica.
+        """
+        if self._task is None:
+            return
+        task, self._task = self._task, None
+        task.cancel()
+        try:
+            await asyncio.wait_for(task, timeout)
+        except asyncio.TimeoutError:
+            logger.warning("Outbox closed before its last sends were marked; they will be sent again")
+        except asyncio.CancelledError:
+            pass
+
+    async def _run(self) -> None:
+        try:
+            await self.repo.prune_outbox(datetime.now() - timedelta(days=KEEP_DELIVERED_DAYS))
+        except Exception:
+            logger.exception("Outbox: pruning delivered messages failed")
+        while True:
+            self._wakeup.clear()
+            try:
+                await self.drain()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Outbox: draining failed")
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def drain(self) -> int:
+        """Try every undelivered message once. Returns how many were delivered"""
+        delivered = 0
+        after_id = 0
+        while True:
+            rows = await self.repo.fetch_outbox(self.batch_size, after_id, self.max_attempts)
+            if not rows:
+                return delivered
+            after_id = rows[-1]["id"]
+            if self.may_send is not None and not self.may_send():
+                return delivered
+            delivered += await self._send_batch(rows)
+
+    async def _send_batch(self, rows: list[dict]) -> int:
+        # With return_exceptions, a cancelled gather waits for every _send to
+        # withdraw or mark its row instead of returning at the first one
+        outcomes = await asyncio.gather(*(self._send(row) for row in rows), return_exceptions=True)
+        for outcome in outcomes:
+            if isinstance(outcome, BaseException):
+                raise outcome
+        return sum(outcomes)
+
+    async def _send(self, row: dict) -> bool:
+        # Queued texts are HTML, rendered by app.render
+        kwargs = {"parse_mode": PARSE_MODE}
+        if row["reply_markup"]:
+            kwargs["reply_markup"] = InlineKeyboardMarkup.model_validate_json(row["reply_markup"])
+        future = self.notifier.send(row["chat_id"], row["text"], may_send=self.may_send, **kwargs)
+        try:
+            ok = await asyncio.shield(future)
+        except asyncio.CancelledError:
+            # Stopping: unless a worker is already sending it, the message is
+            # withdrawn and stays undelivered; otherwise record how it went
+            if self.notifier.withdraw(future):
+                raise
+            await self._finish(row, await asyncio.shield(future))
+            raise
+        await self._finish(row, ok)
+        return bool(ok)
+
+    async def _finish(self, row: dict, ok: bool | None) -> None:
+        if ok is None:
+            # Dropped unsent once may_send turned false; the next leader sends it
+            return
+        # Marked as soon as it is sent, not with the rest of its batch: a crash
+        # repeats only the sends whose mark had not been written yet
+        if ok:
+            await self.repo.finish_outbox([row["id"]], [])
+        else:
+            if row["attempts"] + 1 >= self.max_attempts:
+                logger.error("Outbox: giving up on message %s to %s", row["id"], row["chat_id"])
+            await self.repo.finish_outbox([], [row["id"]])
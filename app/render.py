@@ -0,0 +1,186 @@
+"""
+Project cards and notification texts, shared by the bot, the scheduler and the digest.
+
+Texts are written for Telegram's HTML parse mode: every value is escaped as
+it is filled in, so a project called "<b>" or "R&D" arrives as typed. Send
+them with ``parse_mode=PARSE_MODE``. Each template is parsed once, when this
+module is imported, and dates come from the stored due day instead of
+reparsing next_due_date.
+"""
+
+from collections import OrderedDict
+from functools import lru_cache
+from string import Formatter
+from typing import Any, Mapping
+
+from .db import from_due_day
+
+
+PARSE_MODE = "HTML"
+MISSING = "N/A"
+DEFAULT_CARD_CACHE_SIZE = 4096
+CARD_SEPARATOR = "─" * 30
+# Longest entity escape() produces: &amp;
+MAX_ENTITY_LENGTH = 5
+
+
+@lru_cache(maxsize=4096)
+def format_day(due_day: int | None) -> str:
+    """dd.mm.yyyy of a due day; every date shown to users goes through here"""
+    return from_due_day(due_day).strftime("%d.%m.%Y") if due_day is not None else MISSING
+
+
+def escape(value: Any) -> str:
+    """A value as HTML-mode text; None and empty strings read N/A"""
+    if value is None or value == "":
+        return MISSING
+    # html.escape(quote=False), minus a call; Telegram only needs these three escaped
+    return str(value).replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+
+
+def truncate(text: str, limit: int, suffix: str = "") -> str:
+    """Cut HTML-mode text to ``limit`` characters, ending in ``suffix``, without splitting an entity"""
+    if len(text) <= limit:
+        return text
+    text = text[: limit - len(suffix)]
+    amp = text.rfind("&", len(text) - MAX_ENTITY_LENGTH + 1)
+    if amp != -1 and ";" not in text[amp:]:
+        text = text[:amp]
+    return text + suffix
+
+
+class Template:
+    """A str.format-style template with named fields, compiled once into a function.
+
+    The template becomes one f-string, so rendering costs what a hand-written
+    f-string does. Literal text is kept as is and every field is escaped.
+    ``due`` is the item's due day through format_day; the names in ``extra``
+    are passed to ``render`` as keywords, every other field is read from the
+    item (a missing one reads N/A).
+    """
+
+    def __init__(self, text: str, extra: tuple[str, ...] = ()):
+        namespace: dict[str, Any] = {"escape": escape, "format_day": format_day}
+        fields = []
+        pieces = []
+        for i, (literal, name, spec, conversion) in enumerate(Formatter().parse(text)):
+            if literal:
+                namespace[f"_{i}"] = literal
+                pieces.append(f"{{_{i}}}")
+            if name is None:
+                continue
+            if not name.isidentifier() or spec or conversion:
+                raise ValueError(f"Template fields must be plain names: {text!r}")
+            fields.append(name)
+            if name in extra:
+                pieces.append(f"{{escape(extra[{name!r}])}}")
+            elif name == "due":
+                pieces.append("{format_day(item.get('due_day'))}")
+            else:
+                pieces.append(f"{{escape(item.get({name!r}))}}")
+        source = 'def render(item, extra):\n    return f"' + "".join(pieces) + '"\n'
+        exec(compile(source, "<template>", "exec"), namespace)
+        self.text = text
+        self.fields = tuple(dict.fromkeys(fields))
+        self._render = namespace["render"]
+
+    def render(self, item: Mapping[str, Any], **extra: Any) -> str:
+        return self._render(item, extra)
+
+
+DETAILS = (
+    "Project: {project_name}\n"
+    "Server: {server_name}\n"
+    "Ega: {owner_name}\n"
+    "Telefon: {owner_phone}\n"
+    "Login: {server_login_username}\n"
+    "IP: {server_ip}\n"
+    "Tugash sanasi: {due}"
+)
+DUE = Template("🔴 Eslatma: Server uchun oylik to'lov vaqti keldi!\n" + DETAILS)
+REMINDER = Template(
+    "⚠️ Eslatma: Server uchun to'lov {days_left} kun qoldi!\n" + DETAILS, extra=("days_left",)
+)
+NEW_PROJECT = Template("Yangi loyiha qo'shildi:\nID: {id}\n" + DETAILS)
+CARD = Template(
+    "ID: {id} | {project_name}\n"
+    "Server: {server_name}\n"
+    "Ega: {owner_name} | Tel: {owner_phone}\n"
+    "Login: {server_login_username} | IP: {server_ip}\n"
+    "Tugash sanasi: {due}\n"
+    + CARD_SEPARATOR
+)
+DIGEST_LINE = Template(
+    "#{id} {project_name} | {server_name} | {owner_name} {owner_phone} | {server_ip} | {due}"
+)
+
+
+def due_message(item: Mapping[str, Any]) -> str:
+    return DUE.render(item)
+
+
+def reminder_message(item: Mapping[str, Any], days_left: int) -> str:
+    return REMINDER.render(item, days_left=days_left)
+
+
+def new_project_message(item: Mapping[str, Any]) -> str:
+    return NEW_PROJECT.render(item)
+
+
+def digest_line(item: Mapping[str, Any]) -> str:
+    return DIGEST_LINE.render(item)
+
+
+class CardCache:
+    """Rendered cards by project id, reused while the row's version is unchanged.
+
+    Every UPDATE of a project bumps its version, so a card rendered before a
+    write, here or in another process, is never served after it. Writes made
+    through the repository also drop the card at once (``on_change`` is a
+    repository listener). The least recently used card is evicted beyond
+    ``max_size``.
+    """
+
+    def __init__(self, template: Template, max_size: int = DEFAULT_CARD_CACHE_SIZE):
+        self.template = template
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._cards: OrderedDict[int, tuple[int, str]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._cards)
+
+    def render(self, item: Mapping[str, Any]) -> str:
+        project_id, version = item["id"], item["version"]
+        cached = self._cards.get(project_id)
+        if cached is not None and cached[0] == version:
+            self._cards.move_to_end(project_id)
+            self.hits += 1
+            return cached[1]
+        self.misses += 1
+        card = self.template.render(item)
+        self._cards[project_id] = (version, card)
+        if cached is not None:
+            self._cards.move_to_end(project_id)
+        elif len(self._cards) > self.max_size:
+            self._cards.popitem(last=False)
+        return card
+
+    def invalidate(self, project_id: int) -> None:
+        self._cards.pop(project_id, None)
+
+    def on_change(self, changes: list) -> None:
+        for change in changes:
+            self._cards.pop(change.project_id, None)
+
+    def clear(self) -> None:
+        self._cards.clear()
+
+
+# Cards of /list and /find; registered as a repository listener in app.bot.main
+CARDS = CardCache(CARD)
+
+
+def project_card(item: Mapping[str, Any]) -> str:
+    return CARDS.render(item)
@@ -0,0 +1,281 @@
+import asyncio
+import queue
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Callable
+
+from . import db
+from .metrics import METRICS
+
+
+DEFAULT_MAX_PENDING = 256
+
+
+@dataclass(frozen=True)
+class ProjectChange:
+    """A write that can move a project's reminder schedule.
+
+    ``due_day`` is the new due day (None once the project is deleted). A
+    guarded update sets ``previous_due_day``: it only applied if the project
+    was still due on that day. ``hour_changed`` marks a new ``notify_hour``
+    and ``reminder_days_changed`` new per-project ``reminder_days``.
+    """
+
+    project_id: int
+    due_day: int | None
+    previous_due_day: int | None = None
+    deleted: bool = False
+    notify_hour: int | None = None
+    hour_changed: bool = False
+    reminder_days: tuple[int, ...] | None = None
+    reminder_days_changed: bool = False
+
+
+class AsyncRepository:
+    """Async facade over app.db.
+
+    Every call is executed on one dedicated DB worker thread, so handlers and
+    scheduler jobs await the result instead of blocking the event loop while
+    SQLite does disk I/O. At most ``max_pending`` calls can be queued; further
+    callers wait for a free slot.
+    """
+
+    def __init__(self, db_path: str, max_pending: int = DEFAULT_MAX_PENDING):
+        self.db_path = db_path
+        self._jobs: queue.Queue = queue.Queue(maxsize=max_pending)
+        self._slots = asyncio.Semaphore(max_pending)
+        self._thread: threading.Thread | None = None
+        # Called on the event loop after every write that changes a schedule
+        self.listeners: list[Callable[[list[ProjectChange]], None]] = []
+
+    def _changed(self, changes: list[ProjectChange]) -> None:
+        if changes:
+            for listener in self.listeners:
+                listener(changes)
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._worker, name="db-worker", daemon=True)
+        self._thread.start()
+
+    async def close(self) -> None:
+        if self._thread is None:
+            return
+        self._jobs.put(None)
+        await asyncio.to_thread(self._thread.join)
+        self._thread = None
+
+    def _worker(self) -> None:
+        while True:
+            job = self._jobs.get()
+            if job is None:
+                break
+            loop, future, fn, args, kwargs = job
+            started = time.perf_counter()
+            try:
+                result = fn(self.db_path, *args, **kwargs)
+            except BaseException as exc:  # handed back to the awaiting coroutine
+                loop.call_soon_threadsafe(self._finish, future, fn, time.perf_counter() - started, None, exc)
+            else:
+                loop.call_soon_threadsafe(self._finish, future, fn, time.perf_counter() - started, result, None)
+
+    def _finish(
+        self, future: asyncio.Future, fn: Callable, elapsed: float, result: Any, exc: BaseException | None
+    ) -> None:
+        self._slots.release()
+        # Recorded here on the event loop, where every metric is updated
+        METRICS.db_seconds.observe(fn.__name__, elapsed)
+        if exc is not None:
+            METRICS.db_errors.inc(fn.__name__)
+        if future.done():
+            return
+        if exc is not None:
+            future.set_exception(exc)
+        else:
+            future.set_result(result)
+
+    async def run(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """Run ``fn(db_path, *args, **kwargs)`` on the DB worker thread"""
+        if self._thread is None:
+            raise RuntimeError("AsyncRepository is not started")
+        await self._slots.acquire()
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._jobs.put_nowait((loop, future, fn, args, kwargs))
+        return await future
+
+    async def add_project(self, **fields) -> int:
+        project_id = await self.run(db.add_project, **fields)
+        self._changed([ProjectChange(project_id, db.to_due_day(fields["next_due_date"]))])
+        return project_id
+
+    async def list_projects(self) -> list[dict]:
+        return await self.run(db.list_projects)
+
+    async def insert_projects(self, rows: list[tuple]) -> int:
+        """Bulk insert rows of db.PROJECT_COLUMNS; returns the id of the first"""
+        first_id = await self.run(db.insert_projects, rows)
+        due_at = db.PROJECT_COLUMNS.index("due_day")
+        self._changed([
+            ProjectChange(
+                first_id + i,
+                row[due_at],
+                notify_hour=row[due_at + 1],
+                hour_changed=row[due_at + 1] is not None,
+                reminder_days=db.parse_reminder_days(row[due_at + 2]),
+                reminder_days_changed=row[due_at + 2] is not None,
+            )
+            for i, row in enumerate(rows)
+        ])
+        return first_id
+
+    async def export_projects_page(self, after_id: int, limit: int) -> list[tuple]:
+        return await self.run(db.export_projects_page, after_id, limit)
+
+    async def list_projects_page(
+        self,
+        view: str,
+        today: int,
+        limit: int,
+        cursor: tuple[int, int] | None = None,
+        backward: bool = False,
+        server: str | None = None,
+    ) -> list[dict]:
+        return await self.run(db.list_projects_page, view, today, limit, cursor, backward, server)
+
+    async def find_projects(self, text: str, limit: int) -> list[dict]:
+        return await self.run(db.find_projects, text, limit)
+
+    async def delete_project(self, project_id: int) -> bool:
+        ok = await self.run(db.delete_project, project_id)
+        if ok:
+            self._changed([ProjectChange(project_id, None, deleted=True)])
+        return ok
+
+    async def get_due_projects(self, now: datetime) -> list[dict]:
+        return await self.run(db.get_due_projects, now)
+
+    async def get_projects_due_in_days(self, now: datetime, days: int) -> list[dict]:
+        return await self.run(db.get_projects_due_in_days, now, days)
+
+    async def get_projects_due_between(self, first_day: int, last_day: int) -> list[dict]:
+        return await self.run(db.get_projects_due_between, first_day, last_day)
+
+    async def get_projects_by_ids(self, project_ids: list[int]) -> list[dict]:
+        return await self.run(db.get_projects_by_ids, project_ids)
+
+    async def get_schedule_rows(self) -> tuple[int, list[tuple[int, int, int | None, str | None]]]:
+        return await self.run(db.get_schedule_rows)
+
+    async def get_schedule_changes(
+        self, after_seq: int
+    ) -> tuple[int, list[tuple[int, int, int | None, str | None]], list[int]]:
+        return await self.run(db.get_schedule_changes, after_seq)
+
+    async def get_reminder_candidates(self, today: int, default_days: tuple[int, ...]) -> list[dict]:
+        return await self.run(db.get_reminder_candidates, today, default_days)
+
+    async def get_reminder_candidates_by_ids(self, project_ids: list[int], today: int) -> list[dict]:
+        return await self.run(db.get_reminder_candidates_by_ids, project_ids, today)
+
+    async def record_reminders_sent(
+        self,
+        entries: list[tuple[int, int, int]],
+        today: int,
+        messages: list[tuple[int, str, str | None]] = (),
+    ) -> None:
+        await self.run(db.record_reminders_sent, entries, today, messages)
+
+    async def enqueue_outbox(self, messages: list[tuple[int, str, str | None]]) -> None:
+        await self.run(db.enqueue_outbox, messages)
+
+    async def fetch_outbox(self, limit: int, after_id: int = 0, max_attempts: int = 10) -> list[dict]:
+        return await self.run(db.fetch_outbox, limit, after_id, max_attempts)
+
+    async def finish_outbox(self, delivered_ids: list[int], failed_ids: list[int]) -> None:
+        await self.run(db.finish_outbox, delivered_ids, failed_ids)
+
+    async def get_meta(self, key: str) -> str | None:
+        return await self.run(db.get_meta, key)
+
+    async def set_meta(self, key: str, value: str) -> None:
+        await self.run(db.set_meta, key, value)
+
+    async def acquire_lease(self, name: str, holder: str, ttl: float, now: float) -> int | None:
+        return await self.run(db.acquire_lease, name, holder, ttl, now)
+
+    async def release_lease(self, name: str, holder: str) -> bool:
+        return await self.run(db.release_lease, name, holder)
+
+    async def get_lease(self, name: str) -> dict | None:
+        return await self.run(db.get_lease, name)
+
+    async def load_fsm_record(self, key: str, not_before: float) -> tuple[str | None, str] | None:
+        return await self.run(db.load_fsm_record, key, not_before)
+
+    async def save_fsm_records(self, records: list[tuple[str, str | None, str | None, float]]) -> None:
+        await self.run(db.save_fsm_records, records)
+
+    async def expire_fsm_records(self, before: float) -> int:
+        return await self.run(db.expire_fsm_records, before)
+
+    async def prune_outbox(self, before: datetime) -> int:
+        return await self.run(db.prune_outbox, before)
+
+    async def bump_next_due_date(self, project_id: int, today: int | None = None) -> int | None:
+        new_day = await self.run(db.bump_next_due_date, project_id, today)
+        if new_day is not None:
+            self._changed([ProjectChange(project_id, new_day)])
+        return new_day
+
+    async def advance_due_projects(
+        self, advances: list[tuple[int, int, int]], today: int, messages: list[tuple[int, str]] | None = None
+    ) -> int:
+        moved = await self.run(db.advance_due_projects, advances, today, messages)
+        if moved:
+            self._changed([
+                ProjectChange(project_id, new_day, previous_due_day=current_day)
+                for project_id, current_day, new_day in advances
+            ])
+        return moved
+
+    async def mark_project_paid(self, project_id: int, due_day: int, today: int) -> int | None:
+        new_day = await self.run(db.mark_project_paid, project_id, due_day, today)
+        if new_day is not None:
+            self._changed([ProjectChange(project_id, new_day, previous_due_day=due_day)])
+        return new_day
+
+    async def set_next_due_date(self, project_id: int, new_due: datetime, today: int | None = None) -> bool:
+        ok = await self.run(db.set_next_due_date, project_id, new_due, today)
+        if ok:
+            self._changed([ProjectChange(project_id, db.to_due_day(new_due))])
+        return ok
+
+    async def set_monthly_fee(self, project_id: int, fee: int | None) -> bool:
+        return await self.run(db.set_monthly_fee, project_id, fee)
+
+    async def revenue_by_month(self, first_day: int, last_day: int) -> list[dict]:
+        return await self.run(db.revenue_by_month, first_day, last_day)
+
+    async def overdue_summary(self, today: int) -> dict:
+        return await self.run(db.overdue_summary, today)
+
+    async def owner_lateness(self, since_day: int, limit: int) -> list[dict]:
+        return await self.run(db.owner_lateness, since_day, limit)
+
+    async def set_notify_hour(self, project_id: int, hour: int | None) -> bool:
+        due_day = await self.run(db.set_notify_hour, project_id, hour)
+        if due_day is None:
+            return False
+        self._changed([ProjectChange(project_id, due_day, notify_hour=hour, hour_changed=True)])
+        return True
+
+    async def set_reminder_days(self, project_id: int, days: tuple[int, ...] | None) -> bool:
+        due_day = await self.run(db.set_reminder_days, project_id, days)
+        if due_day is None:
+            return False
+        self._changed([ProjectChange(project_id, due_day, reminder_days=days, reminder_days_changed=True)])
+        return True
@@ -1,75 +1,311 @@
-from datetime import datetime
-from typing import Callable
+import asyncio
+import logging
+import time
+from datetime import datetime, time as dtime
+from zoneinfo import ZoneInfo
 
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.cron import CronTrigger
 
-from .db import get_due_projects, get_projects_due_in_days, bump_next_due_date
+from .config import DEFAULT_NOTIFY_HOUR, DEFAULT_REMINDER_DAYS
+from .db import from_due_day, next_cycle_due_day, parse_reminder_days, to_due_day
+from .digest import render_digest
+from .metrics import METRICS
+from .outbox import OutboxWorker, markup_json
+from .render import due_message, reminder_message
+from .repo import AsyncRepository
+from .timers import ReminderTimers
 
 
-def format_date(d: datetime | str) -> str:
-    """Format date as dd.mm.yyyy"""
-    if isinstance(d, str):
-        try:
-            d = datetime.fromisoformat(d)
-        except (ValueError, AttributeError):
-            return d
-    if isinstance(d, datetime):
-        d = d.date()
-    return d.strftime("%d.%m.%Y")
-
-
-async def run_due_checks(db_path: str, notify: Callable[[str], None]):
-    """Check for projects that are due today or earlier"""
-    now = datetime.now()
-    due = get_due_projects(db_path, now)
-    for item in due:
-        due_date_formatted = format_date(item['next_due_date'])
-        message = (
-            f"🔴 Eslatma: Server uchun oylik to'lov vaqti keldi!\n"
-            f"Project: {item['project_name']}\n"
-            f"Server: {item['server_name']}\n"
-            f"Ega: {item['owner_name']}\n"
-            f"Telefon: {item['owner_phone']}\n"
-            f"Login: {item.get('server_login_username', 'N/A')}\n"
-            f"IP: {item.get('server_ip', 'N/A')}\n"
-            f"Tugash sanasi: {due_date_formatted}"
-        )
-        await notify(message)
-        bump_next_due_date(db_path, int(item["id"]))
-
-
-async def run_reminder_checks(db_path: str, notify: Callable[[str], None], days_ahead: int):
-    """Check for projects that are due in N days (reminder notification)"""
-    now = datetime.now()
-    due_soon = get_projects_due_in_days(db_path, now, days_ahead)
-    for item in due_soon:
-        due_date_formatted = format_date(item['next_due_date'])
-        message = (
-            f"⚠️ Eslatma: Server uchun to'lov {days_ahead} kun qoldi!\n"
-            f"Project: {item['project_name']}\n"
-            f"Server: {item['server_name']}\n"
-            f"Ega: {item['owner_name']}\n"
-            f"Telefon: {item['owner_phone']}\n"
-            f"Login: {item.get('server_login_username', 'N/A')}\n"
-            f"IP: {item.get('server_ip', 'N/A')}\n"
-            f"Tugash sanasi: {due_date_formatted}"
+logger = logging.getLogger(__name__)
+
+# meta key holding the wall-clock time up to which every check has run
+LAST_CHECK_KEY = "last_check_at"
+
+
+async def notify_due(repo: AsyncRepository, chat_id: int, due: list[dict], today: int) -> int:
+    """Advance every due project, ledger its roll-over and queue its notification, in one transaction"""
+    advances = [
+        (int(item["id"]), item["due_day"], next_cycle_due_day(item["due_day"], today)) for item in due
+    ]
+    messages = [(chat_id, due_message(item)) for item in due]
+    return await repo.advance_due_projects(advances, today, messages)
+
+
+async def run_due_checks(repo: AsyncRepository, chat_id: int, now: datetime | None = None) -> int:
+    """Check for projects that are due today or earlier.
+
+    All of them are advanced to their next future billing cycle, and their
+    notifications queued in the outbox, in a single transaction. Returns the
+    number of projects advanced.
+    """
+    now = now or datetime.now()
+    due = await repo.get_due_projects(now)
+    return await notify_due(repo, chat_id, due, to_due_day(now))
+
+
+def plan_reminders(
+    rows: list[dict], today: int, default_days: tuple[int, ...]
+) -> dict[int, list[tuple[dict, list[int]]]]:
+    """Bucket reminder candidates by days remaining.
+
+    A project gets one reminder when some offset at or above its days remaining
+    has not been sent for its current due day yet; every such offset is then
+    recorded, so a reminder missed during downtime is sent once and the older
+    offsets do not follow it. Returns {days_left: [(item, offsets_to_record)]}.
+    """
+    buckets: dict[int, list[tuple[dict, list[int]]]] = {}
+    for item in rows:
+        days_left = item["due_day"] - today
+        offsets = parse_reminder_days(item.get("reminder_days")) or default_days
+        sent = {int(d) for d in item["sent_days"].split(",")} if item.get("sent_days") else set()
+        pending = [days for days in offsets if days >= days_left and days not in sent]
+        if pending:
+            buckets.setdefault(days_left, []).append((item, pending))
+    return buckets
+
+
+async def run_reminder_checks(
+    repo: AsyncRepository,
+    chat_id: int,
+    reminder_days: tuple[int, ...],
+    now: datetime | None = None,
+    project_ids: list[int] | None = None,
+) -> int:
+    """Queue reminders for projects due within their reminder offsets.
+
+    All offsets are served by one range query; the reminders_sent ledger keeps
+    an offset from firing twice for the same due day (after a restart, or when
+    /editdue sets a date again). Ledger rows and outbox messages are written in
+    one transaction. ``project_ids`` limits the run to those projects, read by
+    id instead of the whole reminder window. Returns the number of reminders
+    queued.
+    """
+    today = to_due_day(now or datetime.now())
+    if project_ids is None:
+        rows = await repo.get_reminder_candidates(today, reminder_days)
+    else:
+        rows = await repo.get_reminder_candidates_by_ids(project_ids, today)
+    sent = []
+    messages = []
+    for days_left, items in sorted(plan_reminders(rows, today, reminder_days).items()):
+        for item, offsets in items:
+            messages.append((chat_id, reminder_message(item, days_left), None))
+            sent.extend((int(item["id"]), item["due_day"], days) for days in offsets)
+    await repo.record_reminders_sent(sent, today, messages)
+    return len(messages)
+
+
+async def run_project_checks(
+    repo: AsyncRepository,
+    chat_id: int,
+    due_ids: list[int],
+    reminder_ids: list[int],
+    today: int,
+    reminder_days: tuple[int, ...],
+) -> int:
+    """Handle the projects whose timers fired: advance and notify the due ones, remind the rest.
+
+    Returns the number of messages queued in the outbox.
+    """
+    queued = 0
+    if due_ids:
+        rows = await repo.get_projects_by_ids(due_ids)
+        due = [item for item in rows if item["due_day"] is not None and item["due_day"] <= today]
+        queued += await notify_due(repo, chat_id, due, today)
+    if reminder_ids:
+        queued += await run_reminder_checks(
+            repo, chat_id, reminder_days, now=datetime.combine(from_due_day(today), datetime.min.time()),
+            project_ids=reminder_ids,
         )
-        await notify(message)
+    return queued
+
+
+async def run_digest(
+    repo: AsyncRepository, chat_id: int, days_ahead: int, now: datetime | None = None
+) -> int:
+    """Queue overdue, due today and upcoming projects packed into a few messages.
+
+    In digest mode projects are not advanced automatically; they stay overdue
+    until someone presses their "mark paid" button.
+    """
+    now = now or datetime.now()
+    today = to_due_day(now)
+    due = sorted(await repo.get_due_projects(now), key=lambda item: (item["due_day"], item["id"]))
+    overdue = [item for item in due if item["due_day"] < today]
+    due_today = [item for item in due if item["due_day"] == today]
+    upcoming = await repo.get_projects_due_between(today + 1, today + days_ahead)
+    messages = [
+        (chat_id, text, markup_json(markup))
+        for text, markup in render_digest(overdue, due_today, upcoming, days_ahead)
+    ]
+    await repo.enqueue_outbox(messages)
+    return len(messages)
 
 
-def setup_scheduler(db_path: str, tz: str, notify_coro: Callable[[str], None]) -> AsyncIOScheduler:
-    scheduler = AsyncIOScheduler(timezone=tz)
+def wall_clock(tz: str, at: float | None = None) -> datetime:
+    """Naive local time in ``tz``, the form the checks and the meta table use"""
+    return datetime.fromtimestamp(time.time() if at is None else at, ZoneInfo(tz)).replace(tzinfo=None)
 
-    async def job_wrapper():
-        await run_due_checks(db_path, notify_coro)
 
-    async def reminder_wrapper():
-        await run_reminder_checks(db_path, notify_coro, days_ahead=2)
+def missed_windows(last_check: datetime, now: datetime, hour: int) -> tuple[int, int] | None:
+    """First and last day whose check at ``hour`` came after last_check and not after now"""
+    first = to_due_day(last_check) + (last_check.hour >= hour)
+    last = to_due_day(now) - (now.hour < hour)
+    return (first, last) if first <= last else None
 
-    # Run every day at 09:00 local time - check due projects
-    scheduler.add_job(job_wrapper, CronTrigger(hour=9, minute=0))
-    # Run every day at 09:00 local time - send 2 days ahead reminder
-    scheduler.add_job(reminder_wrapper, CronTrigger(hour=9, minute=0))
-    return scheduler
 
+async def record_check(repo: AsyncRepository, at: datetime) -> None:
+    await repo.set_meta(LAST_CHECK_KEY, at.isoformat())
+
+
+async def catch_up(
+    repo: AsyncRepository,
+    chat_id: int,
+    now: datetime,
+    digest_mode: bool = False,
+    notify_hour: int = DEFAULT_NOTIFY_HOUR,
+    reminder_days: tuple[int, ...] = DEFAULT_REMINDER_DAYS,
+) -> int:
+    """Process the daily check windows missed while the bot was down.
+
+    However many days were missed, the checks run once, as of the last missed
+    window: one range query finds every overdue project and advances it past
+    all missed cycles, and plan_reminders sends a missed reminder once. In
+    digest mode a single digest replaces the missed ones. Returns the number
+    of missed windows.
+    """
+    stored = await repo.get_meta(LAST_CHECK_KEY)
+    if stored is None:
+        # First start with this schema: there is nothing to compare against
+        await record_check(repo, now)
+        return 0
+    windows = missed_windows(datetime.fromisoformat(stored), now, notify_hour)
+    if windows is None:
+        return 0
+    first, last = windows
+    at = datetime.combine(from_due_day(last), dtime(notify_hour))
+    logger.info("Catching up on %d missed checks (%s to %s)", last - first + 1, from_due_day(first), at)
+    with METRICS.job("catch_up"):
+        if digest_mode:
+            queued = await run_digest(repo, chat_id, days_ahead=max(reminder_days), now=at)
+        else:
+            queued = await run_due_checks(repo, chat_id, now=at)
+            queued += await run_reminder_checks(repo, chat_id, reminder_days, now=at)
+        METRICS.job_items.inc("catch_up", queued)
+    await record_check(repo, now)
+    return last - first + 1
+
+
+def setup_scheduler(
+    repo: AsyncRepository,
+    tz: str,
+    chat_id: int,
+    outbox: OutboxWorker,
+    digest_mode: bool = False,
+    notify_hour: int = DEFAULT_NOTIFY_HOUR,
+    reminder_days: tuple[int, ...] = DEFAULT_REMINDER_DAYS,
+) -> AsyncIOScheduler | ReminderTimers:
+    if digest_mode:
+        scheduler = AsyncIOScheduler(timezone=tz)
+
+        async def digest_wrapper():
+            with METRICS.job("digest"):
+                queued = await run_digest(repo, chat_id, days_ahead=max(reminder_days))
+                METRICS.job_items.inc("digest", queued)
+            if queued:
+                outbox.wake()
+            await record_check(repo, wall_clock(tz))
+
+        # Run every day at the notification hour - one digest instead of a message per project
+        scheduler.add_job(digest_wrapper, CronTrigger(hour=notify_hour, minute=0))
+        return scheduler
+
+    async def on_fire(due_ids: list[int], reminder_ids: list[int], today: int):
+        with METRICS.job("project_checks"):
+            queued = await run_project_checks(repo, chat_id, due_ids, reminder_ids, today, reminder_days)
+            METRICS.job_items.inc("project_checks", queued)
+        if queued:
+            outbox.wake()
+
+    async def on_checked(now: float):
+        await record_check(repo, wall_clock(tz, now))
+
+    # Each project is handled at its own due/reminder time instead of a daily full scan
+    return ReminderTimers(
+        repo, tz, on_fire, default_hour=notify_hour, reminder_days=reminder_days, on_checked=on_checked
+    )
+
+
+class LeaderDuties:
+    """The work only one replica may do: deliver the outbox, catch up and run the scheduler.
+
+    ``start()`` and ``stop()`` are the callbacks of app.leader.LeaderElection;
+    each term gets a fresh scheduler, so a replica elected again reloads every
+    schedule instead of trusting timers kept while another replica led.
+    Catch-up runs in its own task, so a long one neither delays the lease
+    heartbeat nor outlives a lost lease.
+    """
+
+    def __init__(
+        self,
+        repo: AsyncRepository,
+        outbox: OutboxWorker,
+        tz: str,
+        chat_id: int,
+        digest_mode: bool = False,
+        notify_hour: int = DEFAULT_NOTIFY_HOUR,
+        reminder_days: tuple[int, ...] = DEFAULT_REMINDER_DAYS,
+    ):
+        self.repo = repo
+        self.outbox = outbox
+        self.tz = tz
+        self.chat_id = chat_id
+        self.digest_mode = digest_mode
+        self.notify_hour = notify_hour
+        self.reminder_days = reminder_days
+        self.scheduler: AsyncIOScheduler | ReminderTimers | None = None
+        self._startup: asyncio.Task | None = None
+
+    async def start(self) -> None:
+        # Resumes with messages left undelivered by the previous leader
+        self.outbox.start()
+        self.scheduler = setup_scheduler(
+            self.repo,
+            self.tz,
+            self.chat_id,
+            self.outbox,
+            digest_mode=self.digest_mode,
+            notify_hour=self.notify_hour,
+            reminder_days=self.reminder_days,
+        )
+        self._startup = asyncio.create_task(self._catch_up_and_start(self.scheduler), name="catch-up")
+
+    async def _catch_up_and_start(self, scheduler: AsyncIOScheduler | ReminderTimers) -> None:
+        # Picks up where the last leader stopped: it recorded its last check in the shared database
+        try:
+            missed = await catch_up(
+                self.repo,
+                self.chat_id,
+                wall_clock(self.tz),
+                digest_mode=self.digest_mode,
+                notify_hour=self.notify_hour,
+                reminder_days=self.reminder_days,
+            )
+            if missed:
+                self.outbox.wake()
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Catching up on missed checks failed")
+        scheduler.start()
+
+    async def stop(self) -> None:
+        if self._startup is not None:
+            self._startup.cancel()
+            await asyncio.gather(self._startup, return_exceptions=True)
+            self._startup = None
+        if self.scheduler is not None and self.scheduler.running:
+            self.scheduler.shutdown(wait=False)
+        self.scheduler = None
+        await self.outbox.close()
@@ -0,0 +1,172 @@
+import asyncio
+import json
+import logging
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Callable
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, StateType, StorageKey
+
+from .repo import AsyncRepository
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_ENTRIES = 1024
+# Conversations idle this long leave the cache; they are still in the database
+DEFAULT_CACHE_TTL = 15 * 60
+# Conversations idle this long are abandoned and deleted from the database
+DEFAULT_SESSION_TTL = 2 * 24 * 3600
+DEFAULT_FLUSH_INTERVAL = 1.0
+# Flush early once this many conversations are waiting to be written
+DEFAULT_FLUSH_BATCH = 256
+EXPIRE_INTERVAL = 3600
+
+
+@dataclass
+class _Entry:
+    state: str | None = None
+    data: dict[str, Any] = field(default_factory=dict)
+    touched: float = 0.0
+
+
+class SQLiteStorage(BaseStorage):
+    """FSM storage kept in the bot's SQLite database.
+
+    Reads are served from an LRU cache of at most ``max_entries``
+    conversations; one idle for ``cache_ttl`` seconds is dropped from memory
+    and read back from the database when it continues. Writes only change the
+    cache and mark the conversation dirty: a background task writes every
+    dirty conversation in one transaction each ``flush_interval`` seconds, so a
+    form step does not cost its own fsync. A crash loses at most the steps of
+    that last interval. Finished conversations are deleted and ones idle for
+    ``session_ttl`` seconds expire, so abandoned forms do not pile up.
+    """
+
+    def __init__(
+        self,
+        repo: AsyncRepository,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        cache_ttl: float = DEFAULT_CACHE_TTL,
+        session_ttl: float = DEFAULT_SESSION_TTL,
+        flush_interval: float = DEFAULT_FLUSH_INTERVAL,
+        flush_batch: int = DEFAULT_FLUSH_BATCH,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.repo = repo
+        self.max_entries = max_entries
+        self.cache_ttl = cache_ttl
+        self.session_ttl = session_ttl
+        self.flush_interval = flush_interval
+        self.flush_batch = flush_batch
+        self.clock = clock
+        self._cache: OrderedDict[str, _Entry] = OrderedDict()
+        self._dirty: dict[str, _Entry] = {}
+        self._wakeup = asyncio.Event()
+        self._task: asyncio.Task | None = None
+        self._expired_at = 0.0
+
+    def start(self) -> None:
+        if self._task is not None:
+            return
+        self._task = asyncio.create_task(self._run(), name="fsm-storage")
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await self.flush()
+
+    def __len__(self) -> int:
+        return len(self._cache)
+
+    @staticmethod
+    def _key(key: StorageKey) -> str:
+        parts = (key.bot_id, key.chat_id, key.user_id, key.thread_id, key.business_connection_id, key.destiny)
+        return ":".join("" if part is None else str(part) for part in parts)
+
+    def _evict(self, now: float) -> None:
+        while self._cache:
+            oldest = next(iter(self._cache.values()))
+            if len(self._cache) <= self.max_entries and now - oldest.touched <= self.cache_ttl:
+                break
+            self._cache.popitem(last=False)
+
+    async def _entry(self, key: StorageKey) -> tuple[str, _Entry]:
+        k = self._key(key)
+        now = self.clock()
+        entry = self._cache.get(k)
+        if entry is None or now - entry.touched > self.cache_ttl:
+            # Not yet written conversations are not in the database
+            entry = self._dirty.get(k)
+        if entry is None:
+            row = await self.repo.load_fsm_record(k, now - self.session_ttl)
+            # A write that raced with the load wins
+            entry = self._cache.get(k) or self._dirty.get(k)
+            if entry is None:
+                entry = _Entry(row[0], json.loads(row[1])) if row else _Entry()
+        entry.touched = now
+        self._cache[k] = entry
+        self._cache.move_to_end(k)
+        self._evict(now)
+        return k, entry
+
+    def _mark(self, k: str, entry: _Entry) -> None:
+        self._dirty[k] = entry
+        if len(self._dirty) >= self.flush_batch:
+            self._wakeup.set()
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        k, entry = await self._entry(key)
+        entry.state = state.state if isinstance(state, State) else state
+        self._mark(k, entry)
+
+    async def get_state(self, key: StorageKey) -> str | None:
+        _, entry = await self._entry(key)
+        return entry.state
+
+    async def set_data(self, key: StorageKey, data: dict[str, Any]) -> None:
+        k, entry = await self._entry(key)
+        entry.data = data.copy()
+        self._mark(k, entry)
+
+    async def get_data(self, key: StorageKey) -> dict[str, Any]:
+        _, entry = await self._entry(key)
+        return entry.data.copy()
+
+    async def flush(self) -> None:
+        """Write every dirty conversation in one transaction"""
+        if not self._dirty:
+            return
+        dirty, self._dirty = self._dirty, {}
+        records = []
+        for k, entry in dirty.items():
+            # A cleared conversation (no state, no data) is deleted
+            finished = entry.state is None and not entry.data
+            records.append((k, entry.state, None if finished else json.dumps(entry.data), entry.touched))
+        try:
+            await self.repo.save_fsm_records(records)
+        except BaseException:
+            # Keep them for the next flush unless they were written to again meanwhile
+            for k, entry in dirty.items():
+                self._dirty.setdefault(k, entry)
+            raise
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+                now = self.clock()
+                if now - self._expired_at >= EXPIRE_INTERVAL:
+                    self._expired_at = now
+                    await self.repo.expire_fsm_records(now - self.session_ttl)
+            except Exception:
+                logger.exception("FSM storage: writing conversations failed")
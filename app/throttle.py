@@ -0,0 +1,183 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Hashable, Iterable, TypeVar
+
+from aiogram.types import CallbackQuery, Message, Update
+
+from .metrics import METRICS, Metrics
+from .notifier import TokenBucket
+
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Any update from one user: a quick typist filling in a form stays well below this
+DEFAULT_USER_RATE = 2.0
+DEFAULT_USER_BURST = 10
+# (tokens per second, burst) for commands that read a lot or send files
+COMMAND_LIMITS: dict[str, tuple[float, float]] = {
+    "list": (0.5, 5),
+    "find": (0.5, 5),
+    "stats": (0.2, 3),
+    "report": (0.2, 3),
+    "import": (1 / 60, 2),
+    "export": (1 / 60, 2),
+}
+# Callback data prefixes that count as a command (ListPage buttons page through /list)
+CALLBACK_COMMANDS = {"lst": "list"}
+DEFAULT_MAX_USERS = 10_000
+THROTTLED_TEXT = "Juda ko'p so'rov. Biroz kutib, qayta urinib ko'ring."
+
+
+def command_of(event: Any) -> str | None:
+    """"list" for "/list week" or "/list@bot", the mapped prefix for callback data, else None"""
+    if isinstance(event, Message):
+        text = event.text or event.caption
+        if text and text.startswith("/"):
+            return text.split(maxsplit=1)[0][1:].split("@", 1)[0].lower()
+    elif isinstance(event, CallbackQuery) and event.data:
+        return CALLBACK_COMMANDS.get(event.data.split(":", 1)[0])
+    return None
+
+
+@dataclass
+class _UserState:
+    bucket: TokenBucket
+    commands: dict[str, TokenBucket] = field(default_factory=dict)
+    seen: float = 0.0
+    # Told to slow down since the last update that went through
+    warned: bool = False
+
+
+class AccessMiddleware:
+    """Update-level outer aiogram middleware that gates and throttles every update.
+
+    Register it after aiogram's user context middleware and before the FSM
+    one (see app.bot.main), so it knows the sender and nothing has read the
+    FSM storage yet. Only users (or chats, for the admin group) in
+    ``allowed_ids`` get through; anything else is dropped before a handler,
+    a filter or the FSM storage touches the database. An allowed user spends
+    a token from their own bucket on every update and, for the commands in
+    ``command_limits``, from a bucket for that command too. Over the limit,
+    the update is dropped and the user told once until an update goes
+    through again.
+
+    Buckets live in an LRU of at most ``max_users`` users. A user idle long
+    enough for every bucket to refill is dropped first, which changes nothing;
+    beyond that the least recently seen users are dropped and start again with
+    full buckets.
+    """
+
+    def __init__(
+        self,
+        allowed_ids: Iterable[int],
+        rate: float = DEFAULT_USER_RATE,
+        burst: float = DEFAULT_USER_BURST,
+        command_limits: dict[str, tuple[float, float]] = COMMAND_LIMITS,
+        max_users: int = DEFAULT_MAX_USERS,
+        clock: Callable[[], float] = time.monotonic,
+        metrics: Metrics = METRICS,
+    ):
+        self.allowed_ids = frozenset(allowed_ids)
+        self.rate = rate
+        self.burst = burst
+        self.command_limits = command_limits
+        self.max_users = max_users
+        self.clock = clock
+        self.metrics = metrics
+        # After this long every bucket is full again
+        self.idle_after = max([burst / rate] + [b / r for r, b in command_limits.values()])
+        self._users: OrderedDict[int, _UserState] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._users)
+
+    def allowed(self, user: Any, chat: Any) -> bool:
+        return (user is not None and user.id in self.allowed_ids) or (
+            chat is not None and chat.id in self.allowed_ids
+        )
+
+    def _state(self, key: int, now: float) -> _UserState:
+        state = self._users.get(key)
+        if state is None:
+            state = self._users[key] = _UserState(TokenBucket(self.rate, self.burst))
+        else:
+            self._users.move_to_end(key)
+        state.seen = now
+        while self._users:
+            oldest = next(iter(self._users.values()))
+            if len(self._users) <= self.max_users and now - oldest.seen < self.idle_after:
+                break
+            self._users.popitem(last=False)
+        return state
+
+    def _take(self, state: _UserState, command: str | None, now: float) -> str | None:
+        """Spend the tokens for one update, or return which limit it hit without spending any"""
+        buckets = [(state.bucket, "user")]
+        if command in self.command_limits:
+            bucket = state.commands.get(command)
+            if bucket is None:
+                bucket = state.commands[command] = TokenBucket(*self.command_limits[command])
+            buckets.append((bucket, "command"))
+        for bucket, reason in buckets:
+            if bucket.delay(now) > 0:
+                return reason
+        for bucket, _ in buckets:
+            bucket.take(now)
+        return None
+
+    async def __call__(
+        self,
+        handler: Callable[[Any, dict[str, Any]], Awaitable[Any]],
+        event: Any,
+        data: dict[str, Any],
+    ) -> Any:
+        user = data.get("event_from_user")
+        chat = data.get("event_chat")
+        if not self.allowed(user, chat):
+            self.metrics.rejected_updates.inc("not_allowed")
+            return None
+        inner = event.event if isinstance(event, Update) else event
+        now = self.clock()
+        state = self._state(user.id if user is not None else chat.id, now)
+        reason = self._take(state, command_of(inner), now)
+        if reason is not None:
+            self.metrics.rejected_updates.inc(reason)
+            if not state.warned and isinstance(inner, (Message, CallbackQuery)):
+                state.warned = True
+                try:
+                    # Message.answer replies in the chat, CallbackQuery.answer shows a notice
+                    await inner.answer(THROTTLED_TEXT)
+                except Exception:
+                    logger.warning("Could not tell user %s to slow down", user.id if user else chat.id)
+            return None
+        state.warned = False
+        return await handler(event, data)
+
+
+class Coalescer:
+    """Shares one in-flight call between callers asking for the same key.
+
+    The first caller for a key starts ``factory()``; callers arriving before it
+    finishes await the same result (or exception) instead of starting their
+    own. Nothing is cached once it finishes. A caller that is cancelled does
+    not cancel the call for the others.
+    """
+
+    def __init__(self):
+        self._inflight: dict[Hashable, asyncio.Future] = {}
+
+    def __len__(self) -> int:
+        return len(self._inflight)
+
+    async def run(self, key: Hashable, factory: Callable[[], Awaitable[T]]) -> T:
+        future = self._inflight.get(key)
+        if future is None:
+            future = asyncio.ensure_future(factory())
+            self._inflight[key] = future
+            future.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return await asyncio.shield(future)
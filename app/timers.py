@@ -0,0 +1,261 @@
+import asyncio
+import heapq
+import logging
+import time
+from datetime import datetime, time as dtime
+from typing import Awaitable, Callable
+from zoneinfo import ZoneInfo
+
+from .config import DEFAULT_NOTIFY_HOUR
+from .db import from_due_day, parse_reminder_days, to_due_day
+from .repo import AsyncRepository, ProjectChange
+
+
+logger = logging.getLogger(__name__)
+
+# Re-check the wall clock at least this often in case the host slept or the clock jumped
+MAX_SLEEP_SECONDS = 3600
+# Pick up schedules written by other processes this often; only the changed rows are read
+DEFAULT_RESYNC_SECONDS = 60
+# Rebuild the heap once stale entries outnumber live ones by this much
+COMPACT_SLACK = 1024
+
+
+class ReminderTimers:
+    """Per-project reminder timers kept in an in-memory min-heap.
+
+    Every project has one heap entry: the next time (epoch seconds) it needs
+    attention, either one of its reminder days or its due day at the project's
+    notification hour. The loop sleeps until the earliest entry, hands the
+    projects that fired to ``on_fire(due_ids, reminder_ids, today)`` and
+    schedules their next entry. Writes made through the repository update the
+    heap incrementally, so a project added at noon is reminded on time instead
+    of at the next daily scan. Writes by other processes (another replica,
+    app.cli) do not pass through this repository; every ``resync_interval``
+    seconds the projects changed since the last sync are read back from the
+    schedule_changes table and applied like local changes. All schedules are
+    loaded only once, when the timers start.
+
+    Exposes ``start()`` and ``shutdown(wait=...)`` like AsyncIOScheduler.
+    """
+
+    def __init__(
+        self,
+        repo: AsyncRepository,
+        tz: str,
+        on_fire: Callable[[list[int], list[int], int], Awaitable[None]],
+        default_hour: int = DEFAULT_NOTIFY_HOUR,
+        reminder_days: tuple[int, ...] = (),
+        on_checked: Callable[[float], Awaitable[None]] | None = None,
+        resync_interval: float = DEFAULT_RESYNC_SECONDS,
+    ):
+        self.repo = repo
+        self.tz = ZoneInfo(tz)
+        self.on_fire = on_fire
+        # Told the time up to which every timer has been handled
+        self.on_checked = on_checked
+        self.default_hour = default_hour
+        # Largest offset first, i.e. the earliest reminder first
+        self.reminder_days = tuple(sorted({d for d in reminder_days if d > 0}, reverse=True))
+        self.resync_interval = resync_interval
+        self._due: dict[int, int] = {}
+        # Only projects with their own notification hour or offsets are stored
+        self._hours: dict[int, int] = {}
+        self._offsets: dict[int, tuple[int, ...]] = {}
+        self._fire_at: dict[int, int] = {}
+        self._heap: list[tuple[int, int]] = []
+        self._midnights: dict[int, int] = {}
+        self._wakeup = asyncio.Event()
+        self._task: asyncio.Task | None = None
+        self._checked_at = 0.0
+        # Schedule change seq applied so far, and when it was read
+        self._seq = 0
+        self._synced_at = 0.0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+
+    def start(self) -> None:
+        if self._task is not None:
+            return
+        self.repo.listeners.append(self.on_change)
+        self._task = asyncio.create_task(self._run(), name="reminder-timers")
+
+    def shutdown(self, wait: bool = True) -> None:
+        if self._task is None:
+            return
+        self.repo.listeners.remove(self.on_change)
+        self._task.cancel()
+        self._task = None
+
+    def __len__(self) -> int:
+        return len(self._fire_at)
+
+    def _midnight(self, day: int) -> int:
+        at = self._midnights.get(day)
+        if at is None:
+            at = int(datetime.combine(from_due_day(day), dtime(), tzinfo=self.tz).timestamp())
+            self._midnights[day] = at
+        return at
+
+    def today(self, now: float) -> int:
+        return to_due_day(datetime.fromtimestamp(now, self.tz))
+
+    def next_fire_at(self, project_id: int, now: float, after_fire: bool = False) -> int:
+        """Next time project_id needs attention, never earlier than now"""
+        due_day = self._due[project_id]
+        offset = self._hours.get(project_id, self.default_hour) * 3600
+        due_at = self._midnight(due_day) + offset
+        if due_at <= now:
+            if not after_fire:
+                return int(now)
+            # Fired but still due (e.g. the send failed): try again on the next day
+            today = self.today(now)
+            at = self._midnight(today) + offset
+            return at if at > now else self._midnight(today + 1) + offset
+        for days in self._offsets.get(project_id, self.reminder_days):
+            at = self._midnight(due_day - days) + offset
+            if at > now:
+                return at
+        return due_at
+
+    def _schedule(self, project_id: int, now: float, after_fire: bool = False) -> None:
+        at = self.next_fire_at(project_id, now, after_fire)
+        self._fire_at[project_id] = at
+        heapq.heappush(self._heap, (at, project_id))
+        if self._heap[0] == (at, project_id):
+            self._wakeup.set()
+
+    def load(self, rows: list[tuple[int, int, int | None, str | None]], now: float, seq: int = 0) -> None:
+        """Replace all timers with (id, due_day, notify_hour, reminder_days) rows current as of change ``seq``"""
+        self._due = {}
+        self._hours = {}
+        self._offsets = {}
+        for project_id, due_day, hour, reminder_days in rows:
+            self._due[project_id] = due_day
+            if hour is not None:
+                self._hours[project_id] = hour
+            if reminder_days is not None:
+                offsets = parse_reminder_days(reminder_days)
+                if offsets:
+                    self._offsets[project_id] = offsets
+        self._fire_at = {project_id: self.next_fire_at(project_id, now) for project_id in self._due}
+        self._heap = [(at, project_id) for project_id, at in self._fire_at.items()]
+        heapq.heapify(self._heap)
+        self._seq = seq
+        self._synced_at = now
+        self._wakeup.set()
+
+    def on_change(self, changes: list[ProjectChange]) -> None:
+        now = time.time()
+        for change in changes:
+            project_id = change.project_id
+            if change.deleted:
+                self._due.pop(project_id, None)
+                self._hours.pop(project_id, None)
+                self._offsets.pop(project_id, None)
+                self._fire_at.pop(project_id, None)
+                continue
+            if change.previous_due_day is not None and self._due.get(project_id) != change.previous_due_day:
+                # A guarded update that did not apply to this project
+                continue
+            if change.hour_changed:
+                if change.notify_hour is None:
+                    self._hours.pop(project_id, None)
+                else:
+                    self._hours[project_id] = change.notify_hour
+            if change.reminder_days_changed:
+                if change.reminder_days:
+                    self._offsets[project_id] = tuple(sorted(set(change.reminder_days), reverse=True))
+                else:
+                    self._offsets.pop(project_id, None)
+            if change.due_day is None:
+                continue
+            self._due[project_id] = change.due_day
+            self._schedule(project_id, now)
+        if len(self._heap) > 2 * len(self._fire_at) + COMPACT_SLACK:
+            self._heap = [(at, project_id) for project_id, at in self._fire_at.items()]
+            heapq.heapify(self._heap)
+
+    async def resync(self) -> int:
+        """Apply the schedule changes written since the last sync. Returns the number of projects changed"""
+        seq, rows, deleted = await self.repo.get_schedule_changes(self._seq)
+        self._seq = seq
+        self._synced_at = time.time()
+        changes = [ProjectChange(project_id, None, deleted=True) for project_id in deleted]
+        changes.extend(
+            ProjectChange(
+                project_id,
+                due_day,
+                notify_hour=hour,
+                hour_changed=True,
+                reminder_days=parse_reminder_days(reminder_days),
+                reminder_days_changed=True,
+            )
+            for project_id, due_day, hour, reminder_days in rows
+        )
+        # Changes made through this repository come back too; applying them again is harmless
+        self.on_change(changes)
+        return len(changes)
+
+    def pop_fired(self, now: float) -> list[int]:
+        fired = []
+        while self._heap and self._heap[0][0] <= now:
+            at, project_id = heapq.heappop(self._heap)
+            if self._fire_at.get(project_id) != at:
+                continue  # superseded by a later change
+            del self._fire_at[project_id]
+            fired.append(project_id)
+        return fired
+
+    async def fire(self, now: float) -> None:
+        fired = self.pop_fired(now)
+        if not fired:
+            return
+        today = self.today(now)
+        due_ids = [project_id for project_id in fired if self._due[project_id] <= today]
+        reminder_ids = [project_id for project_id in fired if self._due[project_id] > today]
+        try:
+            await self.on_fire(due_ids, reminder_ids, today)
+        except Exception:
+            logger.exception("Reminder timers: processing %d projects failed", len(fired))
+        finally:
+            # Projects advanced while firing were already rescheduled by on_change
+            now = time.time()
+            for project_id in fired:
+                if project_id in self._due and project_id not in self._fire_at:
+                    self._schedule(project_id, now, after_fire=True)
+
+    async def _checked(self, now: float) -> None:
+        self._checked_at = now
+        try:
+            await self.on_checked(now)
+        except Exception:
+            logger.exception("Reminder timers: recording the last check failed")
+
+    async def _run(self) -> None:
+        seq, rows = await self.repo.get_schedule_rows()
+        self.load(rows, time.time(), seq)
+        # Not kept alive for as long as the loop runs
+        del rows
+        while True:
+            self._wakeup.clear()
+            now = time.time()
+            if self._heap and self._heap[0][0] <= now:
+                await self.fire(now)
+                if self.on_checked is not None:
+                    await self._checked(now)
+                continue
+            if self.on_checked is not None and now - self._checked_at >= MAX_SLEEP_SECONDS:
+                await self._checked(now)
+            if now - self._synced_at >= self.resync_interval:
+                await self.resync()
+                continue
+            timeout = min(MAX_SLEEP_SECONDS, self._synced_at + self.resync_interval - now)
+            if self._heap:
+                timeout = min(timeout, self._heap[0][0] - now)
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
@@ -0,0 +1,310 @@
+import csv
+import json
+import os
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from typing import Any, Iterator, TextIO
+
+from .db import PROJECT_COLUMNS, format_reminder_days, from_due_day, parse_reminder_days, to_due_day
+from .repo import AsyncRepository
+
+
+# Rows validated and inserted per transaction, and read per export page
+DEFAULT_CHUNK_SIZE = 1000
+# Errors listed one by one in the report; the rest are only counted
+MAX_REPORTED_ERRORS = 1000
+MAX_FIELD_LENGTH = 256
+READ_SIZE = 64 * 1024
+
+FORMATS = ("csv", "json", "jsonl")
+EXTENSIONS = {".csv": "csv", ".json": "json", ".jsonl": "jsonl", ".ndjson": "jsonl"}
+REQUIRED_FIELDS = ("project_name", "server_name", "owner_name", "owner_phone", "next_due_date")
+OPTIONAL_FIELDS = (
+    "server_login_username", "server_login_password", "server_ip", "root_password",
+    "start_date", "notify_hour", "reminder_days", "monthly_fee",
+)
+# Written by export_projects and read back by import_projects, which ignores "id"
+EXPORT_FIELDS = (
+    "id", "project_name", "server_name", "owner_name", "owner_phone",
+    "server_login_username", "server_login_password", "server_ip", "root_password",
+    "start_date", "next_due_date", "notify_hour", "reminder_days", "monthly_fee",
+)
+
+
+@dataclass
+class ImportReport:
+    imported: int = 0
+    failed: int = 0
+    # (line, message) of the first MAX_REPORTED_ERRORS bad rows
+    errors: list[tuple[int, str]] = field(default_factory=list)
+    # Set when the file could not be read to the end
+    fatal: str | None = None
+
+    def error(self, line: int, message: str) -> None:
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append((line, message))
+
+    def summary(self) -> str:
+        text = f"Import: {self.imported} ta loyiha qo'shildi, {self.failed} ta qator xato"
+        if self.fatal:
+            text += f"\nFayl oxirigacha o'qilmadi: {self.fatal}"
+        return text
+
+    def error_lines(self) -> list[str]:
+        lines = [f"{line}-qator: {message}" for line, message in self.errors]
+        if self.failed > len(self.errors):
+            lines.append(f"... yana {self.failed - len(self.errors)} ta xato")
+        return lines
+
+
+def detect_format(path: str, file_name: str | None = None) -> str:
+    """Format by the uploaded file's extension, else by its first character"""
+    ext = os.path.splitext(file_name or path)[1].lower()
+    if ext in EXTENSIONS:
+        return EXTENSIONS[ext]
+    with open(path, encoding="utf-8-sig", errors="replace") as f:
+        head = f.read(READ_SIZE).lstrip()
+    if head.startswith("["):
+        return "json"
+    if head.startswith("{"):
+        return "jsonl"
+    return "csv"
+
+
+def parse_day(text: str) -> date | None:
+    """dd.mm.yyyy as typed in the bot, or ISO as stored in the database"""
+    try:
+        return datetime.strptime(text, "%d.%m.%Y").date()
+    except ValueError:
+        pass
+    try:
+        return datetime.fromisoformat(text).date()
+    except ValueError:
+        return None
+
+
+def validate_row(raw: Any, today: date) -> tuple:
+    """Turn one decoded record into a row of db.PROJECT_COLUMNS or raise ValueError"""
+    if isinstance(raw, json.JSONDecodeError):
+        raise ValueError(f"JSON xato: {raw.msg}")
+    if not isinstance(raw, dict):
+        raise ValueError("yozuv obyekt emas")
+    if raw.get(None):
+        # csv.DictReader puts cells beyond the header under None
+        raise ValueError("ustunlar soni sarlavhadan ko'p")
+    values = {}
+    for name in REQUIRED_FIELDS + OPTIONAL_FIELDS:
+        value = raw.get(name)
+        if value is None:
+            value = ""
+        elif isinstance(value, int) and not isinstance(value, bool):
+            # Phone numbers and hours written as JSON numbers
+            value = str(value)
+        elif not isinstance(value, str):
+            raise ValueError(f"{name}: matn bo'lishi kerak")
+        value = value.strip()
+        if len(value) > MAX_FIELD_LENGTH:
+            raise ValueError(f"{name}: {MAX_FIELD_LENGTH} belgidan uzun")
+        values[name] = value
+    missing = [name for name in REQUIRED_FIELDS if not values[name]]
+    if missing:
+        raise ValueError("bo'sh maydon: " + ", ".join(missing))
+    due = parse_day(values["next_due_date"])
+    if due is None:
+        raise ValueError(f"next_due_date: noto'g'ri sana {values['next_due_date']!r}")
+    start = today
+    if values["start_date"]:
+        start = parse_day(values["start_date"])
+        if start is None:
+            raise ValueError(f"start_date: noto'g'ri sana {values['start_date']!r}")
+    hour = None
+    if values["notify_hour"]:
+        if not values["notify_hour"].isdigit() or int(values["notify_hour"]) > 23:
+            raise ValueError(f"notify_hour: 0-23 bo'lishi kerak, {values['notify_hour']!r} emas")
+        hour = int(values["notify_hour"])
+    reminder_days = None
+    if values["reminder_days"]:
+        days = parse_reminder_days(values["reminder_days"])
+        if days is None:
+            raise ValueError(f"reminder_days: noto'g'ri qiymat {values['reminder_days']!r}")
+        reminder_days = format_reminder_days(days)
+    fee = None
+    if values["monthly_fee"]:
+        if not values["monthly_fee"].isdigit():
+            raise ValueError(f"monthly_fee: butun son bo'lishi kerak, {values['monthly_fee']!r} emas")
+        fee = int(values["monthly_fee"])
+    return (
+        values["project_name"],
+        values["server_name"],
+        values["owner_name"],
+        values["owner_phone"],
+        values["server_login_username"] or None,
+        values["server_login_password"] or None,
+        values["server_ip"] or None,
+        values["root_password"] or None,
+        datetime.combine(start, datetime.min.time()).isoformat(),
+        datetime.combine(due, datetime.min.time()).isoformat(),
+        to_due_day(due),
+        hour,
+        reminder_days,
+        fee,
+    )
+
+
+def _read_csv(f: TextIO) -> Iterator[tuple[int, Any]]:
+    reader = csv.DictReader(f)
+    try:
+        header = reader.fieldnames or []
+        missing = [name for name in REQUIRED_FIELDS if name not in header]
+        if missing:
+            raise ValueError("sarlavhada ustun yo'q: " + ", ".join(missing))
+        for row in reader:
+            yield reader.line_num, row
+    except csv.Error as exc:
+        raise ValueError(f"{reader.line_num}-qator: {exc}") from exc
+
+
+def _read_jsonl(f: TextIO) -> Iterator[tuple[int, Any]]:
+    for line, text in enumerate(f, 1):
+        if not text.strip():
+            continue
+        try:
+            yield line, json.loads(text)
+        except json.JSONDecodeError as exc:
+            yield line, exc
+
+
+def _read_json_array(f: TextIO) -> Iterator[tuple[int, Any]]:
+    """Decode the elements of a top-level array one at a time, reading READ_SIZE at a time"""
+    decoder = json.JSONDecoder()
+    buf = f.read(READ_SIZE).lstrip()
+    if not buf.startswith("["):
+        raise ValueError("JSON fayl obyektlar massivi bo'lishi kerak")
+    pos, index, eof = 1, 0, False
+    while True:
+        while pos < len(buf) and buf[pos] in " \t\r\n,":
+            pos += 1
+        if pos == len(buf):
+            if eof:
+                raise ValueError("JSON massiv yopilmagan")
+            more = f.read(READ_SIZE)
+            buf, pos, eof = more, 0, not more
+            continue
+        if buf[pos] == "]":
+            return
+        try:
+            value, end = decoder.raw_decode(buf, pos)
+        except json.JSONDecodeError as exc:
+            # A whole block after the element start is more than any valid record
+            if eof or len(buf) - pos >= READ_SIZE:
+                raise ValueError(f"{index + 1}-yozuv: JSON xato: {exc.msg}") from exc
+            # The element continues in the next block
+            more = f.read(READ_SIZE)
+            buf, pos, eof = buf[pos:] + more, 0, not more
+            continue
+        index += 1
+        yield index, value
+        pos = end
+
+
+def read_records(f: TextIO, fmt: str) -> Iterator[tuple[int, Any]]:
+    """(line, record) of every record in the file, decoded lazily.
+
+    Lines are physical lines for CSV and JSON Lines and element numbers for a
+    JSON array. A bad JSON line is yielded as its JSONDecodeError; a file that
+    cannot be read further raises ValueError.
+    """
+    if fmt == "csv":
+        return _read_csv(f)
+    if fmt == "jsonl":
+        return _read_jsonl(f)
+    if fmt == "json":
+        return _read_json_array(f)
+    raise ValueError(f"Unknown import format: {fmt}")
+
+
+async def import_projects(
+    repo: AsyncRepository,
+    path: str,
+    fmt: str,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    today: date | None = None,
+) -> ImportReport:
+    """Validate the file as it is read and insert its good rows ``chunk_size`` at a time.
+
+    Each chunk is one transaction, so only one chunk of rows is held in memory
+    and other handlers get the database between chunks. Bad rows are skipped
+    and reported; rows inserted before a fatal read error stay.
+    """
+    report = ImportReport()
+    today = today or date.today()
+    chunk: list[tuple] = []
+    with open(path, encoding="utf-8-sig", newline="") as f:
+        try:
+            for line, raw in read_records(f, fmt):
+                try:
+                    chunk.append(validate_row(raw, today))
+                except ValueError as exc:
+                    report.error(line, str(exc))
+                    continue
+                if len(chunk) >= chunk_size:
+                    await repo.insert_projects(chunk)
+                    report.imported += len(chunk)
+                    chunk = []
+        except ValueError as exc:  # includes UnicodeDecodeError
+            report.fatal = str(exc)
+    if chunk:
+        await repo.insert_projects(chunk)
+        report.imported += len(chunk)
+    return report
+
+
+def export_record(row: tuple) -> dict[str, Any]:
+    """A row of db.export_projects_page as EXPORT_FIELDS"""
+    item = dict(zip(("id",) + PROJECT_COLUMNS, row))
+    start = item["start_date"]
+    try:
+        start = datetime.fromisoformat(start).strftime("%d.%m.%Y")
+    except (TypeError, ValueError):
+        pass
+    due = item["next_due_date"]
+    if item["due_day"] is not None:
+        due = from_due_day(item["due_day"]).strftime("%d.%m.%Y")
+    item["start_date"], item["next_due_date"] = start, due
+    return {name: item[name] for name in EXPORT_FIELDS}
+
+
+async def export_projects(
+    repo: AsyncRepository, path: str, fmt: str = "csv", chunk_size: int = DEFAULT_CHUNK_SIZE
+) -> int:
+    """Write every project to ``path`` one page at a time. Returns the number written"""
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown export format: {fmt}")
+    count = 0
+    after_id = 0
+    # With a BOM spreadsheets open the CSV as UTF-8
+    with open(path, "w", encoding="utf-8-sig" if fmt == "csv" else "utf-8", newline="") as f:
+        writer = csv.DictWriter(f, EXPORT_FIELDS) if fmt == "csv" else None
+        if writer:
+            writer.writeheader()
+        elif fmt == "json":
+            f.write("[")
+        while True:
+            rows = await repo.export_projects_page(after_id, chunk_size)
+            if not rows:
+                break
+            for row in rows:
+                record = export_record(row)
+                if writer:
+                    writer.writerow(record)
+                elif fmt == "json":
+                    f.write(",\n" if count else "\n")
+                    f.write(json.dumps(record, ensure_ascii=False))
+                else:
+                    f.write(json.dumps(record, ensure_ascii=False) + "\n")
+                count += 1
+            after_id = rows[-1][0]
+        if fmt == "json":
+            f.write("\n]\n")
+    return count
@@ -0,0 +1,110 @@
+import asyncio
+import logging
+import signal
+from urllib.parse import urlsplit
+
+from aiogram import Bot, Dispatcher
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler
+from aiohttp import web
+
+from .config import DEFAULT_WEBHOOK_HOST, DEFAULT_WEBHOOK_PORT
+
+
+logger = logging.getLogger(__name__)
+
+# Time given to updates still being handled when the server stops
+SHUTDOWN_TIMEOUT = 10.0
+HEALTH_PATH = "/healthz"
+
+
+def webhook_path(url: str) -> str:
+    return urlsplit(url).path or "/"
+
+
+class WebhookHandler(SimpleRequestHandler):
+    """aiogram's webhook handler that answers Telegram at once and drains on close.
+
+    Updates are handled in background tasks, so Telegram gets its 200 as soon
+    as the secret token is checked and the body parsed. On shutdown the server
+    stops accepting requests first, then the updates already accepted get up
+    to ``shutdown_timeout`` seconds to finish.
+    """
+
+    def __init__(
+        self, dispatcher: Dispatcher, bot: Bot, secret_token: str, shutdown_timeout: float = SHUTDOWN_TIMEOUT
+    ):
+        super().__init__(dispatcher, bot, handle_in_background=True, secret_token=secret_token)
+        self.shutdown_timeout = shutdown_timeout
+
+    @property
+    def pending(self) -> int:
+        return len(self._background_feed_update_tasks)
+
+    async def close(self) -> None:
+        tasks = set(self._background_feed_update_tasks)
+        if tasks:
+            _, unfinished = await asyncio.wait(tasks, timeout=self.shutdown_timeout)
+            for task in unfinished:
+                task.cancel()
+            if unfinished:
+                logger.warning("Webhook stopped with %d updates still being handled", len(unfinished))
+        await super().close()
+
+
+async def health(request: web.Request) -> web.Response:
+    return web.Response(text="ok")
+
+
+def build_webhook_app(
+    dp: Dispatcher, bot: Bot, path: str, secret_token: str
+) -> tuple[web.Application, WebhookHandler]:
+    app = web.Application()
+    handler = WebhookHandler(dp, bot, secret_token)
+    handler.register(app, path=path)
+    # For load balancer health checks
+    app.router.add_get(HEALTH_PATH, health)
+    return app, handler
+
+
+async def run_webhook(
+    dp: Dispatcher,
+    bot: Bot,
+    url: str,
+    secret_token: str,
+    host: str = DEFAULT_WEBHOOK_HOST,
+    port: int = DEFAULT_WEBHOOK_PORT,
+) -> None:
+    """Serve updates posted by Telegram to ``url`` until SIGINT/SIGTERM or cancellation.
+
+    The webhook is (re)registered on every start, which is safe with several
+    instances behind one load balancer. It is not removed on shutdown, so the
+    other instances keep receiving updates.
+    """
+    app, _ = build_webhook_app(dp, bot, webhook_path(url), secret_token)
+    runner = web.AppRunner(app, shutdown_timeout=SHUTDOWN_TIMEOUT)
+    await runner.setup()
+    site = web.TCPSite(runner, host, port)
+    await site.start()
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except NotImplementedError:  # Windows
+            pass
+    try:
+        await bot.set_webhook(
+            url,
+            secret_token=secret_token,
+            allowed_updates=dp.resolve_used_update_types(),
+        )
+        logger.info("Serving webhook %s on %s:%d", url, host, port)
+        await stop.wait()
+    finally:
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.remove_signal_handler(sig)
+            except NotImplementedError:
+                pass
+        # Stops accepting connections, then waits for the handler to drain
+        await runner.cleanup()
@@ -0,0 +1,89 @@
+"""
+Show that update handling stays responsive while a long DB scan runs.
+Run with: python -m benchmarks.bench_async_repo [rows] [budget_ms]
+
+A ticker coroutine stands in for update handling: it wakes every millisecond
+and records how late it was. The scan is run once directly on the event loop
+(the old behaviour) and once through AsyncRepository. Through the repository
+the worst tick may be at most the budget late (default 100 ms, against
+seconds for the direct call at 100k rows). Exits 1 when it is not.
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from datetime import date
+
+from app import db
+from app.repo import AsyncRepository
+
+from .datagen import fill
+
+
+TICK = 0.001
+BUDGET_MS = 100.0
+
+
+async def ticker(stop: asyncio.Event, lateness: list[float]) -> None:
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(TICK)
+        lateness.append(time.perf_counter() - started - TICK)
+
+
+async def measure(scan) -> tuple[float, float]:
+    stop = asyncio.Event()
+    lateness: list[float] = []
+    task = asyncio.create_task(ticker(stop, lateness))
+    await asyncio.sleep(0.05)
+    for _ in range(3):
+        await scan()
+    stop.set()
+    await task
+    lateness.sort()
+    return lateness[len(lateness) // 2], lateness[-1]
+
+
+async def run(db_path: str) -> dict[str, float]:
+    """Worst tick lateness in ms by way of scanning"""
+    repo = AsyncRepository(db_path)
+    repo.start()
+
+    async def blocking_scan():
+        db.list_projects(db_path)
+
+    async def repo_scan():
+        await repo.list_projects()
+
+    worst_ms = {}
+    try:
+        for name, scan in (("direct call", blocking_scan), ("AsyncRepository", repo_scan)):
+            median, worst = await measure(scan)
+            worst_ms[name] = worst * 1000
+            print(f"{name:16} tick lateness median {median * 1000:7.2f} ms, max {worst * 1000:7.2f} ms")
+    finally:
+        await repo.close()
+    return worst_ms
+
+
+def main() -> int:
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    budget = float(sys.argv[2]) if len(sys.argv) > 2 else BUDGET_MS
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "bench.db")
+        db.init_db(db_path)
+        fill(db_path, rows, date.today())
+        print(f"rows: {rows}")
+        worst_ms = asyncio.run(run(db_path))
+        db.close_pool(db_path)
+    if worst_ms["AsyncRepository"] > budget:
+        print(f"FAIL: a tick was {worst_ms['AsyncRepository']:.1f} ms late during a repository scan, "
+              f"over the {budget:.0f} ms budget")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
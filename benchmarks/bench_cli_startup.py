@@ -0,0 +1,93 @@
+"""
+Startup budget of the admin CLI.
+Run with: python -m benchmarks.bench_cli_startup [budget_ms]
+
+"import app.cli" runs under -X importtime in fresh interpreters; the median
+cumulative time of app.cli must stay within the budget (default 100 ms, on
+a machine where "import app.bot" takes seconds) and no module of the bot
+stack may be imported. Every subcommand is then run the same way against a
+small database to check that none of them, import and export included,
+pulls the bot stack in. Exits 1 when a check fails.
+"""
+
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from datetime import date
+
+from app import db
+
+from .datagen import fill
+
+BUDGET_MS = 100.0
+RUNS = 7
+# Packages and bot modules the CLI must never load
+FORBIDDEN = ("aiogram", "apscheduler", "aiohttp", "pydantic", "app.bot", "app.scheduler", "app.notifier")
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def importtime(args: list[str]) -> dict[str, tuple[int, int]]:
+    """{module: (self us, cumulative us)} of a fresh interpreter running ``args``"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", *args], cwd=ROOT, capture_output=True, text=True
+    )
+    if result.returncode not in (0, 1):
+        raise RuntimeError(f"{' '.join(args)} failed:\n{result.stderr[-2000:]}")
+    modules = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        own, cumulative, name = line[len("import time:"):].split("|")
+        modules[name.strip()] = (int(own), int(cumulative))
+    return modules
+
+
+def forbidden(modules: dict) -> list[str]:
+    return sorted(name for name in modules if name.split(".")[0] in FORBIDDEN or name in FORBIDDEN)
+
+
+def main() -> int:
+    budget = float(sys.argv[1]) if len(sys.argv) > 1 else BUDGET_MS
+    failed = False
+    runs = [importtime(["-c", "import app.cli"]) for _ in range(RUNS)]
+    cli = statistics.median(modules["app.cli"][1] for modules in runs) / 1000
+    bot = importtime(["-c", "import app.bot"])["app.bot"][1] / 1000
+    print(f"import app.cli: {cli:7.1f} ms (median of {RUNS}, budget {budget:.0f} ms)")
+    print(f"import app.bot: {bot:7.1f} ms")
+    slowest = sorted(runs[-1].items(), key=lambda item: item[1][0], reverse=True)[:5]
+    print("slowest modules (self): " + ", ".join(f"{name} {own / 1000:.1f} ms" for name, (own, _) in slowest))
+    if cli > budget:
+        print(f"FAIL: app.cli imports in {cli:.1f} ms, over the {budget:.0f} ms budget")
+        failed = True
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "cli.db")
+        db.init_db(db_path)
+        fill(db_path, 200, date.today())
+        db.close_pool(db_path)
+        export_path = os.path.join(tmp, "projects.jsonl")
+        commands = [
+            ["--help"],
+            ["init"],
+            ["migrate", "--check"],
+            ["list", "--limit", "5"],
+            ["due", "--days", "3"],
+            ["bump", "1"],
+            ["vacuum"],
+            ["export", export_path],
+            ["import", export_path],
+        ]
+        for command in commands:
+            modules = importtime(["-m", "app.cli", "--db", db_path, *command])
+            loaded = forbidden(modules)
+            print(f"  {' '.join(command[:1]):8} {len(modules):4} modules  "
+                  f"{'bot stack: ' + ', '.join(loaded) if loaded else 'no bot stack'}")
+            if loaded:
+                failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,86 @@
+"""
+Compare the pooled connection layer with the old open-per-call path.
+Run with: python -m benchmarks.bench_db_pool [operations]
+"""
+
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+from app import db
+
+
+@contextmanager
+def legacy_get_conn(db_path: str):
+    """The get_conn implementation before pooling: stat + connect + close per call"""
+    db.ensure_parent_dir(db_path)
+    conn = sqlite3.connect(db_path)
+    try:
+        conn.row_factory = sqlite3.Row
+        yield conn
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def run_operations(db_path: str, operations: int) -> float:
+    now = datetime.now()
+    started = time.perf_counter()
+    for i in range(operations):
+        kind = i % 4
+        if kind == 0:
+            db.add_project(
+                db_path=db_path,
+                project_name=f"project-{i}",
+                server_name=f"server-{i % 10}",
+                owner_name="Owner",
+                owner_phone="+998901234567",
+                server_login_username="root",
+                server_login_password="secret",
+                server_ip="10.0.0.1",
+                root_password="secret",
+                start_date=now,
+                next_due_date=now + timedelta(days=i % 60),
+            )
+        elif kind == 1:
+            db.get_due_projects(db_path, now)
+        elif kind == 2:
+            db.bump_next_due_date(db_path, i // 4 + 1)
+        else:
+            db.set_next_due_date(db_path, i // 4 + 1, now + timedelta(days=30))
+    return time.perf_counter() - started
+
+
+def main():
+    operations = int(sys.argv[1]) if len(sys.argv) > 1 else 4000
+    with tempfile.TemporaryDirectory() as tmp:
+        legacy_path = os.path.join(tmp, "legacy.db")
+        pooled_path = os.path.join(tmp, "pooled.db")
+
+        pooled_get_conn = db.get_conn
+        db.get_conn = legacy_get_conn
+        try:
+            db.init_db(legacy_path)
+            legacy = run_operations(legacy_path, operations)
+        finally:
+            db.get_conn = pooled_get_conn
+
+        db.open_pool(pooled_path)
+        try:
+            db.init_db(pooled_path)
+            pooled = run_operations(pooled_path, operations)
+        finally:
+            db.close_pool(pooled_path)
+
+    print(f"operations:    {operations}")
+    print(f"open-per-call: {operations / legacy:10.0f} ops/s")
+    print(f"pooled:        {operations / pooled:10.0f} ops/s")
+    print(f"speedup:       {legacy / pooled:10.2f}x")
+
+
+if __name__ == "__main__":
+    main()
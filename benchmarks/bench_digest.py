@@ -0,0 +1,90 @@
+"""
+Count Telegram API calls per daily run: one message per project vs digest mode.
+Run with: python -m benchmarks.bench_digest [projects]
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+from aiogram.types import InlineKeyboardMarkup
+
+from app import db
+from app.digest import MAX_BUTTONS, MESSAGE_LIMIT
+from app.repo import AsyncRepository
+from app.scheduler import DEFAULT_REMINDER_DAYS, run_digest, run_due_checks, run_reminder_checks
+
+from .datagen import project_row
+
+
+CHAT_ID = 1
+
+
+async def run(db_path: str, projects: int) -> None:
+    sent: list[tuple[str, dict]] = []
+
+    async def deliver() -> None:
+        # Stand-in for app.outbox: take everything the job queued
+        rows = await repo.fetch_outbox(1_000_000)
+        for row in rows:
+            markup = row["reply_markup"] and InlineKeyboardMarkup.model_validate_json(row["reply_markup"])
+            sent.append((row["text"], {"reply_markup": markup}))
+        await repo.finish_outbox([row["id"] for row in rows], [])
+
+    def refill() -> None:
+        with db.get_conn(db_path) as conn:
+            conn.execute("DELETE FROM projects")
+        db.insert_projects(db_path, generated)
+
+    today = datetime.combine(datetime.now().date(), datetime.min.time())
+    # A third overdue, a third due today, a third due on the reminder day
+    offsets = (-3, 0, DEFAULT_REMINDER_DAYS[0])
+    generated = [
+        project_row(
+            i, today + timedelta(days=offsets[i % 3]),
+            owner_name=f"Owner {i}", server_ip=f"10.0.{i // 256 % 256}.{i % 256}",
+        )
+        for i in range(projects)
+    ]
+    repo = AsyncRepository(db_path)
+    repo.start()
+    try:
+        refill()
+        await run_due_checks(repo, CHAT_ID)
+        await run_reminder_checks(repo, CHAT_ID, DEFAULT_REMINDER_DAYS)
+        await deliver()
+        per_project = len(sent)
+
+        sent.clear()
+        refill()
+        await run_digest(repo, CHAT_ID, days_ahead=max(DEFAULT_REMINDER_DAYS))
+        await deliver()
+        digest = len(sent)
+    finally:
+        await repo.close()
+
+    for text, kwargs in sent:
+        assert len(text) <= MESSAGE_LIMIT
+        markup = kwargs["reply_markup"]
+        assert markup is None or sum(len(row) for row in markup.inline_keyboard) <= MAX_BUTTONS
+    listed = sum(text.count("\n#") + text.startswith("#") for text, _ in sent)
+    assert listed == projects, f"digest listed {listed} of {projects} projects"
+
+    print(f"projects: {projects}")
+    print(f"one message per project: {per_project:6} API calls")
+    print(f"digest mode:             {digest:6} API calls")
+
+
+def main():
+    projects = int(sys.argv[1]) if len(sys.argv) > 1 else 900
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "bench.db")
+        db.init_db(db_path)
+        asyncio.run(run(db_path, projects))
+        db.close_pool(db_path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+Compare per-row bumping with the batched run_due_checks on 10k due projects.
+Run with: python -m benchmarks.bench_due_batch [projects]
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from app import db
+from app.repo import AsyncRepository
+from app.scheduler import run_due_checks
+
+from .datagen import project_row
+
+
+CHAT_ID = 1
+
+
+async def per_row(repo: AsyncRepository) -> None:
+    """The loop run_due_checks used before batching"""
+    for item in await repo.get_due_projects(datetime.now()):
+        await repo.enqueue_outbox([(CHAT_ID, item["project_name"], None)])
+        await repo.bump_next_due_date(int(item["id"]))
+
+
+async def batched(repo: AsyncRepository) -> None:
+    await run_due_checks(repo, CHAT_ID)
+
+
+async def run(db_path: str, projects: int) -> None:
+    today = datetime.combine(datetime.now().date(), datetime.min.time())
+    # Everything is due: from today back to roughly three months overdue
+    generated = [project_row(i, today - timedelta(days=i % 90)) for i in range(projects)]
+    repo = AsyncRepository(db_path)
+    repo.start()
+    try:
+        for name, job in (("per-row bump", per_row), ("batched", batched)):
+            with db.get_conn(db_path) as conn:
+                conn.execute("DELETE FROM projects")
+            db.insert_projects(db_path, generated)
+            started = time.perf_counter()
+            await job(repo)
+            elapsed = time.perf_counter() - started
+            still_due = len(await repo.get_due_projects(today))
+            print(f"{name:13} {elapsed * 1000:9.1f} ms, still due afterwards: {still_due}")
+    finally:
+        await repo.close()
+
+
+def main():
+    projects = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "bench.db")
+        db.init_db(db_path)
+        print(f"due projects: {projects}")
+        asyncio.run(run(db_path, projects))
+        db.close_pool(db_path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Check that the due queries are index range scans and time them on 100k rows.
+Run with: python -m benchmarks.bench_due_index [rows]
+
+The fixture is created with the pre-migration schema (user_version 0) and then
+upgraded through init_db, so the due_day backfill is verified as well.
+"""
+
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from app import db
+
+
+LEGACY_SCHEMA = """
+CREATE TABLE projects (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    project_name TEXT NOT NULL,
+    server_name TEXT NOT NULL,
+    owner_name TEXT NOT NULL,
+    owner_phone TEXT NOT NULL,
+    start_date TEXT NOT NULL,
+    next_due_date TEXT NOT NULL
+);
+"""
+
+LEGACY_DUE_QUERY = "SELECT * FROM projects WHERE date(next_due_date) <= date(?)"
+
+
+def build_legacy_fixture(db_path: str, rows: int, today: datetime) -> None:
+    conn = sqlite3.connect(db_path)
+    conn.executescript(LEGACY_SCHEMA)
+    conn.executemany(
+        "INSERT INTO projects (project_name, server_name, owner_name, owner_phone, start_date, next_due_date) "
+        "VALUES (?, ?, ?, ?, ?, ?)",
+        (
+            (f"project-{i}", f"server-{i % 50}", "Owner", "+998901234567", today.isoformat(),
+             (today + timedelta(days=i % 365 - 5)).isoformat())
+            for i in range(rows)
+        ),
+    )
+    conn.commit()
+    conn.close()
+
+
+def query_plan(db_path: str, sql: str, params: tuple) -> str:
+    with db.get_conn(db_path) as conn:
+        return " | ".join(row["detail"] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params))
+
+
+def timed(fn, repeat: int = 20) -> float:
+    started = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - started) / repeat
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    today = datetime.combine(datetime.now().date(), datetime.min.time())
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "bench.db")
+        build_legacy_fixture(db_path, rows, today)
+
+        started = time.perf_counter()
+        db.init_db(db_path)
+        print(f"migration of {rows} rows: {(time.perf_counter() - started) * 1000:.1f} ms")
+        assert db.schema_version(db_path) == len(db.MIGRATIONS)
+
+        with db.get_conn(db_path) as conn:
+            mismatched = conn.execute(
+                "SELECT count(*) FROM projects WHERE due_day IS NULL OR due_day != ?"
+                " - CAST(julianday(?) - julianday(date(next_due_date)) AS INTEGER)",
+                (db.to_due_day(today), today.date().isoformat()),
+            ).fetchone()[0]
+        assert mismatched == 0, f"{mismatched} rows were backfilled incorrectly"
+
+        due_plan = query_plan(db_path, "SELECT * FROM projects WHERE due_day <= ?", (db.to_due_day(today),))
+        soon_plan = query_plan(db_path, "SELECT * FROM projects WHERE due_day = ?", (db.to_due_day(today) + 2,))
+        print(f"get_due_projects plan:         {due_plan}")
+        print(f"get_projects_due_in_days plan: {soon_plan}")
+        assert "USING INDEX idx_projects_due_fee (due_day<?)" in due_plan
+        assert "USING INDEX idx_projects_due_fee (due_day=?)" in soon_plan
+
+        with db.get_conn(db_path) as conn:
+            legacy = timed(lambda: conn.execute(LEGACY_DUE_QUERY, (today.date().isoformat(),)).fetchall())
+        due = timed(lambda: db.get_due_projects(db_path, today))
+        soon = timed(lambda: db.get_projects_due_in_days(db_path, today, 2))
+        print(f"date(next_due_date) scan:   {legacy * 1000:8.2f} ms")
+        print(f"get_due_projects:           {due * 1000:8.2f} ms")
+        print(f"get_projects_due_in_days:   {soon * 1000:8.2f} ms")
+        db.close_pool(db_path)
+
+
+if __name__ == "__main__":
+    main()
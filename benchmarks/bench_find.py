@@ -0,0 +1,71 @@
+"""
+Compare /find's FTS5 lookup with a LIKE '%..%' scan over the same columns.
+Run with: python -m benchmarks.bench_find [rows]
+"""
+
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+from app import db
+from app.bot import FIND_LIMIT
+
+from .datagen import project_row
+
+
+FIRST_NAMES = ("Aziz", "Bobur", "Dilshod", "Farrux", "Jasur", "Kamola", "Laylo", "Nodir", "Sardor", "Zarina")
+WORDS = ("shop", "crm", "portal", "market", "billing", "school", "clinic", "delivery", "hotel", "bank")
+
+
+def like_search(conn, text: str, limit: int) -> list:
+    pattern = f"%{text}%"
+    where = " OR ".join(f"{column} LIKE ?" for column in db.FTS_COLUMNS)
+    return conn.execute(
+        f"SELECT {db.LIST_COLUMNS} FROM projects WHERE {where} LIMIT ?",
+        (*[pattern] * len(db.FTS_COLUMNS), limit),
+    ).fetchall()
+
+
+def timed(fn, repeat: int = 10) -> float:
+    started = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - started) / repeat
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    queries = ("Zarina", "clinic 4242", "9989012", "10.1.2", "server-299", "nomatch")
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "bench.db")
+        db.init_db(db_path)
+        rnd = random.Random(42)
+        today = datetime.combine(datetime.now().date(), datetime.min.time())
+        generated = [
+            project_row(
+                i, today,
+                project_name=f"{rnd.choice(WORDS)} {rnd.choice(WORDS)} {i}",
+                server_name=f"server-{i % 300}",
+                owner_name=f"{rnd.choice(FIRST_NAMES)} {rnd.choice(FIRST_NAMES)}ov",
+                owner_phone=f"+99890{rnd.randrange(10**7):07d}",
+                server_ip=f"10.{i // 65536 % 256}.{i // 256 % 256}.{i % 256}",
+            )
+            for i in range(rows)
+        ]
+        started = time.perf_counter()
+        db.insert_projects(db_path, generated)
+        print(f"inserted {rows} rows (FTS triggers included) in {time.perf_counter() - started:.2f}s")
+        print(f"{'query':14} {'fts5':>10} {'like scan':>10}")
+        with db.get_conn(db_path) as conn:
+            for text in queries:
+                fts = timed(lambda: db.find_projects(db_path, text, FIND_LIMIT))
+                like = timed(lambda: like_search(conn, text, FIND_LIMIT))
+                print(f"{text:14} {fts * 1000:8.2f}ms {like * 1000:8.2f}ms")
+        db.close_pool(db_path)
+
+
+if __name__ == "__main__":
+    main()
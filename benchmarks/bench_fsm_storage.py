@@ -0,0 +1,159 @@
+"""
+Concurrent users filling in the /addproject form, and abandoned sessions piling up.
+Run with: python -m benchmarks.bench_fsm_storage [users] [abandoned]
+
+Each user walks the nine AddProjectForm steps the way the handlers do (the
+FSM middleware reads the state, the handler updates data and moves to the next
+state). MemoryStorage, SQLiteStorage writing through on every step and
+SQLiteStorage with write-behind batching are compared by steps per second and
+database transactions. Half the users stop after five steps; a new storage on
+the same database must resume them where they stopped.
+
+Then ``abandoned`` users each start a form and never come back. The cache
+must stay within max_entries, memory must stay flat while MemoryStorage grows,
+and once the sessions are older than session_ttl they are deleted from the
+database.
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import Counter
+
+from aiogram.fsm.storage.base import BaseStorage, StorageKey
+from aiogram.fsm.storage.memory import MemoryStorage
+
+from app import db
+from app.bot import AddProjectForm
+from app.repo import AsyncRepository
+from app.storage import SQLiteStorage
+
+BOT_ID = 1
+STEPS = list(AddProjectForm.__all_states__)
+MAX_ENTRIES = 1024
+
+
+class CountingRepository(AsyncRepository):
+    def __init__(self, db_path: str):
+        super().__init__(db_path)
+        self.calls: Counter = Counter()
+
+    async def run(self, fn, *args, **kwargs):
+        self.calls[fn.__name__] += 1
+        return await super().run(fn, *args, **kwargs)
+
+
+class WriteThroughStorage(SQLiteStorage):
+    """Every write is its own transaction"""
+
+    async def set_state(self, key, state=None):
+        await super().set_state(key, state)
+        await self.flush()
+
+    async def set_data(self, key, data):
+        await super().set_data(key, data)
+        await self.flush()
+
+
+def key(user: int) -> StorageKey:
+    return StorageKey(bot_id=BOT_ID, chat_id=user, user_id=user)
+
+
+async def fill_form(storage: BaseStorage, user: int, steps: int) -> None:
+    k = key(user)
+    await storage.get_state(k)
+    await storage.set_state(k, STEPS[0])
+    for i, state in enumerate(STEPS[1:steps], 1):
+        await asyncio.sleep(0)  # the next message arrives
+        assert await storage.get_state(k) == STEPS[i - 1].state
+        await storage.update_data(k, {f"field_{i}": f"value {user}"})
+        await storage.set_state(k, state)
+    if steps == len(STEPS):
+        await storage.get_state(k)
+        data = await storage.get_data(k)
+        assert len(data) == len(STEPS) - 1
+        await storage.set_state(k, None)
+        await storage.set_data(k, {})
+
+
+async def forms(db_path: str, users: int) -> None:
+    print(f"users: {users}, {len(STEPS)} steps each, half stop after 5")
+    for name in ("memory", "write-through", "write-behind"):
+        repo = CountingRepository(db_path)
+        repo.start()
+        if name == "memory":
+            storage = MemoryStorage()
+        else:
+            storage = (WriteThroughStorage if name == "write-through" else SQLiteStorage)(repo)
+            storage.start()
+        started = time.perf_counter()
+        await asyncio.gather(*(fill_form(storage, user, 5 if user % 2 else len(STEPS)) for user in range(users)))
+        await storage.close()
+        elapsed = time.perf_counter() - started
+        writes = repo.calls["save_fsm_records"]
+        steps = sum(5 if user % 2 else len(STEPS) for user in range(users))
+        print(f"{name:14} {steps / elapsed:9.0f} steps/s, {writes:6} write transactions")
+
+        if name != "memory":
+            # A restart continues the forms that were left half way
+            resumed = SQLiteStorage(repo)
+            for user in range(users):
+                expected = STEPS[4].state if user % 2 else None
+                assert await resumed.get_state(key(user)) == expected, f"user {user} lost their form"
+            await resumed.close()
+            with db.get_conn(db_path) as conn:
+                conn.execute("DELETE FROM fsm_state")
+        await repo.close()
+
+
+async def abandoned(db_path: str, sessions: int) -> None:
+    now = [time.time()]
+    repo = AsyncRepository(db_path)
+    repo.start()
+    print(f"abandoned sessions: {sessions}, cache limit: {MAX_ENTRIES}")
+    for name in ("memory", "sqlite"):
+        if name == "memory":
+            storage = MemoryStorage()
+        else:
+            storage = SQLiteStorage(repo, max_entries=MAX_ENTRIES, clock=lambda: now[0])
+            storage.start()
+        tracemalloc.start()
+        for user in range(sessions):
+            await storage.set_state(key(user), STEPS[0])
+            await storage.update_data(key(user), {"project_name": f"project {user}"})
+            if user % 1000 == 0:
+                await asyncio.sleep(0)
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"{name:8} retained {current / 2 ** 20:6.1f} MiB, peak {peak / 2 ** 20:6.1f} MiB")
+        if name == "sqlite":
+            assert len(storage) <= MAX_ENTRIES, f"cache grew to {len(storage)}"
+            await storage.flush()
+            with db.get_conn(db_path) as conn:
+                stored = conn.execute("SELECT COUNT(*) FROM fsm_state").fetchone()[0]
+            assert stored == sessions
+            now[0] += storage.session_ttl + 1
+            expired = await repo.expire_fsm_records(now[0] - storage.session_ttl)
+            assert expired == sessions
+            assert await storage.get_state(key(0)) is None, "an expired session came back"
+            await storage.close()
+            print(f"after session_ttl: {expired} sessions expired from the database")
+    await repo.close()
+
+
+def main():
+    users = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    sessions = int(sys.argv[2]) if len(sys.argv) > 2 else 50_000
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "bench.db")
+        db.init_db(db_path)
+        asyncio.run(forms(db_path, users))
+        asyncio.run(abandoned(db_path, sessions))
+        db.close_pool(db_path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Per-update handler latency with and without per-command setup.
+Run with: python -m benchmarks.bench_handler_latency [updates]
+
+"per-command setup" reproduces what every /list, /delete and form handler did
+before settings and the repository were injected: reload the .env file and
+run the schema statements on a fresh connection.
+"""
+
+import asyncio
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+from app import db
+from app.bot import cmd_delete, load_settings
+from app.repo import AsyncRepository
+
+
+class FakeMessage:
+    def __init__(self, text: str):
+        self.text = text
+
+    async def answer(self, text: str, **kwargs) -> None:
+        pass
+
+
+def legacy_init_db(db_path: str) -> None:
+    conn = sqlite3.connect(db_path)
+    try:
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS projects (id INTEGER PRIMARY KEY AUTOINCREMENT, project_name TEXT NOT NULL, "
+            "server_name TEXT NOT NULL, owner_name TEXT NOT NULL, owner_phone TEXT NOT NULL, "
+            "server_login_username TEXT, server_login_password TEXT, server_ip TEXT, root_password TEXT, "
+            "start_date TEXT NOT NULL, next_due_date TEXT NOT NULL)"
+        )
+        for column in ("server_login_username", "server_login_password", "server_ip", "root_password"):
+            try:
+                conn.execute(f"ALTER TABLE projects ADD COLUMN {column} TEXT")
+            except sqlite3.OperationalError:
+                pass
+        conn.commit()
+    finally:
+        conn.close()
+
+
+async def measure(repo: AsyncRepository, updates: int, per_command_setup: bool) -> float:
+    message = FakeMessage("/delete 999999")
+    started = time.perf_counter()
+    for _ in range(updates):
+        if per_command_setup:
+            settings = load_settings()
+            legacy_init_db(settings.db_path)
+        await cmd_delete(message, repo=repo)
+    return (time.perf_counter() - started) / updates
+
+
+async def run(db_path: str, updates: int) -> None:
+    repo = AsyncRepository(db_path)
+    repo.start()
+    try:
+        before = await measure(repo, updates, per_command_setup=True)
+        after = await measure(repo, updates, per_command_setup=False)
+    finally:
+        await repo.close()
+    print(f"updates:                 {updates}")
+    print(f"with per-command setup:  {before * 1e6:8.0f} us/update")
+    print(f"with injected settings:  {after * 1e6:8.0f} us/update")
+
+
+def main():
+    updates = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "bench.db")
+        os.environ["DATABASE_PATH"] = db_path
+        os.environ.setdefault("TELEGRAM_BOT_TOKEN", "0:bench")
+        os.environ.setdefault("ADMIN_CHAT_ID", "1")
+        db.init_db(db_path)
+        asyncio.run(run(db_path, updates))
+        db.close_pool(db_path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,214 @@
+"""
+Import 100k projects from CSV, JSON and JSON Lines files, then export them back.
+Run with: python -m benchmarks.bench_import [rows]
+
+Every 100th generated row is broken (bad date, empty field, bad hour, ...) and
+must show up in the error report with its line number while the rest is
+inserted. Reported per format: rows per second, insert transactions and the
+worst delay seen by a /list page query running alongside the import. Peak
+Python memory of a CSV import is measured in a separate pass (tracemalloc
+slows everything down); it must stay far below the file size. Inserting the
+same rows one add_project call at a time is timed on a sample for comparison.
+The CSV export is then imported into an empty database and must give back the
+same projects.
+"""
+
+import asyncio
+import csv
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import Counter
+from datetime import datetime, timedelta
+
+from app import db
+from app.repo import AsyncRepository
+from app.transfer import EXPORT_FIELDS, export_projects, import_projects
+
+BAD_EVERY = 100
+SAMPLE = 5000
+BROKEN = (
+    ("next_due_date", "31.02.2026"),
+    ("project_name", ""),
+    ("notify_hour", "25"),
+    ("reminder_days", "0,abc"),
+)
+
+
+class CountingRepository(AsyncRepository):
+    def __init__(self, db_path: str):
+        super().__init__(db_path)
+        self.calls: Counter = Counter()
+
+    async def run(self, fn, *args, **kwargs):
+        self.calls[fn.__name__] += 1
+        return await super().run(fn, *args, **kwargs)
+
+
+def record(i: int) -> dict:
+    due = datetime(2026, 1, 1) + timedelta(days=i % 365)
+    item = {
+        "project_name": f"project-{i}",
+        "server_name": f"server-{i % 50}",
+        "owner_name": f"Owner {i % 1000}",
+        "owner_phone": f"+99890{i:07d}",
+        "server_login_username": "root",
+        "server_login_password": f"pass-{i}",
+        "server_ip": f"10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}",
+        "root_password": f"root-{i}",
+        "start_date": "01.01.2025",
+        "next_due_date": due.strftime("%d.%m.%Y"),
+        "notify_hour": str(i % 24) if i % 3 == 0 else "",
+        "reminder_days": "7,1" if i % 5 == 0 else "",
+    }
+    if i % BAD_EVERY == BAD_EVERY - 1:
+        name, value = BROKEN[i // BAD_EVERY % len(BROKEN)]
+        item[name] = value
+    return item
+
+
+def write_files(tmp: str, rows: int) -> dict[str, str]:
+    paths = {fmt: os.path.join(tmp, f"projects.{fmt}") for fmt in ("csv", "json", "jsonl")}
+    with open(paths["csv"], "w", newline="") as f_csv, open(paths["json"], "w") as f_json, \
+            open(paths["jsonl"], "w") as f_jsonl:
+        writer = csv.DictWriter(f_csv, list(record(0)))
+        writer.writeheader()
+        f_json.write("[\n")
+        for i in range(rows):
+            item = record(i)
+            writer.writerow(item)
+            text = json.dumps(item)
+            f_json.write(("," if i else "") + text + "\n")
+            f_jsonl.write(text + "\n")
+        f_json.write("]\n")
+    return paths
+
+
+async def probe(repo: AsyncRepository, stop: asyncio.Event) -> float:
+    """Worst latency of /list page queries made while the import runs"""
+    worst = 0.0
+    while not stop.is_set():
+        started = time.perf_counter()
+        await repo.list_projects_page("all", 0, 10)
+        worst = max(worst, time.perf_counter() - started)
+        await asyncio.sleep(0.01)
+    return worst
+
+
+async def timed_import(db_path: str, path: str, fmt: str, rows: int) -> None:
+    repo = CountingRepository(db_path)
+    repo.start()
+    stop = asyncio.Event()
+    prober = asyncio.create_task(probe(repo, stop))
+    started = time.perf_counter()
+    report = await import_projects(repo, path, fmt)
+    elapsed = time.perf_counter() - started
+    stop.set()
+    worst = await prober
+    await repo.close()
+
+    bad = rows // BAD_EVERY
+    assert report.fatal is None, report.fatal
+    assert report.imported == rows - bad, report.imported
+    assert report.failed == bad and len(report.errors) == min(bad, 1000), report.failed
+    # The first broken record is i=99: line 101 of the CSV (after the header), record 100 otherwise
+    assert report.errors[0][0] == (101 if fmt == "csv" else 100), report.errors[0]
+    assert "next_due_date" in report.errors[0][1], report.errors[0]
+    print(
+        f"{fmt:6} {report.imported / elapsed:9.0f} rows/s  {elapsed:6.2f}s  "
+        f"{repo.calls['insert_projects']:4} transactions  /list during import: worst {worst * 1000:6.1f} ms"
+    )
+
+
+async def import_memory(db_path: str, path: str) -> None:
+    repo = AsyncRepository(db_path)
+    repo.start()
+    tracemalloc.start()
+    report = await import_projects(repo, path, "csv")
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    await repo.close()
+    print(f"csv import of {report.imported + report.failed} rows: peak Python memory {peak / 2 ** 20:5.1f} MiB")
+
+
+async def one_by_one(db_path: str) -> None:
+    repo = AsyncRepository(db_path)
+    repo.start()
+    started = time.perf_counter()
+    for i in range(SAMPLE):
+        item = record(i * BAD_EVERY)  # never a broken one
+        await repo.add_project(
+            project_name=item["project_name"], server_name=item["server_name"], owner_name=item["owner_name"],
+            owner_phone=item["owner_phone"], server_login_username=item["server_login_username"],
+            server_login_password=item["server_login_password"], server_ip=item["server_ip"],
+            root_password=item["root_password"], start_date=datetime(2025, 1, 1),
+            next_due_date=datetime.strptime(item["next_due_date"], "%d.%m.%Y"),
+        )
+    elapsed = time.perf_counter() - started
+    await repo.close()
+    print(f"add_project one by one ({SAMPLE} rows): {SAMPLE / elapsed:9.0f} rows/s, {SAMPLE} transactions")
+
+
+async def roundtrip(db_path: str, copy_path: str, tmp: str) -> None:
+    repo = AsyncRepository(db_path)
+    repo.start()
+    exported = os.path.join(tmp, "export.csv")
+    started = time.perf_counter()
+    count = await export_projects(repo, exported, "csv")
+    elapsed = time.perf_counter() - started
+    tracemalloc.start()
+    await export_projects(repo, exported, "csv")
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    await repo.close()
+    print(f"export {count / elapsed:9.0f} rows/s  {elapsed:6.2f}s  peak Python memory {peak / 2 ** 20:5.1f} MiB, "
+          f"{os.path.getsize(exported) / 2 ** 20:.1f} MiB file")
+
+    copy = AsyncRepository(copy_path)
+    copy.start()
+    report = await import_projects(copy, exported, "csv")
+    await copy.close()
+    assert report.imported == count and not report.failed, report.summary()
+    columns = ", ".join(db.PROJECT_COLUMNS)
+    with db.get_conn(db_path) as a, db.get_conn(copy_path) as b:
+        original = a.execute(f"SELECT {columns} FROM projects ORDER BY id").fetchall()
+        reimported = b.execute(f"SELECT {columns} FROM projects ORDER BY id").fetchall()
+    assert [tuple(r) for r in original] == [tuple(r) for r in reimported], "export did not round-trip"
+    print(f"export -> import into an empty database: {count} projects identical "
+          f"({len(EXPORT_FIELDS)} columns)")
+
+
+def fresh(tmp: str, name: str) -> str:
+    path = os.path.join(tmp, name)
+    db.init_db(path)
+    return path
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = write_files(tmp, rows)
+        print(f"rows: {rows}, every {BAD_EVERY}th broken, "
+              f"csv file {os.path.getsize(paths['csv']) / 2 ** 20:.1f} MiB")
+        for fmt, path in paths.items():
+            db_path = fresh(tmp, f"{fmt}.db")
+            asyncio.run(timed_import(db_path, path, fmt, rows))
+            if fmt != "csv":
+                db.close_pool(db_path)
+        memory_path = fresh(tmp, "memory.db")
+        asyncio.run(import_memory(memory_path, paths["csv"]))
+        db.close_pool(memory_path)
+        sample_path = fresh(tmp, "sample.db")
+        asyncio.run(one_by_one(sample_path))
+        db.close_pool(sample_path)
+        copy_path = fresh(tmp, "copy.db")
+        asyncio.run(roundtrip(os.path.join(tmp, "csv.db"), copy_path, tmp))
+        db.close_pool(copy_path)
+        db.close_pool(os.path.join(tmp, "csv.db"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+/list page latency and memory as the projects table grows.
+Run with: python -m benchmarks.bench_list_pages
+
+For each table size the first page and a page deep into every view are
+rendered; the old full-table list_projects is measured for comparison. Query
+plans are checked to be index searches without a sort step, for the first
+page and for pages deep into every view in both directions. A deep page must
+not take much longer than the first one.
+"""
+
+import asyncio
+import os
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+from app import db
+from app.bot import LIST_PAGE_SIZE, render_list_page
+from app.repo import AsyncRepository
+
+from .datagen import fill
+
+
+SIZES = (1_000, 10_000, 100_000)
+# A mid-sized server of the generated data
+SERVER = "srv-07"
+RUNS = 5
+# A page deep into a view may cost at most this many first pages, plus slack in seconds
+DEEP_PAGE_FACTOR = 5
+DEEP_PAGE_SLACK = 0.0001
+
+
+def page_time(conn, sql: str, params: list) -> float:
+    """Best of RUNS, in seconds"""
+    best = float("inf")
+    for _ in range(RUNS):
+        started = time.perf_counter()
+        conn.execute(sql, params).fetchall()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def check_plans(db_path: str, today: int) -> None:
+    """First and deep pages of every view, both ways: index searches only, and no slower deep in"""
+    views = (("all", None), ("overdue", None), ("week", None), ("server", SERVER))
+    with db.get_conn(db_path) as conn:
+        for view, server in views:
+            sql, params = db.list_page_query(view, today, -1, server=server)
+            keys = [(row["due_day"], row["id"]) for row in conn.execute(sql, params)]
+            sql, params = db.list_page_query(view, today, LIST_PAGE_SIZE + 1, server=server)
+            first = page_time(conn, sql, params)
+            deepest = 0.0
+            # Cursors at both ends of the view and in the middle, paged each way
+            for cursor in (keys[1], keys[len(keys) // 2], keys[-2]):
+                for backward in (False, True):
+                    sql, params = db.list_page_query(
+                        view, today, LIST_PAGE_SIZE + 1, cursor=cursor, backward=backward, server=server
+                    )
+                    plan = " | ".join(r["detail"] for r in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params))
+                    assert "TEMP B-TREE" not in plan and "SCAN" not in plan, f"{view}: {plan}"
+                    deepest = max(deepest, page_time(conn, sql, params))
+            print(f"  {view:8} first {first * 1000:5.2f} ms, slowest deep {deepest * 1000:5.2f} ms  {plan}")
+            assert deepest <= DEEP_PAGE_FACTOR * first + DEEP_PAGE_SLACK, (
+                f"{view}: a deep page took {deepest * 1000:.2f} ms, the first {first * 1000:.2f} ms"
+            )
+
+
+async def measure(coro_factory) -> tuple[float, int]:
+    tracemalloc.start()
+    started = time.perf_counter()
+    await coro_factory()
+    elapsed = time.perf_counter() - started
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+async def run(db_path: str) -> None:
+    today = datetime.combine(datetime.now().date(), datetime.min.time())
+    repo = AsyncRepository(db_path)
+    repo.start()
+    size = 0
+    try:
+        for target in SIZES:
+            # Another seed for every batch, so each one adds new rows
+            fill(db_path, target - size, today.date(), seed=size)
+            size = target
+            print(f"{size} projects")
+            check_plans(db_path, db.to_due_day(today))
+            deep_cursor = (db.to_due_day(today) - 1, size // 2)
+            cases = (
+                ("list first page", lambda: render_list_page(repo, "all", "", None, False)),
+                ("list deep page", lambda: render_list_page(repo, "all", "", deep_cursor, False)),
+                ("overdue deep page", lambda: render_list_page(repo, "overdue", "", deep_cursor, False)),
+                ("week first page", lambda: render_list_page(repo, "week", "", None, False)),
+                ("server deep page", lambda: render_list_page(repo, "server", SERVER, deep_cursor, True)),
+                ("old list_projects", repo.list_projects),
+            )
+            for name, factory in cases:
+                elapsed, peak = await measure(factory)
+                print(f"  {name:18} {elapsed * 1000:8.2f} ms  peak {peak / 1024:9.1f} KiB")
+    finally:
+        await repo.close()
+
+
+def main():
+    assert LIST_PAGE_SIZE < 100
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "bench.db")
+        db.init_db(db_path)
+        asyncio.run(run(db_path))
+        db.close_pool(db_path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+"""
+Cost of the metrics layer on the paths it instruments.
+Run with: python -m benchmarks.bench_metrics [updates]
+
+/delete updates are fed through a Dispatcher with the real router and a
+Telegram API that answers instantly, with and without HandlerMetricsMiddleware
+(the runs alternate and the median round is reported, as the DB thread
+handoff makes single rounds noisy). The cost of one histogram
+observation is compared with a cheap repository call, which records one per
+call. Since dispatch timings vary by several percent between rounds, the
+middleware is also timed on its own around a no-op handler. Finally /metrics is scraped over HTTP and the exposition checked.
+"""
+
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import aiohttp
+from aiogram import Bot, Dispatcher
+from aiogram.client.session.base import BaseSession
+from aiogram.methods import SendMessage
+from aiogram.types import Chat, Message, Update
+
+from app import db
+from app.bot import Settings, router
+from app.metrics import METRICS, METRICS_PATH, HandlerMetricsMiddleware, start_metrics_server
+from app.notifier import Notifier
+from app.repo import AsyncRepository
+
+CHAT_ID = 1
+ROUNDS = 9
+HOST, PORT = "127.0.0.1", 8766
+
+
+class InstantSession(BaseSession):
+    async def make_request(self, bot, method, timeout=None):
+        if isinstance(method, SendMessage):
+            return Message(message_id=1, date=datetime.now(), chat=Chat(id=CHAT_ID, type="private"), text=method.text)
+        return True
+
+    async def stream_content(self, url, headers=None, timeout=30, chunk_size=65536, raise_for_status=True):
+        yield b""
+
+    async def close(self):
+        pass
+
+
+def update(update_id: int) -> Update:
+    return Update.model_validate({
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": int(time.time()),
+            "chat": {"id": CHAT_ID, "type": "private"},
+            "from": {"id": CHAT_ID, "is_bot": False, "first_name": "Admin"},
+            "text": "/delete 999999",
+            "entities": [{"type": "bot_command", "offset": 0, "length": 7}],
+        },
+    })
+
+
+def dispatcher(db_path: str, repo: AsyncRepository, bot: Bot, instrumented: bool) -> Dispatcher:
+    dp = Dispatcher()
+    dp["settings"] = Settings(token="", admin_chat_id=CHAT_ID, db_path=db_path, timezone="Asia/Tashkent")
+    dp["repo"] = repo
+    dp["notifier"] = Notifier(bot)
+    if instrumented:
+        dp.message.middleware(HandlerMetricsMiddleware())
+    return dp
+
+
+async def run(db_path: str, updates: int) -> None:
+    repo = AsyncRepository(db_path)
+    repo.start()
+    bot = Bot("123456:" + "A" * 35, session=InstantSession())
+    # A router can only be attached to one dispatcher; detach it between runs
+    dps = {}
+    for instrumented in (False, True):
+        dps[instrumented] = dispatcher(db_path, repo, bot, instrumented)
+    events = [update(i) for i in range(updates)]
+    rounds: dict[bool, list[float]] = {False: [], True: []}
+    try:
+        for _ in range(ROUNDS):
+            for instrumented, dp in dps.items():
+                dp.include_router(router)
+                started = time.perf_counter()
+                for event in events:
+                    await dp.feed_update(bot, event)
+                rounds[instrumented].append((time.perf_counter() - started) / updates)
+                router._parent_router = None
+                dp.sub_routers.remove(router)
+        plain, timed = (statistics.median(rounds[flag]) for flag in (False, True))
+        handled = METRICS.handler_seconds.series["cmd_delete"].count
+        assert handled == ROUNDS * updates, handled
+        print(f"updates: {updates} x {ROUNDS} rounds")
+        print(f"dispatch without middleware: {plain * 1e6:7.1f} us/update")
+        print(f"dispatch with middleware:    {timed * 1e6:7.1f} us/update  ({(timed - plain) / plain:+.1%})")
+
+        n = 200_000
+        middleware = HandlerMetricsMiddleware()
+        data = {"handler": router.message.handlers[0]}
+
+        async def handler(event, data):
+            return None
+
+        started = time.perf_counter()
+        for _ in range(n):
+            await middleware(handler, None, data)
+        own = (time.perf_counter() - started) / n
+        print(f"middleware itself:           {own * 1e9:7.0f} ns/update, {own / plain:.2%} of a dispatch")
+
+        started = time.perf_counter()
+        for _ in range(n):
+            METRICS.db_seconds.observe("bench", 0.0003)
+        observe = (time.perf_counter() - started) / n
+        started = time.perf_counter()
+        for _ in range(updates):
+            await repo.get_meta("missing")
+        call = (time.perf_counter() - started) / updates
+        print(f"one observation:             {observe * 1e9:7.0f} ns, "
+              f"{observe / call:.2%} of a get_meta repository call ({call * 1e6:.0f} us)")
+
+        started = time.perf_counter()
+        text = METRICS.render()
+        print(f"render: {(time.perf_counter() - started) * 1000:.2f} ms for {len(text.splitlines())} lines")
+
+        runner = await start_metrics_server(HOST, PORT)
+        try:
+            async with aiohttp.ClientSession() as http:
+                async with http.get(f"http://{HOST}:{PORT}{METRICS_PATH}") as response:
+                    assert response.status == 200
+                    assert response.headers["Content-Type"].startswith("text/plain; version=0.0.4")
+                    body = await response.text()
+        finally:
+            await runner.cleanup()
+        for line in body.splitlines():
+            if not line.startswith("#"):
+                name, value = line.rsplit(" ", 1)
+                float(value)
+        assert f'reminder_bot_handler_seconds_count{{handler="cmd_delete"}} {handled}' in body
+        assert 'reminder_bot_db_seconds_count{function="delete_project"}' in body
+        print(f"scraped {METRICS_PATH}: {len(body)} bytes, every sample parses")
+    finally:
+        await repo.close()
+
+
+def main():
+    updates = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "bench.db")
+        db.init_db(db_path)
+        asyncio.run(run(db_path, updates))
+        db.close_pool(db_path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Drive Notifier against a local fake Bot that injects flood errors.
+Run with: python -m benchmarks.bench_notifier [messages]
+
+The fake Bot answers every 20th call with TelegramRetryAfter and enforces the
+per-chat limit itself, so the run fails loudly if the notifier ever sends to a
+chat faster than it is allowed to or loses a message.
+"""
+
+import asyncio
+import sys
+import time
+
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import SendMessage
+
+from app.notifier import Notifier
+
+
+class FakeBot:
+    def __init__(self, flood_every: int, retry_after: int, min_interval: float):
+        self.flood_every = flood_every
+        self.retry_after = retry_after
+        self.min_interval = min_interval
+        self.calls = 0
+        self.floods = 0
+        self.too_fast = 0
+        self.delivered: list[str] = []
+        self._last_sent: dict[int, float] = {}
+
+    async def send_message(self, chat_id: int, text: str, **kwargs):
+        self.calls += 1
+        flood = self.calls % self.flood_every == 0
+        await asyncio.sleep(0.002)  # network round-trip
+        now = time.monotonic()
+        too_fast = now - self._last_sent.get(chat_id, 0.0) < self.min_interval
+        if too_fast:
+            self.too_fast += 1
+        elif flood:
+            self.floods += 1
+        if too_fast or flood:
+            raise TelegramRetryAfter(
+                method=SendMessage(chat_id=chat_id, text=text),
+                message="Too Many Requests",
+                retry_after=self.retry_after,
+            )
+        self._last_sent[chat_id] = now
+        self.delivered.append(text)
+
+
+async def run(messages: int) -> None:
+    chats = 20
+    per_chat_rate = 20.0
+    bot = FakeBot(flood_every=20, retry_after=0, min_interval=0.9 / per_chat_rate)
+    notifier = Notifier(bot, workers=8, global_rate=200.0, per_chat_rate=per_chat_rate, base_backoff=0.05)
+    notifier.start()
+    started = time.perf_counter()
+    futures = [notifier.send(i % chats, f"message {i}") for i in range(messages)]
+    results = await asyncio.gather(*futures)
+    elapsed = time.perf_counter() - started
+    await notifier.close()
+
+    assert all(results), "some messages were given up"
+    assert bot.too_fast == 0, f"{bot.too_fast} sends broke the per-chat limit"
+    assert sorted(bot.delivered) == sorted(f"message {i}" for i in range(messages))
+    stats = notifier.stats
+    print(f"messages: {messages} to {chats} chats in {elapsed:.2f}s ({messages / elapsed:.0f} msg/s)")
+    print(f"api calls: {bot.calls}, injected floods: {bot.floods}, per-chat limit violations: {bot.too_fast}")
+    print(f"queued: {stats.queued}, sent: {stats.sent}, retried: {stats.retried}, failed: {stats.failed}")
+
+
+def main():
+    messages = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    asyncio.run(run(messages))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+"""
+Rendering throughput of app.render for 10k projects.
+Run with: python -m benchmarks.bench_render [cards]
+
+Rows come from a generated database (SELECT *, as the scheduler reads them).
+The /list card and the due notice are timed as they were rendered before
+app.render existed - an f-string per call and next_due_date reparsed with
+fromisoformat - and through the shared templates, then the card again
+through a cold and a warm CardCache. A write must invalidate its card.
+Finally a project made of HTML special characters is rendered with every
+template: no raw markup may get through, unescaping must give back the
+values as typed, and cutting the text at any length must not split an
+entity.
+"""
+
+import html
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, datetime
+
+from app import db
+from app.render import (
+    CARD,
+    DIGEST_LINE,
+    DUE,
+    NEW_PROJECT,
+    REMINDER,
+    CardCache,
+    due_message,
+    format_day,
+    truncate,
+)
+
+from .datagen import fill
+
+RUNS = 5
+NASTY = {
+    "id": 7,
+    "version": 0,
+    "project_name": "<b>R&D</b>",
+    "server_name": "a<b",
+    "owner_name": "Tom & Jerry",
+    "owner_phone": "&lt;",
+    "server_login_username": "",
+    "server_ip": None,
+    "due_day": 20000,
+}
+
+
+def format_date(d: datetime | str) -> str:
+    # What scheduler.py and bot.py each did before app.render
+    if isinstance(d, str):
+        try:
+            d = datetime.fromisoformat(d)
+        except (ValueError, AttributeError):
+            return d
+    if isinstance(d, datetime):
+        d = d.date()
+    return d.strftime("%d.%m.%Y")
+
+
+def old_card(it: dict) -> str:
+    due_date_formatted = format_date(it["next_due_date"]) if it["due_day"] is not None else "N/A"
+    return (
+        f"ID: {it['id']} | {it['project_name']}\n"
+        f"Server: {it['server_name']}\n"
+        f"Ega: {it['owner_name']} | Tel: {it['owner_phone']}\n"
+        f"Login: {it.get('server_login_username') or 'N/A'} | IP: {it.get('server_ip') or 'N/A'}\n"
+        f"Tugash sanasi: {due_date_formatted}\n"
+        f"{'─' * 30}"
+    )
+
+
+def old_due_message(item: dict) -> str:
+    due_date_formatted = format_date(item["next_due_date"])
+    return (
+        f"🔴 Eslatma: Server uchun oylik to'lov vaqti keldi!\n"
+        f"Project: {item['project_name']}\n"
+        f"Server: {item['server_name']}\n"
+        f"Ega: {item['owner_name']}\n"
+        f"Telefon: {item['owner_phone']}\n"
+        f"Login: {item.get('server_login_username', 'N/A')}\n"
+        f"IP: {item.get('server_ip', 'N/A')}\n"
+        f"Tugash sanasi: {due_date_formatted}"
+    )
+
+
+def timed(fn, rows: list[dict]) -> float:
+    """Median seconds to render every row"""
+    times = []
+    for _ in range(RUNS):
+        started = time.perf_counter()
+        for row in rows:
+            fn(row)
+        times.append(time.perf_counter() - started)
+    return statistics.median(times)
+
+
+def report(label: str, seconds: float, cards: int, baseline: float | None = None) -> None:
+    line = f"  {label:28} {seconds * 1000:7.1f} ms  {cards / seconds:10,.0f} cards/s"
+    if baseline is not None:
+        line += f"  ({baseline / seconds:4.1f}x)"
+    print(line)
+
+
+def check_escaping() -> None:
+    for template in (CARD, DUE, REMINDER, NEW_PROJECT, DIGEST_LINE):
+        text = template.render(NASTY, days_left=2)
+        assert "<" not in text and ">" not in text, text
+        visible = html.unescape(text)
+        for name in ("project_name", "server_name", "owner_name", "owner_phone"):
+            if name in template.fields:
+                assert NASTY[name] in visible, (name, visible)
+        for name in ("server_login_username", "server_ip"):
+            if name in template.fields:
+                assert "N/A" in visible
+    # Cutting anywhere keeps whole entities only
+    text = CARD.render(NASTY)
+    visible = html.unescape(text)
+    for limit in range(1, len(text)):
+        cut = truncate(text, limit, "…")
+        assert len(cut) <= limit and cut.endswith("…")
+        amp = cut.rfind("&")
+        assert amp == -1 or ";" in cut[amp:], cut
+        assert visible.startswith(html.unescape(cut[:-1])), cut
+    print("escaping: special characters survive every template and every cut")
+
+
+def main():
+    cards = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "bench.db")
+        db.init_db(db_path)
+        fill(db_path, cards, date.today())
+        with db.get_conn(db_path) as conn:
+            rows = [dict(row) for row in conn.execute("SELECT * FROM projects ORDER BY id")]
+
+        for row in rows:
+            assert CARD.render(row) == old_card(row), (CARD.render(row), old_card(row))
+            assert due_message(row) == old_due_message(row)
+        print(f"{cards} projects, output identical to the old f-strings for this data")
+
+        print("/list card:")
+        old = timed(old_card, rows)
+        report("f-string + fromisoformat", old, cards)
+        format_day.cache_clear()
+        report("template", timed(CARD.render, rows), cards, old)
+        cache = CardCache(CARD, max_size=cards)
+        started = time.perf_counter()
+        for row in rows:
+            cache.render(row)
+        report("cache, cold", time.perf_counter() - started, cards, old)
+        report("cache, warm", timed(cache.render, rows), cards, old)
+        assert cache.misses == cards and cache.hits == RUNS * cards
+
+        print("due notice:")
+        old = timed(old_due_message, rows)
+        report("f-string + fromisoformat", old, cards)
+        report("template", timed(due_message, rows), cards, old)
+
+        # A write bumps the row's version: the next render must show it
+        project_id = rows[0]["id"]
+        new_day = db.bump_next_due_date(db_path, project_id)
+        (row,) = db.get_projects_by_ids(db_path, [project_id])
+        assert row["version"] == rows[0]["version"] + 1
+        card = cache.render(row)
+        assert format_day(new_day) in card and cache.misses == cards + 1
+        small = CardCache(CARD, max_size=100)
+        for row in rows:
+            small.render(row)
+        assert len(small) == 100
+        print(f"cache: a bumped project is re-rendered, an LRU of 100 keeps {len(small)} cards")
+        check_escaping()
+        db.close_pool(db_path)
+
+
+if __name__ == "__main__":
+    main()
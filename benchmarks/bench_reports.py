@@ -0,0 +1,222 @@
+"""
+/report queries on years of synthetic payment history.
+Run with: python -m benchmarks.bench_reports [projects]
+
+For 1, 3 and 5 years of monthly payments on the generated projects, each
+report is timed as the SQL aggregate the bot runs and as the same numbers
+computed by a Python loop over the fetched rows; both must agree. After the
+payments, the daily due checks of the last SCHEDULED_DAYS run through
+app.scheduler, so the ledger also holds the roll-overs the scheduler writes
+and the reports must keep them apart from payments. Query plans are checked
+to read only covering indexes. Finally the cost of writing the ledger row is
+measured on bump_next_due_date.
+"""
+
+import asyncio
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+
+from app import db
+from app.repo import AsyncRepository
+from app.scheduler import run_due_checks
+
+from .datagen import fill, fill_payments
+
+YEARS = (1, 3, 5)
+RUNS = 5
+OWNERS_SHOWN = 10
+BUMPS = 2000
+SCHEDULED_DAYS = 90
+CHAT_ID = 1
+
+
+def best(fn, *args) -> tuple[float, object]:
+    """Median time of RUNS calls and the last result"""
+    times = []
+    for _ in range(RUNS):
+        started = time.perf_counter()
+        result = fn(*args)
+        times.append(time.perf_counter() - started)
+    return statistics.median(times), result
+
+
+async def schedule(db_path: str, today: date) -> int:
+    """Run the daily due checks of the SCHEDULED_DAYS up to today. Returns the number of roll-overs"""
+    repo = AsyncRepository(db_path)
+    repo.start()
+    try:
+        rolled = 0
+        for back in range(SCHEDULED_DAYS, -1, -1):
+            now = datetime.combine(today - timedelta(days=back), datetime.min.time())
+            rolled += await run_due_checks(repo, CHAT_ID, now=now)
+        return rolled
+    finally:
+        await repo.close()
+
+
+def revenue_loop(db_path: str, first_day: int, last_day: int) -> list[dict]:
+    with db.get_conn(db_path) as conn:
+        rows = conn.execute(
+            "SELECT paid_day, period_start, period_end, amount, source FROM payments "
+            "WHERE paid_day BETWEEN ? AND ?",
+            (first_day, last_day),
+        ).fetchall()
+    months: dict[str, list[int]] = defaultdict(lambda: [0, 0, 0, 0, 0])
+    for row in rows:
+        totals = months[db.from_due_day(row["paid_day"]).strftime("%Y-%m")]
+        if row["source"] == db.ROLLOVER_SOURCE:
+            totals[3] += 1
+            totals[4] += row["amount"]
+            continue
+        totals[0] += 1
+        totals[1] += row["amount"]
+        totals[2] += row["period_end"] > row["period_start"] and row["paid_day"] > row["period_start"]
+    return [
+        {
+            "month": month, "payments": n, "amount": amount, "late": late,
+            "rolled_over": rolled, "rolled_over_amount": rolled_amount,
+        }
+        for month, (n, amount, late, rolled, rolled_amount) in sorted(months.items())
+    ]
+
+
+def lateness_loop(db_path: str, since_day: int, limit: int) -> list[dict]:
+    with db.get_conn(db_path) as conn:
+        rows = conn.execute(
+            "SELECT owner_name, paid_day, period_start, period_end, source FROM payments WHERE paid_day >= ?",
+            (since_day,),
+        ).fetchall()
+    owners: dict[str, list[int]] = defaultdict(lambda: [0, 0, 0, -10 ** 9])
+    for row in rows:
+        if row["period_end"] <= row["period_start"] or row["source"] == db.ROLLOVER_SOURCE:
+            continue
+        delay = row["paid_day"] - row["period_start"]
+        totals = owners[row["owner_name"]]
+        totals[0] += 1
+        totals[1] += delay > 0
+        totals[2] += max(delay, 0)
+        totals[3] = max(totals[3], delay)
+    result = [
+        {"owner_name": owner, "payments": n, "late": late, "avg_days_late": days / n, "max_days_late": most}
+        for owner, (n, late, days, most) in owners.items()
+        if late
+    ]
+    result.sort(key=lambda r: (-r["late"], -r["avg_days_late"], r["owner_name"]))
+    return result[:limit]
+
+
+def plan(db_path: str, sql: str, params: tuple) -> str:
+    with db.get_conn(db_path) as conn:
+        return " | ".join(row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + sql, params))
+
+
+def check_plans(db_path: str, today: int) -> None:
+    revenue = plan(
+        db_path,
+        f"SELECT strftime('%Y-%m', paid_day * 86400, 'unixepoch') AS month, SUM({db.PAID}), "
+        f"SUM(({db.PAID}) * amount), SUM({db.LATE}) FROM payments WHERE paid_day BETWEEN ? AND ? GROUP BY month",
+        (today - 365, today),
+    )
+    overdue = plan(
+        db_path, "SELECT COUNT(*), SUM(COALESCE(monthly_fee, 0)) FROM projects WHERE due_day < ?", (today,)
+    )
+    late = plan(
+        db_path,
+        "SELECT owner_name, COUNT(*), SUM(paid_day > period_start), AVG(MAX(paid_day - period_start, 0)) "
+        f"FROM payments WHERE paid_day >= ? AND period_end > period_start AND {db.PAID} GROUP BY owner_name",
+        (today - 365,),
+    )
+    rolled = plan(
+        db_path,
+        "SELECT COUNT(*), SUM(amount) FROM payments "
+        f"WHERE source = '{db.ROLLOVER_SOURCE}' AND period_end > ?",
+        (today,),
+    )
+    for name, text, index in (
+        ("revenue", revenue, "idx_payments_paid_day"),
+        ("overdue", overdue, "idx_projects_due_fee"),
+        ("late", late, "idx_payments_owner"),
+        ("rolled", rolled, "idx_payments_source"),
+    ):
+        print(f"  plan {name:8} {text}")
+        assert f"COVERING INDEX {index}" in text, text
+    assert "TEMP B-TREE" not in late, late
+
+
+def report(db_path: str, today: date, years: int, payments: int, rolled: int) -> None:
+    today_day = db.to_due_day(today)
+    year_ago = today_day - 365
+    print(f"{years} year(s): {payments} payments, {rolled} roll-overs")
+    for label, since in (("365 days", year_ago), ("all", 0)):
+        sql, rows = best(db.revenue_by_month, db_path, since, today_day)
+        loop, expected = best(revenue_loop, db_path, since, today_day)
+        assert rows == expected, (rows[:2], expected[:2])
+        assert sum(r["rolled_over"] for r in rows) == rolled, "roll-overs missing from the ledger"
+        print(f"  revenue {label:9}  SQL {sql * 1000:7.1f} ms  Python loop {loop * 1000:7.1f} ms  "
+              f"({loop / sql:4.1f}x)  {len(rows)} months")
+        sql, rows = best(db.owner_lateness, db_path, since, OWNERS_SHOWN)
+        loop, expected = best(lateness_loop, db_path, since, OWNERS_SHOWN)
+        assert [(r["owner_name"], r["late"]) for r in rows] == [(r["owner_name"], r["late"]) for r in expected]
+        print(f"  late    {label:9}  SQL {sql * 1000:7.1f} ms  Python loop {loop * 1000:7.1f} ms  "
+              f"({loop / sql:4.1f}x)  worst: {rows[0]['owner_name']} {rows[0]['late']}/{rows[0]['payments']}")
+    sql, summary = best(db.overdue_summary, db_path, today_day)
+    print(f"  overdue           SQL {sql * 1000:7.1f} ms  {summary['projects']} projects, "
+          f"{summary['owed']:,} so'm owed, {summary['rolled_over']} rolled over unpaid "
+          f"({summary['rolled_over_amount']:,} so'm)")
+    assert 0 < summary["rolled_over"] <= rolled, summary
+    check_plans(db_path, today_day)
+
+
+def bump_cost(db_path: str, projects: int) -> None:
+    """Time bump_next_due_date against the same move without the ledger row, as it was before"""
+    def bare(ids):
+        for project_id in ids:
+            with db.get_conn(db_path) as conn:
+                row = conn.execute("SELECT next_due_date FROM projects WHERE id = ?", (project_id,)).fetchone()
+                new_due = datetime.fromisoformat(row["next_due_date"]) + timedelta(days=db.BILLING_CYCLE_DAYS)
+                conn.execute(
+                    "UPDATE projects SET next_due_date = ?, due_day = ? WHERE id = ?",
+                    (new_due.isoformat(), db.to_due_day(new_due), project_id),
+                )
+
+    def ledger(ids):
+        for project_id in ids:
+            db.bump_next_due_date(db_path, project_id)
+
+    ids = list(range(1, min(BUMPS, projects) + 1))
+    timings = {}
+    for name, fn in (("bare UPDATE", bare), ("with ledger", ledger)) * 2:
+        started = time.perf_counter()
+        fn(ids)
+        timings[name] = (time.perf_counter() - started) / len(ids)
+    print(f"bump: without ledger {timings['bare UPDATE'] * 1e6:.0f} us, "
+          f"with ledger row {timings['with ledger'] * 1e6:.0f} us per project")
+
+
+def main():
+    projects = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    today = date.today()
+    with tempfile.TemporaryDirectory() as tmp:
+        base = os.path.join(tmp, "base.db")
+        db.init_db(base)
+        fill(base, projects, today)
+        db.close_pool(base)
+        for years in YEARS:
+            db_path = os.path.join(tmp, f"history-{years}.db")
+            shutil.copy(base, db_path)
+            payments = fill_payments(db_path, years, today)
+            rolled = asyncio.run(schedule(db_path, today))
+            report(db_path, today, years, payments, rolled)
+            if years == YEARS[-1]:
+                bump_cost(db_path, projects)
+            db.close_pool(db_path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,198 @@
+"""
+Load test for AccessMiddleware and /list coalescing.
+Run with: python -m benchmarks.bench_throttle [projects]
+
+Updates go through a Dispatcher with the real router, SQLite FSM storage and
+a fake Telegram API answering in 5-10 ms, set up once as in app.bot.main
+("guarded") and once without the access middleware ("open"). DB work is
+counted from the repository's db_seconds metric, so FSM reads count too.
+
+burst: the admin sends /list 50 times while 200 strangers send ten /list
+each. Without the middleware they are sent one at a time and then all at
+once, where identical /list in flight share one page read. sustained: the
+admin sends 20 /list a second for a minute on a simulated clock; the /list
+bucket must cap the page reads at its burst plus its rate times the
+duration. Finally 100,000 different allowed users pass the middleware with
+room for 1,000, which must stay the most it keeps.
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from datetime import date
+
+from aiogram import Dispatcher
+from aiogram.types import Update
+
+from app import db
+from app.bot import Settings, router
+from app.metrics import METRICS, Metrics
+from app.notifier import Notifier
+from app.repo import AsyncRepository
+from app.storage import SQLiteStorage
+from app.throttle import COMMAND_LIMITS, AccessMiddleware
+
+from .datagen import fill
+from .fake_telegram import FakeTelegramAPI
+
+ADMIN = 1
+STRANGERS = 200
+STRANGER_UPDATES = 10
+ADMIN_BURST = 50
+SUSTAINED_SECONDS = 60
+SUSTAINED_RATE = 20
+MAX_USERS = 1_000
+USERS = 100_000
+
+
+def text_update(update_id: int, user: int, text: str) -> Update:
+    return Update.model_validate({
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": int(time.time()),
+            "chat": {"id": user, "type": "private"},
+            "from": {"id": user, "is_bot": False, "first_name": f"User {user}"},
+            "text": text,
+            "entities": [{"type": "bot_command", "offset": 0, "length": len(text)}],
+        },
+    })
+
+
+def db_calls() -> dict[str, int]:
+    return {name: series.count for name, series in METRICS.db_seconds.series.items()}
+
+
+def delta(before: dict[str, int]) -> dict[str, int]:
+    return {name: count - before.get(name, 0) for name, count in db_calls().items()}
+
+
+class Bench:
+    def __init__(self, db_path: str, api: FakeTelegramAPI):
+        self.db_path = db_path
+        self.api = api
+        self.ids = iter(range(1, 10 ** 9))
+
+    async def dispatch(self, updates: list[tuple[int, str]], access: AccessMiddleware | None, concurrent: bool,
+                       tick: float = 0.0) -> dict:
+        repo = AsyncRepository(self.db_path)
+        repo.start()
+        bot = self.api.bot()
+        storage = SQLiteStorage(repo)
+        storage.start()
+        dp = Dispatcher(storage=storage, disable_fsm=True)
+        dp["settings"] = Settings(token="", admin_chat_id=ADMIN, db_path=self.db_path, timezone="Asia/Tashkent")
+        dp["repo"] = repo
+        dp["notifier"] = Notifier(bot)
+        if access is not None:
+            dp.update.outer_middleware(access)
+        dp.update.outer_middleware(dp.fsm)
+        dp.include_router(router)
+        sent = len(self.api.calls)
+        before = db_calls()
+        try:
+            started = time.perf_counter()
+            events = [text_update(next(self.ids), user, text) for user, text in updates]
+            if concurrent:
+                await asyncio.gather(*(dp.feed_update(bot, event) for event in events))
+            else:
+                for event in events:
+                    await dp.feed_update(bot, event)
+                    if tick:
+                        access.clock.now += tick
+            elapsed = time.perf_counter() - started
+        finally:
+            await storage.close()
+            await repo.close()
+            await bot.session.close()
+            router._parent_router = None
+            dp.sub_routers.remove(router)
+        calls = delta(before)
+        return {
+            "elapsed": elapsed,
+            "db": sum(calls.values()),
+            "pages": calls.get("list_projects_page", 0),
+            "api": len(self.api.calls) - sent,
+        }
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def report(label: str, updates: int, result: dict) -> None:
+    print(f"  {label:20} {updates:5} updates  {result['elapsed']:6.2f} s  "
+          f"DB calls {result['db']:5}  list pages read {result['pages']:5}  API calls {result['api']:5}")
+
+
+async def run(db_path: str) -> None:
+    api = FakeTelegramAPI(latency=0.005, jitter=0.005)
+    await api.start()
+    bench = Bench(db_path, api)
+    try:
+        updates = [(ADMIN, "/list")] * ADMIN_BURST + [
+            (10_000 + i, "/list") for i in range(STRANGERS) for _ in range(STRANGER_UPDATES)
+        ]
+        print(f"burst: admin x {ADMIN_BURST} /list + {STRANGERS} strangers x {STRANGER_UPDATES} /list")
+        # One at a time, so no two /list are in flight together and nothing is coalesced
+        serial = await bench.dispatch(updates, None, concurrent=False)
+        report("open, one at a time", len(updates), serial)
+        open_ = await bench.dispatch(updates, None, concurrent=True)
+        report("open", len(updates), open_)
+        rejected = dict(METRICS.rejected_updates.values)
+        guarded = await bench.dispatch(updates, AccessMiddleware({ADMIN}), concurrent=True)
+        report("guarded", len(updates), guarded)
+        dropped = {k: v - rejected.get(k, 0) for k, v in METRICS.rejected_updates.values.items()}
+        print(f"  dropped: {dropped}")
+        # Five /list fit the command bucket and, arriving together, share one page read
+        assert guarded["pages"] <= COMMAND_LIMITS["list"][1], guarded
+        assert dropped.get("not_allowed") == STRANGERS * STRANGER_UPDATES, dropped
+
+        rate, burst = COMMAND_LIMITS["list"]
+        cap = burst + rate * SUSTAINED_SECONDS
+        updates = [(ADMIN, "/list")] * (SUSTAINED_SECONDS * SUSTAINED_RATE)
+        print(f"sustained: admin sends {SUSTAINED_RATE} /list a second for {SUSTAINED_SECONDS} simulated s")
+        access = AccessMiddleware({ADMIN}, clock=FakeClock())
+        sustained = await bench.dispatch(updates, access, concurrent=False, tick=1 / SUSTAINED_RATE)
+        report("guarded", len(updates), sustained)
+        print(f"  cap {cap:.0f} page reads ({burst:.0f} burst + {rate} per second)")
+        assert sustained["pages"] <= cap, sustained
+
+        access = AccessMiddleware(range(USERS), max_users=MAX_USERS, metrics=Metrics())
+        events = [text_update(i, i, "/start") for i in range(USERS)]
+
+        async def handler(event, data):
+            return None
+
+        largest = 0
+        started = time.perf_counter()
+        for event in events:
+            user = event.message.from_user
+            await access(handler, event, {"event_from_user": user, "event_chat": event.message.chat})
+            largest = max(largest, len(access))
+        per_update = (time.perf_counter() - started) / USERS
+        print(f"memory: {USERS} users through the middleware, at most {largest} kept "
+              f"(limit {MAX_USERS}), {per_update * 1e6:.1f} us/update")
+        assert largest <= MAX_USERS
+    finally:
+        await api.close()
+
+
+def main():
+    projects = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "bench.db")
+        db.init_db(db_path)
+        fill(db_path, projects, date.today())
+        asyncio.run(run(db_path))
+        db.close_pool(db_path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+Memory and wake-up cost of ReminderTimers at 100k projects.
+Run with: python -m benchmarks.bench_timers [projects]
+
+Measures the startup rebuild (one query plus heapify), the memory the timers
+hold, the cost of an incremental change and of a resync picking up changes
+written by another process (as app.cli does), against reloading every
+schedule, and the cost of one wake-up that fires a day's worth of projects,
+compared with the daily full-table scan it replaces.
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+from app import db
+from app.repo import AsyncRepository, ProjectChange
+from app.scheduler import DEFAULT_REMINDER_DAYS
+from app.timers import ReminderTimers
+
+from .datagen import project_row
+
+
+TZ = "Asia/Tashkent"
+# Projects moved by "another process" before a resync
+CLI_CHANGES = 1000
+
+
+async def run(db_path: str, projects: int) -> None:
+    fired: list[int] = []
+
+    async def on_fire(due_ids, reminder_ids, today):
+        fired.extend(due_ids)
+        fired.extend(reminder_ids)
+
+    repo = AsyncRepository(db_path)
+    repo.start()
+    try:
+        timers = ReminderTimers(repo, TZ, on_fire, reminder_days=DEFAULT_REMINDER_DAYS)
+        now = time.time()
+
+        started = time.perf_counter()
+        seq, rows = await repo.get_schedule_rows()
+        query = time.perf_counter() - started
+
+        started = time.perf_counter()
+        timers.load(rows, now, seq)
+        build = time.perf_counter() - started
+
+        # Second build under tracemalloc just to see what the timers hold
+        tracemalloc.start()
+        timers.load(rows, now, seq)
+        held = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        del rows
+        print(f"startup query:   {query * 1000:8.1f} ms")
+        print(f"heap build:      {build * 1000:8.1f} ms")
+        print(f"timers memory:   {held / 1024 / 1024:8.1f} MiB ({held / projects:.0f} B/project)")
+
+        changes = [ProjectChange(i + 1, db.to_due_day(datetime.now()) + 40) for i in range(10_000)]
+        started = time.perf_counter()
+        for change in changes:
+            timers.on_change([change])
+        print(f"on_change:       {(time.perf_counter() - started) / len(changes) * 1e6:8.2f} us/change")
+
+        # Written straight to the database, so the repository's listeners never hear of them
+        moved = list(range(1, projects + 1, projects // CLI_CHANGES))[:CLI_CHANGES]
+        for project_id in moved:
+            db.bump_next_due_date(db_path, project_id)
+        db.delete_project(db_path, projects)
+        started = time.perf_counter()
+        applied = await timers.resync()
+        resync = time.perf_counter() - started
+        started = time.perf_counter()
+        assert await timers.resync() == 0
+        idle = time.perf_counter() - started
+        expected = {project_id: due_day for project_id, due_day, _, _ in db.get_schedule_rows(db_path)[1]}
+        assert applied == len(moved) + 1, applied
+        assert projects not in timers._due
+        assert all(timers._due[project_id] == expected[project_id] for project_id in moved)
+        print(f"resync:          {resync * 1000:8.1f} ms for {applied} changed projects, "
+              f"{idle * 1000:.2f} ms with none (full reload: {(query + build) * 1000:.1f} ms)")
+
+        # Jump to the day after tomorrow so a day's reminders and dues fire at once
+        later = now + 2 * 86400
+        started = time.perf_counter()
+        await timers.fire(later)
+        wake = time.perf_counter() - started
+        print(f"one wake-up:     {wake * 1000:8.1f} ms for {len(fired)} fired projects")
+
+        started = time.perf_counter()
+        await repo.list_projects()
+        print(f"daily full scan: {(time.perf_counter() - started) * 1000:8.1f} ms (what the cron job read each run)")
+    finally:
+        await repo.close()
+
+
+def main():
+    projects = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "bench.db")
+        db.init_db(db_path)
+        today = datetime.combine(datetime.now().date(), datetime.min.time())
+        db.insert_projects(db_path, [
+            project_row(i, today + timedelta(days=1 + i % 30), notify_hour=8 + i % 10 if i % 7 == 0 else None)
+            for i in range(projects)
+        ])
+        print(f"projects: {projects}")
+        asyncio.run(run(db_path, projects))
+        db.close_pool(db_path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+"""
+Post synthetic /list updates to the webhook endpoint on localhost.
+Run with: python -m benchmarks.bench_webhook [requests] [concurrency]
+
+The real router, repository and webhook handler are used; only the Telegram
+API is faked, answering every call after API_LATENCY. The same updates are
+posted to WebhookHandler, which answers before handling, and to aiogram's
+handler with handling inline, which answers only once the reply was sent.
+Request latency, request throughput and the time until every update was
+handled are reported for both. Requests with a wrong secret must get a 401.
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime
+
+import aiohttp
+from aiogram import Bot, Dispatcher
+from aiogram.client.session.base import BaseSession
+from aiogram.methods import SendMessage
+from aiogram.types import Chat, Message
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler
+from aiohttp import web
+
+from app import db
+from app.bot import Settings, router
+from app.notifier import Notifier
+from app.repo import AsyncRepository
+from app.webhook import build_webhook_app
+
+from .datagen import fill
+
+API_LATENCY = 0.05
+SECRET = "bench-secret"
+CHAT_ID = 1
+HOST, PORT = "127.0.0.1", 8765
+
+
+class FakeSession(BaseSession):
+    """Answers every API call after API_LATENCY without touching the network"""
+
+    def __init__(self):
+        super().__init__()
+        self.calls = 0
+
+    async def make_request(self, bot, method, timeout=None):
+        await asyncio.sleep(API_LATENCY)
+        self.calls += 1
+        if isinstance(method, SendMessage):
+            return Message(
+                message_id=self.calls, date=datetime.now(), chat=Chat(id=method.chat_id, type="private"),
+                text=method.text,
+            )
+        return True
+
+    async def stream_content(self, url, headers=None, timeout=30, chunk_size=65536, raise_for_status=True):
+        yield b""
+
+    async def close(self):
+        pass
+
+
+def update(update_id: int) -> dict:
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": int(time.time()),
+            "chat": {"id": CHAT_ID, "type": "private"},
+            "from": {"id": CHAT_ID, "is_bot": False, "first_name": "Admin"},
+            "text": "/list",
+            "entities": [{"type": "bot_command", "offset": 0, "length": 5}],
+        },
+    }
+
+
+async def post_updates(path: str, requests: int, concurrency: int, first_id: int) -> tuple[list[float], float]:
+    latencies: list[float] = []
+    ids = iter(range(first_id, first_id + requests))
+    headers = {"X-Telegram-Bot-Api-Secret-Token": SECRET}
+
+    async with aiohttp.ClientSession(f"http://{HOST}:{PORT}") as http:
+        async def client():
+            for update_id in ids:
+                started = time.perf_counter()
+                async with http.post(path, json=update(update_id), headers=headers) as response:
+                    await response.read()
+                    assert response.status == 200, response.status
+                latencies.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(client() for _ in range(concurrency)))
+        return latencies, time.perf_counter() - started
+
+
+def post_all(path: str, requests: int, concurrency: int, first_id: int) -> tuple[list[float], float]:
+    """Client side, run in its own process so it does not compete with the server's loop"""
+    return asyncio.run(post_updates(path, requests, concurrency, first_id))
+
+
+def report(name: str, latencies: list[float], elapsed: float, handled: float) -> None:
+    latencies = sorted(latencies)
+    pick = lambda q: latencies[min(len(latencies) - 1, int(q * len(latencies)))] * 1000
+    print(
+        f"{name:11} p50 {pick(0.5):6.1f} ms  p95 {pick(0.95):6.1f} ms  p99 {pick(0.99):6.1f} ms  "
+        f"{len(latencies) / elapsed:7.0f} req/s  all handled after {handled:5.2f}s"
+    )
+
+
+async def run(db_path: str, requests: int, concurrency: int) -> None:
+    repo = AsyncRepository(db_path)
+    repo.start()
+    session = FakeSession()
+    bot = Bot("123456:" + "A" * 35, session=session)
+    notifier = Notifier(bot)
+    dp = Dispatcher()
+    dp["settings"] = Settings(token="", admin_chat_id=CHAT_ID, db_path=db_path, timezone="Asia/Tashkent")
+    dp["repo"] = repo
+    dp["notifier"] = notifier
+    dp.include_router(router)
+
+    app, background = build_webhook_app(dp, bot, "/webhook", SECRET)
+    inline = SimpleRequestHandler(dp, bot, handle_in_background=False, secret_token=SECRET)
+    inline.register(app, path="/inline")
+    runner = web.AppRunner(app)
+    pool = ProcessPoolExecutor(1)
+    await runner.setup()
+    await web.TCPSite(runner, HOST, PORT).start()
+    try:
+        async with aiohttp.ClientSession(f"http://{HOST}:{PORT}") as http:
+            wrong = {"X-Telegram-Bot-Api-Secret-Token": "wrong"}
+            async with http.post("/webhook", json=update(0), headers=wrong) as response:
+                assert response.status == 401, "a wrong secret token was accepted"
+
+        loop = asyncio.get_running_loop()
+        print(f"requests: {requests}, concurrency: {concurrency}, fake API latency: {API_LATENCY * 1000:.0f} ms")
+        for name, path, first_id in (("inline", "/inline", 1), ("background", "/webhook", requests + 1)):
+            calls = session.calls
+            started = time.perf_counter()
+            latencies, elapsed = await loop.run_in_executor(pool, post_all, path, requests, concurrency, first_id)
+            while background.pending:
+                await asyncio.sleep(0.001)
+            handled = time.perf_counter() - started
+            assert session.calls - calls == requests, "not every update was answered"
+            report(name, latencies, elapsed, handled)
+    finally:
+        pool.shutdown()
+        await runner.cleanup()
+        await repo.close()
+
+
+def main():
+    requests = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "bench.db")
+        db.init_db(db_path)
+        fill(db_path, 1000, date.today())
+        asyncio.run(run(db_path, requests, concurrency))
+        db.close_pool(db_path)
+
+
+if __name__ == "__main__":
+    main()
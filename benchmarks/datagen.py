@@ -0,0 +1,167 @@
+"""
+Synthetic projects with the due-date shape of a real monthly billing book.
+Use from a benchmark: fill(db_path, 100_000, today)
+
+Most projects are paid monthly, so their due days spread over the current
+30-day cycle, with a bump on the 1st and the 15th where billing is usually
+set. A few are overdue by up to three cycles and a few are paid months ahead.
+Servers are skewed (a handful host most projects) and one project in ten has
+its own notification hour or reminder days. The same seed gives the same rows.
+
+Benchmarks that need projects of a given shape (all due, or due on set days)
+build them with project_row and insert them with db.insert_projects.
+
+fill_payments adds years of monthly payments to the filled projects. Most
+owners pay on time or a few days early, some are sometimes a week late and a
+few are chronically late by up to six weeks.
+"""
+
+import random
+from datetime import date, datetime, timedelta
+from typing import Iterator
+
+from app import db
+
+SERVERS = 40
+OWNERS = 2000
+OVERDUE_SHARE = 0.06
+PAID_AHEAD_SHARE = 0.10
+# Of the monthly projects, the share billed on the 1st or the 15th
+BILLING_DAY_SHARE = 0.3
+CUSTOM_SHARE = 0.1
+INSERT_CHUNK = 5000
+# Share of owners who are (punctual, sometimes late, chronically late), and the most days late
+LATENESS = ((0.7, 0), (0.2, 7), (0.1, 42))
+EARLIEST_PAYMENT = 5
+# Monthly fees in so'm
+FEES = (150_000, 250_000, 400_000, 600_000, 1_000_000)
+NAMES = ("shop", "crm", "erp", "blog", "api", "school", "clinic", "hotel", "bank", "delivery")
+
+
+def due_offset(rnd: random.Random, today: date) -> int:
+    """Days from today to a project's next due date"""
+    r = rnd.random()
+    if r < OVERDUE_SHARE:
+        return -rnd.randint(1, 3 * db.BILLING_CYCLE_DAYS)
+    if r < OVERDUE_SHARE + PAID_AHEAD_SHARE:
+        return rnd.randint(db.BILLING_CYCLE_DAYS, 365)
+    offset = rnd.randrange(db.BILLING_CYCLE_DAYS)
+    if rnd.random() < BILLING_DAY_SHARE:
+        # Move to the next 1st or 15th within the cycle
+        day = today + timedelta(days=offset)
+        while day.day not in (1, 15) and (day - today).days < db.BILLING_CYCLE_DAYS - 1:
+            day += timedelta(days=1)
+        offset = (day - today).days
+    return offset
+
+
+def generate_projects(count: int, today: date, seed: int = 0) -> Iterator[tuple]:
+    """``count`` rows of db.PROJECT_COLUMNS"""
+    rnd = random.Random(seed)
+    for i in range(count):
+        due = today + timedelta(days=due_offset(rnd, today))
+        start = due - timedelta(days=db.BILLING_CYCLE_DAYS * rnd.randint(1, 36))
+        # Squaring skews the choice towards the first servers
+        server = int(SERVERS * rnd.random() ** 2)
+        owner = rnd.randrange(OWNERS)
+        custom = rnd.random() < CUSTOM_SHARE
+        yield (
+            f"{rnd.choice(NAMES)}-{i}",
+            f"srv-{server:02d}",
+            f"Owner {owner}",
+            f"+99890{owner:07d}",
+            rnd.choice(("root", "admin", "deploy")),
+            f"pw-{rnd.getrandbits(32):08x}",
+            f"10.{server}.{i >> 8 & 255}.{i & 255}",
+            f"rpw-{rnd.getrandbits(32):08x}",
+            datetime.combine(start, datetime.min.time()).isoformat(),
+            datetime.combine(due, datetime.min.time()).isoformat(),
+            db.to_due_day(due),
+            rnd.randint(7, 20) if custom and rnd.random() < 0.5 else None,
+            rnd.choice(("7,3,1", "14,7", "3")) if custom else None,
+            rnd.choice(FEES),
+        )
+
+
+def project_row(i: int, due: datetime, **fields) -> tuple:
+    """Project ``i`` as a row of db.PROJECT_COLUMNS, due on ``due``; ``fields`` override the placeholders"""
+    row = {
+        "project_name": f"project-{i}",
+        "server_name": f"server-{i % 50}",
+        "owner_name": "Owner",
+        "owner_phone": "+998901234567",
+        "server_login_username": "root",
+        "server_login_password": "secret",
+        "server_ip": "10.0.0.1",
+        "root_password": "secret",
+        "start_date": (due - timedelta(days=db.BILLING_CYCLE_DAYS)).isoformat(),
+        "next_due_date": due.isoformat(),
+        "due_day": db.to_due_day(due),
+        "notify_hour": None,
+        "reminder_days": None,
+        "monthly_fee": None,
+    }
+    unknown = fields.keys() - row.keys()
+    if unknown:
+        raise ValueError(f"Not project columns: {sorted(unknown)}")
+    row.update(fields)
+    return tuple(row[column] for column in db.PROJECT_COLUMNS)
+
+
+def fill(db_path: str, count: int, today: date, seed: int = 0) -> None:
+    """Insert ``count`` generated projects into an initialised database"""
+    chunk = []
+    for row in generate_projects(count, today, seed):
+        chunk.append(row)
+        if len(chunk) == INSERT_CHUNK:
+            db.insert_projects(db_path, chunk)
+            chunk = []
+    if chunk:
+        db.insert_projects(db_path, chunk)
+
+
+def generate_payments(projects: list[tuple], years: int, today: int, seed: int = 0) -> Iterator[tuple]:
+    """Payment rows for ``(id, owner_name, due_day, monthly_fee)`` projects.
+
+    Each project paid every cycle of the ``years`` before its current due day;
+    payments after ``today`` are left out. Rows are (project_id, owner_name,
+    period_start, period_end, paid_day, amount, source).
+    """
+    rnd = random.Random(seed)
+    shares, most_late = zip(*LATENESS)
+    habits: dict[str, int] = {}
+    for project_id, owner, due_day, fee in projects:
+        late = habits.setdefault(owner, rnd.choices(most_late, shares)[0])
+        end = due_day
+        for _ in range(years * 365 // db.BILLING_CYCLE_DAYS):
+            start = end - db.BILLING_CYCLE_DAYS
+            paid = start + rnd.randint(-EARLIEST_PAYMENT, late)
+            if paid <= today:
+                yield project_id, owner, start, end, paid, fee or 0, "paid"
+            end = start
+
+
+def fill_payments(db_path: str, years: int, today: date, seed: int = 0) -> int:
+    """Add ``years`` of payment history to every project. Returns the number of payments"""
+    with db.get_conn(db_path) as conn:
+        projects = conn.execute("SELECT id, owner_name, due_day, monthly_fee FROM projects").fetchall()
+    count = 0
+    chunk = []
+    for row in generate_payments(projects, years, db.to_due_day(today), seed):
+        chunk.append(row)
+        if len(chunk) == INSERT_CHUNK * 10:
+            count += _insert_payments(db_path, chunk)
+            chunk = []
+    return count + _insert_payments(db_path, chunk)
+
+
+def _insert_payments(db_path: str, rows: list[tuple]) -> int:
+    with db.get_conn(db_path) as conn:
+        conn.executemany(
+            """
+            INSERT INTO payments (project_id, owner_name, period_start, period_end, paid_day, amount, source)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            """,
+            rows,
+        )
+    return len(rows)
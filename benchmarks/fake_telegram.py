@@ -0,0 +1,122 @@
+"""
+Local aiohttp stand-in for the Telegram Bot API.
+
+    api = FakeTelegramAPI(latency=0.05, flood_every=20)
+    await api.start()
+    bot = api.bot()
+    ...
+    await bot.session.close()
+    await api.close()
+
+Bots built with api.bot() talk real HTTP to it through aiogram's
+AiohttpSession, so request building, response parsing and error handling are
+the ones used in production. Every call is recorded. Each answer is delayed
+by ``latency`` plus up to ``jitter`` seconds, and every ``flood_every``-th
+call is refused with a 429 asking to retry after ``retry_after`` seconds.
+"""
+
+import asyncio
+import random
+import time
+from dataclasses import dataclass
+
+from aiogram import Bot
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
+from aiohttp import web
+
+TOKEN = "123456:" + "A" * 35
+BOT_USER = {"id": 123456, "is_bot": True, "first_name": "Bench", "username": "bench_bot"}
+
+
+@dataclass
+class Call:
+    method: str
+    chat_id: int | None
+    at: float
+    flooded: bool
+
+
+class FakeTelegramAPI:
+    def __init__(
+        self,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        flood_every: int = 0,
+        retry_after: int = 1,
+        seed: int = 0,
+    ):
+        self.latency = latency
+        self.jitter = jitter
+        self.flood_every = flood_every
+        self.retry_after = retry_after
+        self.calls: list[Call] = []
+        self.url = ""
+        self._rnd = random.Random(seed)
+        self._runner: web.AppRunner | None = None
+        self._message_id = 0
+
+    @property
+    def floods(self) -> int:
+        return sum(call.flooded for call in self.calls)
+
+    def sent(self, method: str = "sendMessage") -> list[Call]:
+        return [call for call in self.calls if call.method == method and not call.flooded]
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        app = web.Application()
+        app.router.add_post("/bot{token}/{method}", self._handle)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        # Port 0 lets the OS pick a free one
+        bound = self._runner.addresses[0]
+        self.url = f"http://{bound[0]}:{bound[1]}"
+        return self.url
+
+    async def close(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    def bot(self) -> Bot:
+        return Bot(TOKEN, session=AiohttpSession(api=TelegramAPIServer.from_base(self.url)))
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        method = request.match_info["method"]
+        params = dict(await request.post())
+        chat_id = int(params["chat_id"]) if "chat_id" in params else None
+        flooded = bool(self.flood_every) and (len(self.calls) + 1) % self.flood_every == 0
+        self.calls.append(Call(method, chat_id, time.monotonic(), flooded))
+        delay = self.latency + self._rnd.uniform(0, self.jitter)
+        if delay:
+            await asyncio.sleep(delay)
+        if flooded:
+            return web.json_response(
+                {
+                    "ok": False,
+                    "error_code": 429,
+                    "description": f"Too Many Requests: retry after {self.retry_after}",
+                    "parameters": {"retry_after": self.retry_after},
+                },
+                status=429,
+            )
+        return web.json_response({"ok": True, "result": self._result(method, params, chat_id)})
+
+    def _result(self, method: str, params: dict, chat_id: int | None):
+        if method == "getMe":
+            return BOT_USER
+        if method in ("sendMessage", "editMessageText", "sendDocument"):
+            self._message_id += 1
+            message = {
+                "message_id": self._message_id,
+                "date": int(time.time()),
+                "chat": {"id": chat_id, "type": "private"},
+                "from": BOT_USER,
+            }
+            if "text" in params:
+                message["text"] = params["text"]
+            return message
+        # answerCallbackQuery, setWebhook, deleteWebhook, ...
+        return True
@@ -0,0 +1,277 @@
+"""
+Leader election across bot replicas sharing one database.
+Run with: python -m benchmarks.sim_failover [projects] [ttl]
+
+Three replicas run as separate processes, each wired like app.bot.main: a
+LeaderElection on the shared database whose LeaderDuties start the outbox,
+catch-up and reminder timers of the leader. Their notifiers keep the
+production rates (one message a second per chat) and the outbox batch is
+sized by lease_batch_size, so a send can outlast a lease. Their fake bot
+logs every delivery, with the sending process, into a second database. The
+parent queues outbox messages to CHATS chats at a steady rate throughout,
+after leaving overdue projects and reminders for the first leader to catch
+up on; those notices all go to the admin chat. Then:
+
+- kill:  the leader gets SIGKILL. A follower must take over within
+  ttl + heartbeat.
+- pause: the leader gets SIGSTOP for three TTLs, then SIGCONT, like a VM
+  stall. A follower must take over within ttl + heartbeat, and the paused
+  one must step down on waking, sending no more than the sends its
+  notifier workers were in the middle of.
+- stop:  the leader gets SIGTERM and shuts down cleanly, releasing its lease.
+  A follower must take over within one heartbeat.
+
+Each bound gets SLACK seconds for process scheduling. At the end leadership
+terms must not overlap, every message must be delivered, nothing may be
+sent twice except one send in flight per notifier worker when a leader was
+killed or paused, and every overdue project must have moved exactly one
+billing cycle.
+"""
+
+import asyncio
+import logging
+import multiprocessing
+import os
+import signal
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from datetime import timedelta
+
+from app import db
+from app.config import DEFAULT_WORKERS
+from app.leader import LeaderElection
+from app.notifier import Notifier
+from app.outbox import OutboxWorker, lease_batch_size
+from app.repo import AsyncRepository
+from app.scheduler import LAST_CHECK_KEY, LeaderDuties, wall_clock
+
+REPLICAS = 3
+TZ = "Asia/Tashkent"
+CHAT_ID = 1
+# Chats the parent's messages go to, each below the per-chat rate
+CHATS = 20
+REMINDER_DAYS = (2,)
+WORKERS = DEFAULT_WORKERS
+# Outbox messages queued by the parent per second
+QUEUE_RATE = 10
+SLACK = 0.5
+
+
+class Log:
+    """Deliveries and leadership events of every replica, in a database of their own"""
+
+    def __init__(self, path: str):
+        self.conn = sqlite3.connect(path, timeout=30, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+
+    def create(self) -> None:
+        self.conn.execute("CREATE TABLE sends (text TEXT NOT NULL, pid INTEGER NOT NULL, at REAL NOT NULL)")
+        self.conn.execute("CREATE TABLE events (pid INTEGER NOT NULL, kind TEXT NOT NULL, at REAL NOT NULL)")
+
+    def send(self, text: str) -> None:
+        self.conn.execute("INSERT INTO sends VALUES (?, ?, ?)", (text, os.getpid(), time.time()))
+
+    def event(self, kind: str) -> None:
+        self.conn.execute("INSERT INTO events VALUES (?, ?, ?)", (os.getpid(), kind, time.time()))
+
+    def events(self, kind: str, since: float = 0.0) -> list[tuple[int, float]]:
+        return self.conn.execute(
+            "SELECT pid, at FROM events WHERE kind = ? AND at >= ? ORDER BY at", (kind, since)
+        ).fetchall()
+
+
+class FakeBot:
+    def __init__(self, log: Log):
+        self.log = log
+
+    async def send_message(self, chat_id: int, text: str, **kwargs):
+        await asyncio.sleep(0.002)
+        self.log.send(text)
+
+
+async def run_replica(db_path: str, log_path: str, ttl: float) -> None:
+    log = Log(log_path)
+    repo = AsyncRepository(db_path)
+    repo.start()
+    notifier = Notifier(FakeBot(log), workers=WORKERS)
+    notifier.start()
+    outbox = OutboxWorker(repo, notifier, poll_interval=0.05)
+    duties = LeaderDuties(repo, outbox, TZ, CHAT_ID, notify_hour=0, reminder_days=REMINDER_DAYS)
+
+    async def elected():
+        log.event("elected")
+        await duties.start()
+
+    async def deposed():
+        await duties.stop()
+        log.event("deposed")
+
+    election = LeaderElection(repo, elected, deposed, ttl=ttl)
+    outbox.may_send = lambda: election.is_leader
+    outbox.batch_size = lease_batch_size(notifier.per_chat_rate, election.heartbeat)
+    stop = asyncio.Event()
+    asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, stop.set)
+    election.start()
+    log.event("ready")
+    await stop.wait()
+    await election.close()
+    await notifier.close()
+    await repo.close()
+
+
+def replica(db_path: str, log_path: str, ttl: float) -> None:
+    logging.disable(logging.WARNING)
+    asyncio.run(run_replica(db_path, log_path, ttl))
+
+
+def setup(db_path: str, projects: int) -> dict[str, int]:
+    """Overdue projects and reminders the first leader has to catch up on. Returns {name: due_day}"""
+    now = wall_clock(TZ)
+    due = {}
+    for i in range(projects):
+        next_due = now - timedelta(days=1) if i % 2 else now + timedelta(days=REMINDER_DAYS[0])
+        db.add_project(
+            db_path, f"project-{i}", "s", "o", "1", "u", "p", "1", "r", now - timedelta(days=60), next_due
+        )
+        due[f"project-{i}"] = db.to_due_day(next_due)
+    # The last check two days ago: the first leader catches up on yesterday and today
+    db.set_meta(db_path, LAST_CHECK_KEY, (now - timedelta(days=2)).isoformat())
+    return due
+
+
+class Producer(threading.Thread):
+    def __init__(self, db_path: str):
+        super().__init__(daemon=True)
+        self.db_path = db_path
+        self.queued = 0
+        self.stopped = threading.Event()
+
+    def run(self) -> None:
+        while not self.stopped.wait(1 / QUEUE_RATE):
+            chat_id = CHAT_ID + 1 + self.queued % CHATS
+            db.enqueue_outbox(self.db_path, [(chat_id, f"message {self.queued}", None)])
+            self.queued += 1
+
+
+def wait_for(log: Log, kind: str, since: float, timeout: float, pid: int | None = None) -> tuple[int, float]:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        for event_pid, at in log.events(kind, since):
+            if pid is None or event_pid == pid:
+                return event_pid, at
+        time.sleep(0.01)
+    raise AssertionError(f"no {kind} event within {timeout:.0f} s")
+
+
+def check_terms(log: Log, ends: dict[int, float]) -> None:
+    """Leadership terms may not overlap; a term ends when its leader stepped down or was stopped"""
+    events = log.conn.execute("SELECT pid, kind, at FROM events WHERE kind != 'ready' ORDER BY at").fetchall()
+    terms = []
+    for pid, kind, at in events:
+        if kind == "elected":
+            terms.append([pid, at, None])
+        else:
+            term = next(term for term in reversed(terms) if term[0] == pid)
+            term[2] = at
+    for term in terms:
+        pid = term[0]
+        if pid in ends:
+            term[2] = min(term[2] or ends[pid], ends[pid])
+    for (pid, start, end), (next_pid, next_start, _) in zip(terms, terms[1:]):
+        assert end is not None and end <= next_start, f"{pid} led until {end}, {next_pid} from {next_start}"
+    print(f"terms: {len(terms)}, none overlapping")
+
+
+def main():
+    projects = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    ttl = float(sys.argv[2]) if len(sys.argv) > 2 else 1.5
+    heartbeat = ttl / 3
+    context = multiprocessing.get_context("spawn")
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "sim.db")
+        log_path = os.path.join(tmp, "log.db")
+        db.init_db(db_path)
+        due = setup(db_path, projects)
+        log = Log(log_path)
+        log.create()
+        producer = Producer(db_path)
+        producer.start()
+        started = time.time()
+        processes = {}
+        for _ in range(REPLICAS):
+            process = context.Process(target=replica, args=(db_path, log_path, ttl))
+            process.start()
+            processes[process.pid] = process
+        leader, at = wait_for(log, "elected", started, 30)
+        while len(log.events("ready")) < REPLICAS:
+            time.sleep(0.05)
+        print(f"{REPLICAS} replicas, ttl {ttl:.1f} s, heartbeat {heartbeat:.1f} s: {leader} elected "
+              f"{at - started:.2f} s after start")
+        # When each leader stopped acting: killed, paused or shut down
+        ends = {}
+        bounds = {"kill": ttl + heartbeat, "pause": ttl + heartbeat, "stop": heartbeat}
+        for scenario, sig in (("kill", signal.SIGKILL), ("pause", signal.SIGSTOP), ("stop", signal.SIGTERM)):
+            time.sleep(2 * ttl)
+            signalled = time.time()
+            os.kill(leader, sig)
+            if sig != signal.SIGTERM:
+                ends[leader] = signalled
+            successor, at = wait_for(log, "elected", signalled, 10 * ttl)
+            takeover = at - signalled
+            print(f"  {scenario:5} {leader}: {successor} took over in {takeover:.2f} s "
+                  f"(bound {bounds[scenario]:.2f} s + {SLACK} s slack)")
+            assert successor != leader
+            assert takeover <= bounds[scenario] + SLACK, f"{scenario}: takeover took {takeover:.2f} s"
+            if sig == signal.SIGSTOP:
+                time.sleep(max(0.0, signalled + 3 * ttl - time.time()))
+                os.kill(leader, signal.SIGCONT)
+                wait_for(log, "deposed", signalled, 10 * ttl, pid=leader)
+                late = log.conn.execute(
+                    "SELECT COUNT(*) FROM sends WHERE pid = ? AND at > ?", (leader, at)
+                ).fetchone()[0]
+                print(f"        {leader} woke up and stepped down; sends after the takeover: {late}")
+                assert late <= WORKERS, "the paused leader kept sending"
+            elif sig == signal.SIGKILL:
+                processes.pop(leader).join()
+            leader = successor
+
+        producer.stopped.set()
+        producer.join()
+        deadline = time.time() + 60
+        while db.fetch_outbox(db_path, 1) and time.time() < deadline:
+            time.sleep(0.05)
+        for pid, process in processes.items():
+            if process.is_alive():
+                os.kill(pid, signal.SIGTERM)
+            process.join()
+
+        check_terms(log, ends)
+        sends = Counter(text for (text,) in log.conn.execute("SELECT text FROM sends"))
+        duplicates = sum(n - 1 for n in sends.values())
+        queued = {f"message {i}" for i in range(producer.queued)}
+        missing = queued - set(sends)
+        project_messages = len(set(sends) - queued)
+        # A killed or paused leader may have sent one message per worker that it never marked
+        allowed = WORKERS * len(ends)
+        print(f"messages: {producer.queued} queued + {project_messages} from catch-up, "
+              f"missing: {len(missing)}, sent twice: {duplicates} (allowed: {allowed})")
+        assert not missing, f"never delivered: {sorted(missing)[:5]}"
+        assert project_messages == projects, "a due notice or reminder was not sent exactly once"
+        assert duplicates <= allowed, "more than the sends in flight were repeated"
+
+        stored = db.get_projects_by_ids(db_path, list(range(1, projects + 1)))
+        rows = {row["project_name"]: row["due_day"] for row in stored}
+        today = db.to_due_day(wall_clock(TZ))
+        for name, due_day in due.items():
+            expected = due_day + db.BILLING_CYCLE_DAYS if due_day < today else due_day
+            assert rows[name] == expected, f"{name}: due day {rows[name]}, expected {expected}"
+        print(f"projects: {projects // 2} overdue advanced one cycle each, {projects - projects // 2} untouched")
+        db.close_pool(db_path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""
+Simulate a week-long outage with a frozen clock and check the startup catch-up.
+Run with: python -m benchmarks.sim_outage_catch_up [projects]
+
+The bot runs its daily check for ten days, is down for the next seven and
+comes back on the eighth day at noon. The catch-up must find the eight missed
+windows, send one due notice for every project that came due during the
+outage (and move it past today), one reminder for every project whose
+reminder day fell in the outage, and nothing when started again. It must do
+so with one query per check instead of replaying the missed days; the same
+outage replayed day by day is timed for comparison.
+"""
+
+import asyncio
+import os
+import random
+import re
+import sys
+import tempfile
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+
+from app import db
+from app.repo import AsyncRepository
+from app.scheduler import catch_up, record_check, run_due_checks, run_reminder_checks
+
+from .datagen import project_row
+
+
+CHAT_ID = 1
+HOUR = 9
+REMINDER_DAYS = (7, 3, 1)
+UP_DAYS = 10
+DOWN_DAYS = 7
+START = datetime(2026, 3, 1, HOUR, 0)
+MESSAGE = re.compile(r"^(🔴|⚠️).*?(?:(\d+) kun qoldi!)?\nProject: (\S+)\n.*Tugash sanasi: (\S+)$", re.S)
+
+
+class CountingRepository(AsyncRepository):
+    """Counts the DB calls made through it"""
+
+    def __init__(self, db_path: str):
+        super().__init__(db_path)
+        self.calls: Counter = Counter()
+
+    async def run(self, fn, *args, **kwargs):
+        self.calls[fn.__name__] += 1
+        return await super().run(fn, *args, **kwargs)
+
+
+async def deliver(repo: AsyncRepository) -> list[tuple[str, str, str]]:
+    """Take everything queued in the outbox as (kind, project, due date)"""
+    rows = await repo.fetch_outbox(1_000_000)
+    await repo.finish_outbox([row["id"] for row in rows], [])
+    return [MESSAGE.match(row["text"]).group(1, 3, 4) for row in rows]
+
+
+async def due_days(repo: AsyncRepository) -> dict[str, int]:
+    return {
+        item["project_name"]: db.to_due_day(datetime.fromisoformat(item["next_due_date"]))
+        for item in await repo.list_projects()
+    }
+
+
+async def simulate(db_path: str, projects: int) -> None:
+    start = START
+    repo = CountingRepository(db_path)
+    repo.start()
+    try:
+        # Before the first daily window
+        await record_check(repo, start - timedelta(hours=1))
+        for day in range(UP_DAYS):
+            now = start + timedelta(days=day)
+            assert await catch_up(repo, CHAT_ID, now, notify_hour=HOUR, reminder_days=REMINDER_DAYS) == 1
+            await deliver(repo)
+
+        restart = start + timedelta(days=UP_DAYS + DOWN_DAYS, hours=3)
+        last_window = db.to_due_day(restart)
+        outage = range(db.to_due_day(start) + UP_DAYS, last_window + 1)
+        before = await due_days(repo)
+
+        repo.calls.clear()
+        started = time.perf_counter()
+        missed = await catch_up(repo, CHAT_ID, restart, notify_hour=HOUR, reminder_days=REMINDER_DAYS)
+        elapsed = time.perf_counter() - started
+        calls = dict(repo.calls)
+        sent = Counter(await deliver(repo))
+        after = await due_days(repo)
+
+        assert missed == len(outage), f"expected {len(outage)} missed windows, got {missed}"
+        assert calls["get_due_projects"] == 1 and calls["get_reminder_candidates"] == 1, calls
+        assert all(n == 1 for n in sent.values()), "a message was queued twice"
+        for name, due_day in before.items():
+            date = db.from_due_day(due_day).strftime("%d.%m.%Y")
+            if due_day in outage:
+                assert ("🔴", name, date) in sent, f"{name}: due notice for {date} missing"
+                assert after[name] > last_window, f"{name} still due after the catch-up"
+            elif any(due_day - days in outage for days in REMINDER_DAYS):
+                assert ("⚠️", name, date) in sent, f"{name}: reminder for {date} missing"
+        expected = sum(
+            due_day in outage or any(due_day - days in outage for days in REMINDER_DAYS)
+            for due_day in before.values()
+        )
+        assert len(sent) == expected, f"expected {expected} messages, got {len(sent)}"
+
+        # Started again: nothing new until the next window
+        assert await catch_up(repo, CHAT_ID, restart + timedelta(minutes=5), notify_hour=HOUR) == 0
+        assert await catch_up(repo, CHAT_ID, restart + timedelta(hours=20), notify_hour=HOUR) == 0
+        assert not await deliver(repo)
+
+        print(f"projects: {projects}, outage: {DOWN_DAYS} days, restart at {restart}")
+        print(f"missed windows: {missed}, messages queued: {len(sent)}, db calls: {sum(calls.values())}")
+        print(f"catch-up:          {elapsed * 1000:8.1f} ms")
+    finally:
+        await repo.close()
+
+
+async def replay(db_path: str, projects: int) -> None:
+    """The same outage processed by re-running every missed day"""
+    start = START
+    repo = CountingRepository(db_path)
+    repo.start()
+    try:
+        await record_check(repo, start - timedelta(hours=1))
+        for day in range(UP_DAYS):
+            now = start + timedelta(days=day)
+            await catch_up(repo, CHAT_ID, now, notify_hour=HOUR, reminder_days=REMINDER_DAYS)
+            await deliver(repo)
+        repo.calls.clear()
+        started = time.perf_counter()
+        for day in range(UP_DAYS, UP_DAYS + DOWN_DAYS + 1):
+            now = start + timedelta(days=day)
+            await run_due_checks(repo, CHAT_ID, now=now)
+            await run_reminder_checks(repo, CHAT_ID, REMINDER_DAYS, now=now)
+        elapsed = time.perf_counter() - started
+        queued = len(await deliver(repo))
+        print(f"day-by-day replay: {elapsed * 1000:8.1f} ms, messages queued: {queued}, "
+              f"db calls: {sum(repo.calls.values())}")
+    finally:
+        await repo.close()
+
+
+def main():
+    projects = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    rnd = random.Random(13)
+    generated = [project_row(i, START + timedelta(days=rnd.randrange(1, 45))) for i in range(projects)]
+    for job in (simulate, replay):
+        with tempfile.TemporaryDirectory() as tmp:
+            db_path = os.path.join(tmp, "sim.db")
+            db.init_db(db_path)
+            db.insert_projects(db_path, generated)
+            asyncio.run(job(db_path, projects))
+            db.close_pool(db_path)
+
+
+if __name__ == "__main__":
+    main()
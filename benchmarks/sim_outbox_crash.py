@@ -0,0 +1,220 @@
+"""
+Kill the scheduler and the outbox at random points and check delivery.
+Run with: python -m benchmarks.sim_outbox_crash [projects] [days]
+
+Every simulated day is served by a series of short "process lifetimes": each
+one starts a Notifier with a fake Bot and an OutboxWorker, runs the due and
+reminder checks, and is killed after a random delay - possibly before the
+checks finished, while a batch is in flight, or before anything was sent. A
+trigger makes one in fifty due date updates fail, rolling back the whole
+transaction. Lifetimes repeat until the day's work is done, then the next
+day starts.
+
+Two kill modes are run:
+- graceful: OutboxWorker.close(), as on shutdown. Every due notice and
+  reminder must be delivered exactly once.
+- crash: the process dies on the spot. From that moment its repository
+  calls never reach the database and its bot sends nothing, whatever was in
+  flight. Nothing may be lost, and a crash may repeat only the messages
+  sent but not yet marked: at most one per notifier worker.
+"""
+
+import asyncio
+import logging
+import os
+import random
+import re
+import sys
+import tempfile
+from collections import Counter
+from datetime import datetime, timedelta
+
+from aiogram.exceptions import TelegramNetworkError
+from aiogram.methods import SendMessage
+
+from app import db
+from app.notifier import Notifier
+from app.outbox import OutboxWorker
+from app.repo import AsyncRepository
+from app.scheduler import run_due_checks, run_reminder_checks
+
+
+CHAT_ID = 1
+REMINDER_DAYS = (2,)
+BATCH_SIZE = 100
+WORKERS = 4
+MESSAGE = re.compile(r"^(🔴|⚠️).*\nProject: (\S+)\n.*Tugash sanasi: (\S+)$", re.S)
+
+
+class Process:
+    """The repository as one process lifetime sees it; once dead, its calls never reach the database"""
+
+    def __init__(self, repo: AsyncRepository):
+        self.repo = repo
+        self.alive = True
+
+    def __getattr__(self, name: str):
+        method = getattr(self.repo, name)
+
+        async def call(*args, **kwargs):
+            if not self.alive:
+                raise asyncio.CancelledError
+            return await method(*args, **kwargs)
+
+        return call
+
+
+class FakeBot:
+    """Delivers after a short delay; one call in ten fails with a network error"""
+
+    def __init__(self, rnd: random.Random, delivered: Counter, process: Process):
+        self.rnd = rnd
+        self.delivered = delivered
+        self.process = process
+
+    async def send_message(self, chat_id: int, text: str, **kwargs):
+        failed = self.rnd.random() < 0.1
+        await asyncio.sleep(self.rnd.uniform(0, 0.002))
+        if not self.process.alive:
+            # Died before the request went out
+            raise asyncio.CancelledError
+        if failed:
+            raise TelegramNetworkError(method=SendMessage(chat_id=chat_id, text=text), message="timeout")
+        kind, project, due = MESSAGE.match(text).groups()
+        self.delivered[(kind, project, due)] += 1
+
+
+def undelivered(db_path: str) -> set[tuple[str, str, str]]:
+    """Messages whose outbox row is not marked delivered"""
+    with db.get_conn(db_path) as conn:
+        texts = conn.execute("SELECT text FROM outbox WHERE delivered_at IS NULL").fetchall()
+    return {MESSAGE.match(text).groups() for (text,) in texts}
+
+
+def add_fault(db_path: str) -> None:
+    with db.get_conn(db_path) as conn:
+        conn.execute(
+            """
+            CREATE TRIGGER sim_fault BEFORE UPDATE OF due_day ON projects
+            WHEN abs(random()) % 50 = 0
+            BEGIN SELECT RAISE(ABORT, 'injected fault'); END
+            """
+        )
+
+
+async def checks(repo: Process, outbox: OutboxWorker, now: datetime) -> None:
+    await run_due_checks(repo, CHAT_ID, now=now)
+    await run_reminder_checks(repo, CHAT_ID, REMINDER_DAYS, now=now)
+    outbox.wake()
+
+
+async def lifetime(repo: AsyncRepository, rnd: random.Random, delivered: Counter, now: datetime, crash: bool):
+    """Run one process until it is killed. Returns True if the checks raised the injected fault"""
+    process = Process(repo)
+    bot = FakeBot(rnd, delivered, process)
+    notifier = Notifier(bot, workers=WORKERS, global_rate=1e6, per_chat_rate=1e6, base_backoff=0.001)
+    notifier.start()
+    outbox = OutboxWorker(process, notifier, batch_size=BATCH_SIZE)
+    outbox.start()
+    job = asyncio.create_task(checks(process, outbox, now))
+    await asyncio.sleep(rnd.uniform(0, 0.03))
+    job.cancel()
+    if crash:
+        process.alive = False
+        task = outbox._task
+        # Twice: the first cancel only makes the worker wait for its batch
+        task.cancel()
+        await asyncio.sleep(0)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        outbox._task = None
+    else:
+        await outbox.close()
+    await notifier.close(timeout=0)
+    (result,) = await asyncio.gather(job, return_exceptions=True)
+    return isinstance(result, Exception) and not isinstance(result, asyncio.CancelledError)
+
+
+async def simulate(db_path: str, projects: int, days: int, crash: bool) -> None:
+    rnd = random.Random(12)
+    start = datetime(2026, 1, 1, 9, 0)
+    first_day = db.to_due_day(start)
+    repo = AsyncRepository(db_path)
+    repo.start()
+    delivered: Counter = Counter()
+    try:
+        initial = {}
+        for i in range(projects):
+            due = start + timedelta(days=rnd.randrange(2, 32))
+            await repo.add_project(
+                project_name=f"project-{i}", server_name="s", owner_name="o", owner_phone="1",
+                server_login_username="u", server_login_password="p", server_ip="1", root_password="r",
+                start_date=start, next_due_date=due,
+            )
+            initial[f"project-{i}"] = db.to_due_day(due)
+        add_fault(db_path)
+
+        lifetimes = faults = most_unmarked = 0
+        for day in range(days):
+            now = start + timedelta(days=day)
+            while True:
+                lifetimes += 1
+                # Sent by an earlier lifetime and still not marked
+                unmarked = await repo.run(undelivered) & set(delivered)
+                faults += await lifetime(repo, rnd, delivered, now, crash)
+                # Marks the process wrote before it died are ahead of this read on the DB thread
+                left = (await repo.run(undelivered) & set(delivered)) - unmarked
+                most_unmarked = max(most_unmarked, len(left))
+                done = (
+                    not await repo.get_due_projects(now)
+                    and not await repo.fetch_outbox(1)
+                    and await run_reminder_checks(repo, CHAT_ID, REMINDER_DAYS, now=now) == 0
+                )
+                if done:
+                    break
+    finally:
+        await repo.close()
+
+    last_day = first_day + days - 1
+    expected = set()
+    for name, due_day in initial.items():
+        while due_day - REMINDER_DAYS[0] <= last_day:
+            date = db.from_due_day(due_day).strftime("%d.%m.%Y")
+            expected.add(("⚠️", name, date))
+            if due_day <= last_day:
+                expected.add(("🔴", name, date))
+            due_day += db.BILLING_CYCLE_DAYS
+
+    missing = expected - set(delivered)
+    unexpected = set(delivered) - expected
+    duplicates = sum(n - 1 for n in delivered.values())
+    mode = "crash" if crash else "graceful"
+    print(
+        f"{mode:8} lifetimes: {lifetimes}, injected faults: {faults}, "
+        f"messages: {len(expected)}, missing: {len(missing)}, duplicates: {duplicates}, "
+        f"most sends one lifetime left unmarked: {most_unmarked}"
+    )
+    assert not missing, f"never delivered: {sorted(missing)[:5]}"
+    assert not unexpected, f"delivered but not planned: {sorted(unexpected)[:5]}"
+    if crash:
+        assert most_unmarked <= WORKERS, "a crash left more sends unmarked than there are notifier workers"
+        assert duplicates <= WORKERS * lifetimes, "a crash repeated more than the sends it had not marked"
+    else:
+        assert duplicates == 0, "a graceful restart repeated messages"
+
+
+def main():
+    projects = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    days = int(sys.argv[2]) if len(sys.argv) > 2 else 90
+    # Injected failures are expected; keep their retry warnings out of the report
+    logging.disable(logging.ERROR)
+    for crash in (False, True):
+        with tempfile.TemporaryDirectory() as tmp:
+            db_path = os.path.join(tmp, "sim.db")
+            db.init_db(db_path)
+            asyncio.run(simulate(db_path, projects, days, crash))
+            db.close_pool(db_path)
+
+
+if __name__ == "__main__":
+    main()
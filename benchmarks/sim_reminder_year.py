@@ -0,0 +1,117 @@
+"""
+Simulate a year of daily reminder runs with a frozen clock.
+Run with: python -m benchmarks.sim_reminder_year [projects]
+
+Every simulated day runs the due and reminder checks twice (the second run
+stands in for a restart) and re-sets a few due dates the way /editdue does.
+The run fails if an offset fires twice for the same due day or if a project
+that was not edited misses one of its offsets.
+"""
+
+import asyncio
+import os
+import random
+import re
+import sys
+import tempfile
+from collections import Counter
+from datetime import datetime, timedelta
+
+from app import db
+from app.repo import AsyncRepository
+from app.scheduler import run_due_checks, run_reminder_checks
+
+
+DEFAULT_DAYS = (14, 7, 3, 1)
+CHAT_ID = 1
+REMINDER = re.compile(r"to'lov (\d+) kun qoldi!\nProject: (\S+)\n")
+
+
+async def run(db_path: str, projects: int) -> None:
+    rnd = random.Random(7)
+    start = datetime(2026, 1, 1, 9, 0)
+    repo = AsyncRepository(db_path)
+    repo.start()
+    sent_today: list[tuple[int, int]] = []
+    name_to_id: dict[str, int] = {}
+
+    async def deliver() -> None:
+        # Stand-in for app.outbox: take everything the checks queued
+        rows = await repo.fetch_outbox(1_000_000)
+        for row in rows:
+            match = REMINDER.search(row["text"])
+            if match:
+                sent_today.append((name_to_id[match.group(2)], int(match.group(1))))
+        await repo.finish_outbox([row["id"] for row in rows], [])
+
+    try:
+        ids = []
+        for i in range(projects):
+            project_id = await repo.add_project(
+                project_name=f"project-{i}", server_name="s", owner_name="o", owner_phone="1",
+                server_login_username="u", server_login_password="p", server_ip="1", root_password="r",
+                start_date=start, next_due_date=start + timedelta(days=rnd.randrange(1, 60)),
+            )
+            name_to_id[f"project-{i}"] = project_id
+            ids.append(project_id)
+        overrides = {}
+        for project_id in rnd.sample(ids, projects // 10):
+            overrides[project_id] = (5, 2)
+            await repo.set_reminder_days(project_id, overrides[project_id])
+
+        fired = Counter()
+        per_due_day = Counter()
+        checked = missed = 0
+        for day in range(365):
+            now = start + timedelta(days=day)
+            today = db.to_due_day(now)
+            due_days = {item["id"]: item["due_day"] for item in await repo.get_projects_by_ids(ids)}
+
+            edited = set()
+            for project_id in rnd.sample(ids, 3):
+                # Half the edits re-set the same date, half move it
+                shift = 0 if rnd.random() < 0.5 else rnd.randrange(-5, 20)
+                new_due = db.from_due_day(max(today + 1, due_days[project_id] + shift))
+                await repo.set_next_due_date(project_id, datetime.combine(new_due, datetime.min.time()))
+                edited.add(project_id)
+            due_days = {item["id"]: item["due_day"] for item in await repo.get_projects_by_ids(ids)}
+
+            sent_today.clear()
+            for _ in range(2):
+                await run_due_checks(repo, CHAT_ID, now=now)
+                await run_reminder_checks(repo, CHAT_ID, DEFAULT_DAYS, now=now)
+                await deliver()
+
+            sent = set(sent_today)
+            for project_id, days_left in sent_today:
+                fired[(project_id, today + days_left, days_left)] += 1
+                per_due_day[(project_id, today + days_left)] += 1
+            for project_id in ids:
+                days_left = due_days[project_id] - today
+                if project_id not in edited and days_left in overrides.get(project_id, DEFAULT_DAYS):
+                    checked += 1
+                    if (project_id, days_left) not in sent:
+                        missed += 1
+
+        duplicates = [key for key, n in fired.items() if n > 1]
+        assert not duplicates, f"reminders sent twice for the same due day: {duplicates[:5]}"
+        too_many = [key for key, n in per_due_day.items() if n > len(overrides.get(key[0], DEFAULT_DAYS))]
+        assert not too_many, f"more reminders than offsets for one due day: {too_many[:5]}"
+        assert missed == 0, f"{missed} scheduled reminders were not sent"
+        print(f"projects: {projects}, days: 365, reminders sent: {sum(fired.values())}")
+        print(f"scheduled offsets checked: {checked}, missed: {missed}")
+    finally:
+        await repo.close()
+
+
+def main():
+    projects = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "sim.db")
+        db.init_db(db_path)
+        asyncio.run(run(db_path, projects))
+        db.close_pool(db_path)
+
+
+if __name__ == "__main__":
+    main()
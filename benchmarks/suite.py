@@ -0,0 +1,367 @@
+"""
+Reproducible benchmark suite over generated data and a fake Telegram API.
+Run with:
+    python -m benchmarks.suite run [--projects N] [--seed S] [--out results.json] [scenario ...]
+    python -m benchmarks.suite compare base.json new.json [--threshold 0.15]
+
+``run`` generates N projects (benchmarks.datagen) once, then runs every
+scenario (or the ones named) and writes the results to JSON. Scenarios that
+change the database get a fresh copy for every repeat. Telegram calls go to
+benchmarks.fake_telegram over local HTTP.
+
+``compare`` lines up two result files. A median timing or a rate worse than
+``threshold`` (or than twice the spread seen between repeats, if larger) and
+a count that differs are flagged, and the exit status is 1 if anything was
+flagged, so it can gate a CI job. Results are only comparable for the same
+--projects and --seed, on the same otherwise idle machine.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import dataclass
+from datetime import date, datetime, time as dtime
+from typing import Awaitable, Callable
+
+from aiogram import Dispatcher
+from aiogram.types import Update
+
+from app import db
+from app.bot import Settings, render_list_page, router
+from app.notifier import Notifier
+from app.repo import AsyncRepository
+from app.scheduler import DEFAULT_REMINDER_DAYS, run_due_checks, run_project_checks, run_reminder_checks
+from app.storage import SQLiteStorage
+from benchmarks.datagen import fill
+from benchmarks.fake_telegram import FakeTelegramAPI
+
+CHAT_ID = 1
+DEFAULT_PROJECTS = 20_000
+DEFAULT_REPEATS = 20
+# Scenarios that copy the database for every repeat run fewer of them
+MUTATING_REPEATS = 5
+DEFAULT_THRESHOLD = 0.15
+FSM_USERS = 200
+NOTIFY_MESSAGES = 100
+# Reminder timers firing at once in the timer_fire scenario
+TIMER_FIRE = 50
+
+
+@dataclass
+class Context:
+    template: str
+    tmp: str
+    today: date
+    repeats: int
+
+    @property
+    def now(self) -> datetime:
+        return datetime.combine(self.today, dtime(9))
+
+    def copy(self, name: str) -> str:
+        """A fresh copy of the generated database"""
+        path = os.path.join(self.tmp, name)
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+        src, dst = sqlite3.connect(self.template), sqlite3.connect(path)
+        try:
+            src.backup(dst)
+        finally:
+            src.close()
+            dst.close()
+        return path
+
+
+def metric(value: float, unit: str, better: str, noise: float = 0.0) -> dict:
+    """``better`` is "lower", "higher", "same" (a count that must not change) or "info" (never flagged).
+
+    ``noise`` is the relative spread seen between repeats; compare does not
+    flag changes within twice the noise of either run.
+    """
+    return {"value": round(value, 4), "unit": unit, "better": better, "noise": round(noise, 4)}
+
+
+def timings(samples: list[float]) -> dict:
+    samples = sorted(samples)
+    median = statistics.median(samples)
+    quartiles = statistics.quantiles(samples, n=4) if len(samples) > 1 else [median, median, median]
+    p95 = samples[min(len(samples) - 1, int(0.95 * len(samples)))]
+    return {
+        "median_ms": metric(median * 1000, "ms", "lower", (quartiles[2] - quartiles[0]) / median),
+        # The tail of a few dozen repeats is mostly scheduler noise; reported, not gated
+        "p95_ms": metric(p95 * 1000, "ms", "info"),
+    }
+
+
+async def get_due_projects(ctx: Context) -> dict:
+    repo = AsyncRepository(ctx.template)
+    repo.start()
+    samples = []
+    try:
+        # Warm the page cache so the first repeat is not an outlier
+        await repo.get_due_projects(ctx.now)
+        for _ in range(ctx.repeats):
+            started = time.perf_counter()
+            rows = await repo.get_due_projects(ctx.now)
+            samples.append(time.perf_counter() - started)
+    finally:
+        await repo.close()
+    return {**timings(samples), "rows": metric(len(rows), "rows", "same")}
+
+
+async def _mutating(ctx: Context, job: Callable[[AsyncRepository], Awaitable[int]]) -> dict:
+    samples = []
+    for i in range(min(ctx.repeats, MUTATING_REPEATS)):
+        path = ctx.copy(f"mutating-{i}.db")
+        repo = AsyncRepository(path)
+        repo.start()
+        try:
+            started = time.perf_counter()
+            queued = await job(repo)
+            samples.append(time.perf_counter() - started)
+        finally:
+            await repo.close()
+            db.close_pool(path)
+    return {**timings(samples), "messages": metric(queued, "messages", "same")}
+
+
+async def due_checks(ctx: Context) -> dict:
+    return await _mutating(ctx, lambda repo: run_due_checks(repo, CHAT_ID, now=ctx.now))
+
+
+async def reminder_checks(ctx: Context) -> dict:
+    return await _mutating(ctx, lambda repo: run_reminder_checks(repo, CHAT_ID, DEFAULT_REMINDER_DAYS, now=ctx.now))
+
+
+async def timer_fire(ctx: Context) -> dict:
+    """run_project_checks for TIMER_FIRE projects whose reminder timers fired together"""
+    today = db.to_due_day(ctx.now)
+    due_soon = db.get_projects_due_between(ctx.template, today + 1, today + min(DEFAULT_REMINDER_DAYS))
+    ids = [row["id"] for row in due_soon][:TIMER_FIRE]
+    return await _mutating(
+        ctx, lambda repo: run_project_checks(repo, CHAT_ID, [], ids, today, DEFAULT_REMINDER_DAYS)
+    )
+
+
+async def list_render(ctx: Context) -> dict:
+    repo = AsyncRepository(ctx.template)
+    repo.start()
+    samples = []
+    try:
+        await render_list_page(repo, "all", "", None, False)
+        for _ in range(ctx.repeats):
+            for view, server in (("all", ""), ("overdue", ""), ("week", ""), ("server", "srv-00")):
+                started = time.perf_counter()
+                page = await render_list_page(repo, view, server, None, False)
+                samples.append(time.perf_counter() - started)
+                assert page is not None, f"/list {view} is empty"
+    finally:
+        await repo.close()
+    return timings(samples)
+
+
+def _text_update(update_id: int, user: int, text: str) -> Update:
+    entities = [{"type": "bot_command", "offset": 0, "length": len(text)}] if text.startswith("/") else None
+    return Update.model_validate({
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": int(time.time()),
+            "chat": {"id": user, "type": "private"},
+            "from": {"id": user, "is_bot": False, "first_name": f"User {user}"},
+            "text": text,
+            "entities": entities,
+        },
+    })
+
+
+async def fsm_burst(ctx: Context) -> dict:
+    """FSM_USERS people fill in /addproject at the same time against a 20-30 ms API"""
+    path = ctx.copy("fsm.db")
+    api = FakeTelegramAPI(latency=0.02, jitter=0.01)
+    await api.start()
+    bot = api.bot()
+    repo = AsyncRepository(path)
+    repo.start()
+    # Every saved form notifies the one admin chat; the per-chat limit would make this scenario about that
+    notifier = Notifier(bot, per_chat_rate=1000.0, global_rate=1000.0)
+    notifier.start()
+    storage = SQLiteStorage(repo)
+    storage.start()
+    dp = Dispatcher(storage=storage)
+    dp["settings"] = Settings(token="", admin_chat_id=CHAT_ID, db_path=path, timezone="Asia/Tashkent")
+    dp["repo"] = repo
+    dp["notifier"] = notifier
+    dp.include_router(router)
+    steps = ["/addproject", "bench", "srv-00", "Owner", "+998900000000", "root", "pw", "10.0.0.1", "rpw", "01.01.2030"]
+    samples: list[float] = []
+    ids = iter(range(1, 10 ** 9))
+
+    async def user(user_id: int) -> None:
+        for text in steps:
+            started = time.perf_counter()
+            await dp.feed_update(bot, _text_update(next(ids), user_id, text))
+            samples.append(time.perf_counter() - started)
+
+    try:
+        started = time.perf_counter()
+        await asyncio.gather(*(user(1000 + i) for i in range(FSM_USERS)))
+        elapsed = time.perf_counter() - started
+        await notifier.close()
+        added = len(await repo.find_projects("bench", FSM_USERS + 1))
+    finally:
+        await storage.close()
+        await repo.close()
+        db.close_pool(path)
+        await bot.session.close()
+        await api.close()
+    assert added == FSM_USERS, f"{added} of {FSM_USERS} forms were saved"
+    return {
+        **timings(samples),
+        "steps_per_s": metric(len(samples) / elapsed, "steps/s", "higher"),
+        "api_calls": metric(len(api.calls), "calls", "same"),
+    }
+
+
+async def notify_flood(ctx: Context) -> dict:
+    """NOTIFY_MESSAGES sends to different chats while the API refuses every 25th call"""
+    api = FakeTelegramAPI(latency=0.01, flood_every=25, retry_after=1)
+    await api.start()
+    bot = api.bot()
+    notifier = Notifier(bot)
+    notifier.start()
+    try:
+        started = time.perf_counter()
+        results = await asyncio.gather(*(notifier.send(CHAT_ID + i, f"message {i}") for i in range(NOTIFY_MESSAGES)))
+        elapsed = time.perf_counter() - started
+        await notifier.close()
+    finally:
+        await bot.session.close()
+        await api.close()
+    assert all(results), "a message was given up"
+    assert len(api.sent()) == NOTIFY_MESSAGES, "a message was sent twice or lost"
+    return {
+        "messages_per_s": metric(NOTIFY_MESSAGES / elapsed, "messages/s", "higher"),
+        "floods": metric(api.floods, "429s", "same"),
+    }
+
+
+SCENARIOS: dict[str, Callable[[Context], Awaitable[dict]]] = {
+    "get_due_projects": get_due_projects,
+    "run_due_checks": due_checks,
+    "run_reminder_checks": reminder_checks,
+    "timer_fire": timer_fire,
+    "list_render": list_render,
+    "fsm_burst": fsm_burst,
+    "notify_flood": notify_flood,
+}
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(args: argparse.Namespace) -> int:
+    names = args.scenarios or list(SCENARIOS)
+    unknown = [name for name in names if name not in SCENARIOS]
+    if unknown:
+        print(f"unknown scenarios: {', '.join(unknown)}; known: {', '.join(SCENARIOS)}", file=sys.stderr)
+        return 2
+    results = {
+        "meta": {
+            "created": datetime.now().isoformat(timespec="seconds"),
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "projects": args.projects,
+            "seed": args.seed,
+            "repeats": args.repeats,
+        },
+        "scenarios": {},
+    }
+    with tempfile.TemporaryDirectory() as tmp:
+        template = os.path.join(tmp, "template.db")
+        db.init_db(template)
+        started = time.perf_counter()
+        fill(template, args.projects, date.today(), args.seed)
+        db.close_pool(template)
+        print(f"generated {args.projects} projects in {time.perf_counter() - started:.1f}s")
+        ctx = Context(template, tmp, date.today(), args.repeats)
+        for name in names:
+            result = asyncio.run(SCENARIOS[name](ctx))
+            results["scenarios"][name] = result
+            print(f"{name:20} " + "  ".join(f"{key} {m['value']:g} {m['unit']}" for key, m in result.items()))
+    with open(args.out, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"results written to {args.out}")
+    return 0
+
+
+def compare(args: argparse.Namespace) -> int:
+    with open(args.base) as f:
+        base = json.load(f)
+    with open(args.new) as f:
+        new = json.load(f)
+    for key in ("projects", "seed"):
+        if base["meta"].get(key) != new["meta"].get(key):
+            print(f"warning: {key} differs ({base['meta'].get(key)} vs {new['meta'].get(key)})")
+    flagged = 0
+    print(f"{'scenario':20} {'metric':14} {'base':>12} {'new':>12} {'change':>8}")
+    for scenario, metrics in new["scenarios"].items():
+        for key, m in metrics.items():
+            old = base["scenarios"].get(scenario, {}).get(key)
+            if old is None:
+                print(f"{scenario:20} {key:14} {'-':>12} {m['value']:12g} {'new':>8}")
+                continue
+            change = (m["value"] - old["value"]) / old["value"] if old["value"] else 0.0
+            allowed = max(args.threshold, 2 * m.get("noise", 0.0), 2 * old.get("noise", 0.0))
+            if m["better"] == "same":
+                bad = m["value"] != old["value"]
+            elif m["better"] == "lower":
+                bad = change > allowed
+            elif m["better"] == "higher":
+                bad = change < -allowed
+            else:
+                bad = False
+            flagged += bad
+            print(
+                f"{scenario:20} {key:14} {old['value']:12g} {m['value']:12g} {change:+8.1%}"
+                + ("  REGRESSION" if bad and m["better"] != "same" else "  CHANGED" if bad else "")
+            )
+    print(f"{flagged} flagged (threshold {args.threshold:.0%})")
+    return 1 if flagged else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.suite")
+    commands = parser.add_subparsers(dest="command", required=True)
+    run_parser = commands.add_parser("run", help="run scenarios and write their results")
+    run_parser.add_argument("scenarios", nargs="*", help=f"default: all of {', '.join(SCENARIOS)}")
+    run_parser.add_argument("--projects", type=int, default=DEFAULT_PROJECTS)
+    run_parser.add_argument("--seed", type=int, default=0)
+    run_parser.add_argument("--repeats", type=int, default=DEFAULT_REPEATS)
+    run_parser.add_argument("--out", default="bench-results.json")
+    compare_parser = commands.add_parser("compare", help="flag regressions between two result files")
+    compare_parser.add_argument("base")
+    compare_parser.add_argument("new")
+    compare_parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    args = parser.parse_args()
+    sys.exit(run(args) if args.command == "run" else compare(args))
+
+
+if __name__ == "__main__":
+    main()
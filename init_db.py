@@ -2,17 +2,17 @@
 """
 Database initialization script
 Run this script to create the database manually: python init_db.py
+(same as: python -m app.cli init)
 """
 
 from app.db import init_db
-from app.bot import load_settings
+from app.config import database_path
 
 def main():
     print("Database yaratilmoqda...")
-    settings = load_settings()
-    init_db(settings.db_path)
-    print(f"✅ Database muvaffaqiyatli yaratildi: {settings.db_path}")
+    db_path = database_path()
+    init_db(db_path)
+    print(f"✅ Database muvaffaqiyatli yaratildi: {db_path}")
 
 if __name__ == "__main__":
     main()
-